@@ -0,0 +1,311 @@
+"""Project archiving."""
+
+import errno
+import os
+import struct
+import tarfile
+import tempfile
+import time
+import zlib
+from collections import deque, namedtuple
+from multiprocessing.pool import ThreadPool
+from zipfile import ZipFile
+
+from banneret.pool import WORKERS
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK = 1024 * 1024
+SPOOL = 1024 * 1024
+
+STORED = 0
+DEFLATED = 8
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+END_RECORD = struct.Struct('<4s4H2LH')
+END_RECORD64 = struct.Struct('<4sQ2H2L4Q')
+END_LOCATOR64 = struct.Struct('<4sLQL')
+
+
+Format = namedtuple('Format', 'extension mode levels default')
+
+FORMATS = {
+    'zip': Format('.zip', None, range(0, 10), 6),
+    'tar': Format('.tar', 'w', (), None),
+    'gztar': Format('.tar.gz', 'w:gz', range(0, 10), 9),
+    'bztar': Format('.tar.bz2', 'w:bz2', range(1, 10), 9),
+}
+if lzma:
+    FORMATS['xztar'] = Format('.tar.xz', 'w:xz', range(0, 10), 6)
+if zstandard:
+    FORMATS['zstdtar'] = Format('.tar.zst', 'w|', range(1, 23), 3)
+
+
+def walk(root_dir, only=None, ignore=None):
+    """Yield (path, arcname, is_dir) for project tree in a stable order.
+
+    If only is given, just entries with arcnames (slash separated) from it
+    are yielded. Folders ignored by `banneret.ignore.Ignore` rules are pruned
+    without being read.
+    """
+    matcher = ignore.matcher() if ignore else None
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        arcdir = os.path.relpath(dirpath, root_dir)
+        arcdir = '' if arcdir == os.curdir else arcdir + os.sep
+        slashed = arcdir.replace(os.sep, '/')
+        if matcher:
+            matcher.load(dirpath, slashed, filenames)
+            dirnames[:] = [name for name in dirnames
+                           if not matcher.ignored(slashed + name, True)]
+            filenames = [name for name in filenames
+                         if not matcher.ignored(slashed + name, False)]
+        dirnames.sort()
+        entries = [(name, True) for name in dirnames]
+        entries += [(name, False) for name in sorted(filenames)]
+        for name, is_dir in entries:
+            path, arcname = os.path.join(dirpath, name), arcdir + name
+            if only is not None and slashed + name not in only:
+                continue
+            if is_dir or os.path.isfile(path):
+                yield path, arcname, is_dir
+
+
+def archive_format_of(archive_name):
+    """Get format of archive by its name, ValueError if format is unknown."""
+    for archive_format, description in sorted(
+            FORMATS.items(), key=lambda item: -len(item[1].extension)):
+        if archive_name.endswith(description.extension):
+            return archive_format
+    raise ValueError('Unknown archive format: %s' % archive_name)
+
+
+def extract_archive(archive_name, target):
+    """Extract archive of any supported format into target folder."""
+    archive_format = archive_format_of(archive_name)
+    if archive_format == 'zip':
+        with ZipFile(archive_name) as archive:
+            archive.extractall(target)
+    elif archive_format == 'zstdtar':
+        with open(archive_name, 'rb') as source:
+            stream = zstandard.ZstdDecompressor().stream_reader(source)
+            with tarfile.open(fileobj=stream, mode='r|') as archive:
+                archive.extractall(target)
+    else:
+        with tarfile.open(archive_name) as archive:
+            archive.extractall(target)
+
+
+def compress(path, level):
+    """Compress file into a spooled buffer, return (method, crc, size, data).
+
+    Level 0 stores the file as is, otherwise raw deflate stream is produced.
+    Only SPOOL bytes are kept in memory, the rest spills to a temp file.
+    """
+    method = DEFLATED if level else STORED
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if level else None
+    crc, size = 0, 0
+    # data is handed over to the zip writer, which closes it
+    # pylint: disable=consider-using-with
+    data = tempfile.SpooledTemporaryFile(max_size=SPOOL)
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK), b''):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        data.write(compressor.flush())
+    data.seek(0)
+    return method, crc & 0xFFFFFFFF, size, data
+
+
+def dos_time(timestamp):
+    """Convert timestamp to zip (date, time) pair."""
+    moment = time.localtime(timestamp)
+    if moment.tm_year < 1980:
+        return (1 << 5) | 1, 0
+    date = (moment.tm_year - 1980) << 9 | moment.tm_mon << 5 | moment.tm_mday
+    clock = moment.tm_hour << 11 | moment.tm_min << 5 | moment.tm_sec // 2
+    return date, clock
+
+
+Entry = namedtuple(
+    'Entry', 'name flags method date clock crc compressed size offset '
+             'attributes')
+
+
+class ZipWriter(object):
+    """Streaming zip writer for entries compressed in advance."""
+
+    def __init__(self, output):
+        """Create writer on top of binary file object."""
+        self.output = output
+        self.offset = 0
+        self.entries = []
+
+    def _write(self, *chunks):
+        for chunk in chunks:
+            self.output.write(chunk)
+            self.offset += len(chunk)
+
+    def add(self, arcname, stat, compressed=None):
+        """Write a single entry, compressed is a result of `compress`.
+
+        Folders are written without compressed data.
+        """
+        method, crc, size, data = compressed or (STORED, 0, 0, None)
+        name = arcname.replace(os.sep, '/') + ('/' if data is None else '')
+        try:
+            name, flags = name.encode('ascii'), 0
+        except UnicodeError:
+            name, flags = name.encode('utf-8'), 0x800
+        length = 0
+        if data is not None:
+            data.seek(0, os.SEEK_END)
+            length = data.tell()
+            data.seek(0)
+        entry = Entry(name, flags, method, *dos_time(stat.st_mtime), crc=crc,
+                      compressed=length, size=size, offset=self.offset,
+                      attributes=self.attributes(stat, data is None))
+
+        zip64 = max(size, length) >= ZIP64_LIMIT
+        extra = struct.pack('<2H2Q', 1, 16, size, length) if zip64 else b''
+        self._write(LOCAL_HEADER.pack(
+            b'PK\x03\x04', 45 if zip64 else 20, 0, flags, method,
+            entry.clock, entry.date, crc,
+            ZIP64_LIMIT if zip64 else length,
+            ZIP64_LIMIT if zip64 else size,
+            len(name), len(extra)), name, extra)
+        if data is not None:
+            for chunk in iter(lambda: data.read(CHUNK), b''):
+                self._write(chunk)
+            data.close()
+        self.entries.append(entry)
+
+    @staticmethod
+    def attributes(stat, is_dir):
+        """Get external attributes of an entry from file stat."""
+        return (stat.st_mode & 0xFFFF) << 16 | (0x10 if is_dir else 0)
+
+    def _write_central_header(self, entry):
+        fields = [value for value in (entry.size, entry.compressed,
+                                      entry.offset) if value >= ZIP64_LIMIT]
+        extra = b''
+        if fields:
+            extra = struct.pack('<2H%dQ' % len(fields), 1, 8 * len(fields),
+                                *fields)
+        version = 45 if fields else 20
+        self._write(CENTRAL_HEADER.pack(
+            b'PK\x01\x02', version, 3, version, 0, entry.flags, entry.method,
+            entry.clock, entry.date, entry.crc,
+            min(entry.compressed, ZIP64_LIMIT), min(entry.size, ZIP64_LIMIT),
+            len(entry.name), len(extra), 0, 0, 0, entry.attributes,
+            min(entry.offset, ZIP64_LIMIT)), entry.name, extra)
+
+    def close(self):
+        """Write central directory and end records."""
+        start = self.offset
+        for entry in self.entries:
+            self._write_central_header(entry)
+
+        count, size = len(self.entries), self.offset - start
+        zip64 = max(size, start) >= ZIP64_LIMIT
+        if zip64 or count >= ZIP_FILECOUNT_LIMIT:
+            self._write(
+                END_RECORD64.pack(b'PK\x06\x06', 44, 45, 45, 0, 0, count,
+                                  count, size, start),
+                END_LOCATOR64.pack(b'PK\x06\x07', 0, self.offset, 1))
+        self._write(END_RECORD.pack(
+            b'PK\x05\x06', 0, 0, min(count, ZIP_FILECOUNT_LIMIT),
+            min(count, ZIP_FILECOUNT_LIMIT), min(size, ZIP64_LIMIT),
+            min(start, ZIP64_LIMIT), 0))
+
+
+def make_archive(base_name, root_dir, archive_format='zip', level=None,
+                 **options):
+    """Create archive of root_dir in given format, return archive name.
+
+    Level defaults to the format default, ValueError is raised for unknown
+    format or level out of the format range. Options are workers and `walk`
+    only and ignore.
+    """
+    workers = options.get('workers', WORKERS)
+    if archive_format not in FORMATS:
+        raise ValueError('Unsupported archive format: %s' % archive_format)
+    description = FORMATS[archive_format]
+    if level is None:
+        level = description.default
+    elif level not in description.levels:
+        raise ValueError('Wrong %s compression level: %s' % (archive_format,
+                                                             level))
+    if not os.path.isdir(root_dir):
+        raise IOError(errno.ENOENT, 'No such project', root_dir)
+    archive_name = base_name + description.extension
+    entries = walk(root_dir, options.get('only'), options.get('ignore'))
+    if archive_format == 'zip':
+        make_zip(archive_name, entries, level, workers)
+    elif archive_format == 'zstdtar':
+        compressor = zstandard.ZstdCompressor(level=level, threads=workers)
+        with open(archive_name, 'wb') as output:
+            with compressor.stream_writer(output) as stream:
+                make_tar(stream, entries, description.mode)
+    else:
+        compression = {}
+        if archive_format == 'xztar':
+            compression['preset'] = level
+        elif archive_format in ('gztar', 'bztar'):
+            compression['compresslevel'] = level
+        with open(archive_name, 'wb') as output:
+            make_tar(output, entries, description.mode, **compression)
+    return archive_name
+
+
+def make_tar(output, entries, mode, **options):
+    """Write tar archive of `walk` entries to output file object."""
+    with tarfile.open(fileobj=output, mode=mode, **options) as archive:
+        for path, arcname, _ in entries:
+            archive.add(path, arcname.replace(os.sep, '/'), recursive=False)
+
+
+def make_zip(archive_name, entries, level=6, workers=WORKERS):
+    """Create zip archive of `walk` entries compressing files in parallel.
+
+    Entries are written in a deterministic order while at most a couple of
+    compressed files per worker are waiting in the queue, so memory usage
+    does not depend on project size.
+    """
+    pool = ThreadPool(workers)
+    pending = deque()
+    try:
+        with open(archive_name, 'wb') as output:
+            writer = ZipWriter(output)
+
+            def flush():
+                arcname, stat, result = pending.popleft()
+                writer.add(arcname, stat, result and result.get())
+
+            for path, arcname, is_dir in entries:
+                stat = os.stat(path)
+                result = None
+                if not is_dir:
+                    result = pool.apply_async(compress, (path, level))
+                pending.append((arcname, stat, result))
+                if len(pending) > 2 * workers:
+                    flush()
+            while pending:
+                flush()
+            writer.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,321 @@
+"""Docker objects removal over the daemon socket with asyncio.
+
+Python 3 only, imported on request by `Banneret.clean_docker`. Unlike the
+Docker SDK it needs no extra packages and lists objects without inspecting
+each of them.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from urllib.parse import quote, urlencode, urlparse
+
+# main imports this module on request only
+from banneret.main import (  # pylint: disable=cyclic-import
+    Docker, build_cache_filters, parse_timestamp)
+from banneret.pool import WORKERS
+from banneret.timing import timed
+
+API_VERSION = '1.35'
+DEFAULT_HOST = 'unix:///var/run/docker.sock'
+
+Resource = namedtuple('Resource', 'id attrs')
+
+
+class APIError(IOError):
+    """Error response of the daemon, an IOError like in Docker SDK."""
+
+    def __init__(self, status, message):
+        """Create error of HTTP status with daemon message."""
+        super().__init__('%d %s' % (status, message))
+        self.status = status
+
+
+def convert_filters(filters):
+    """Encode filters dict as the daemon expects, like Docker SDK does."""
+    if not filters:
+        return None
+    converted = {}
+    for key, value in filters.items():
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        if not isinstance(value, list):
+            value = [value]
+        converted[key] = [str(item) for item in value]
+    return json.dumps(converted)
+
+
+class Connection(object):
+    """Keep-alive HTTP/1.1 connection to the daemon."""
+
+    def __init__(self, reader, writer, host):
+        """Wrap connected streams."""
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+        self.reusable = True
+
+    @classmethod
+    async def open(cls, url):
+        """Connect to unix:// socket or tcp:// address."""
+        if url.scheme == 'unix':
+            streams = await asyncio.open_unix_connection(url.path)
+            return cls(*streams, host='docker')
+        streams = await asyncio.open_connection(url.hostname, url.port)
+        return cls(*streams, host=url.netloc)
+
+    async def request(self, method, path):
+        """Send request, get (status, parsed JSON body or None)."""
+        self.writer.write(('%s %s HTTP/1.1\r\nHost: %s\r\n'
+                           'Content-Length: 0\r\n\r\n'
+                           % (method, path, self.host)).encode('ascii'))
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by daemon')
+        status = int(status_line.split()[1])
+        headers = {}
+        line = await self.reader.readline()
+        while line.strip():
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+            line = await self.reader.readline()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunks()
+        else:
+            length = int(headers.get('content-length') or 0)
+            body = await self.reader.readexactly(length)
+        self.reusable = headers.get('connection', '').lower() != 'close'
+        return status, json.loads(body.decode('utf-8')) if body else None
+
+    async def _read_chunks(self):
+        chunks = []
+        size = int((await self.reader.readline()).split(b';')[0], 16)
+        while size:
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+        line = await self.reader.readline()
+        while line.strip():  # trailers
+            line = await self.reader.readline()
+        return b''.join(chunks)
+
+    def close(self):
+        """Close connection."""
+        self.writer.close()
+
+
+class Client(object):
+    """Daemon API client with at most limit requests in flight.
+
+    Every request in flight has its own connection, idle connections are
+    reused by the next requests.
+    """
+
+    def __init__(self, host, limit):
+        """Create client of daemon at host, e.g. unix:///path."""
+        self.url = urlparse(host)
+        self.semaphore = asyncio.Semaphore(limit)
+        self.idle = []
+
+    async def request(self, method, path, **query):
+        """Get parsed response, APIError is raised for error statuses."""
+        path = '/v%s%s' % (API_VERSION, path)
+        query = dict((key, value) for key, value in query.items()
+                     if value is not None)
+        if query:
+            path += '?' + urlencode(query)
+        async with self.semaphore:
+            status, body = await self._send(method, path)
+        if status >= 400:
+            raise APIError(status, (body or {}).get('message', ''))
+        return body
+
+    async def _send(self, method, path):
+        """Send request over an idle connection or a new one.
+
+        Idle connection may be closed by the daemon meanwhile, request is
+        sent again over a new connection then.
+        """
+        reused = bool(self.idle)
+        connection = self.idle.pop() if reused else \
+            await Connection.open(self.url)
+        try:
+            response = await connection.request(method, path)
+        except (OSError, EOFError):
+            connection.close()
+            if not reused:
+                raise
+            return await self._send(method, path)
+        except BaseException:
+            connection.close()
+            raise
+        if connection.reusable:
+            self.idle.append(connection)
+        else:
+            connection.close()
+        return response
+
+    def close(self):
+        """Close idle connections."""
+        while self.idle:
+            self.idle.pop().close()
+
+
+class AsyncDocker(object):
+    """Docker wrapper of `Docker` interface running requests concurrently.
+
+    Every method runs its own event loop, so phases may go in parallel
+    threads like with `Docker`. Workers limit requests in flight.
+    """
+
+    def __init__(self, workers=WORKERS, host=None):
+        """Create wrapper of daemon at host, DOCKER_HOST by default."""
+        self.host = host or os.environ.get('DOCKER_HOST') or DEFAULT_HOST
+        self.workers = workers
+        self.errors = []
+        self.reclaimed = 0
+        self._lock = threading.Lock()
+
+    def _run(self, phase, *args):
+        """Run coroutine function phase with a client on a new loop."""
+        async def session():
+            client = Client(self.host, self.workers)
+            try:
+                return await phase(client, *args)
+            finally:
+                client.close()
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(session())
+        finally:
+            loop.close()
+
+    async def _prune(self, client, kind, filters=None, path=None):
+        """Bulk remove unused objects with a single API call."""
+        result = await client.request(
+            'POST', path or '/%s/prune' % kind,
+            filters=convert_filters(filters)) or {}
+        key = 'CachesDeleted' if path else '%sDeleted' % kind.capitalize()
+        deleted = result.get(key) or []
+        with self._lock:
+            self.reclaimed += result.get('SpaceReclaimed') or 0
+        logging.info('Pruned %d %s', len(deleted), kind)
+        return bool(deleted)
+
+    async def _remove_each(self, client, kind, names):
+        """Remove objects concurrently, collect (name, error) failures.
+
+        False is returned if no object has been removed.
+        """
+        async def remove_one(name):
+            logging.info('rm %s', name)
+            try:
+                await client.request('DELETE', '/%s/%s' % (kind, quote(name)),
+                                     force='1')
+            except APIError as error:
+                if error.status == 404:
+                    logging.debug('Already removed %s', name)
+                    return False
+                logging.info('Failed to remove %s: %s', name, error)
+                self.errors.append((name, error))
+                return False
+            return True
+
+        return any(await asyncio.gather(*[remove_one(name)
+                                          for name in names]))
+
+    @timed('docker.remove_containers')
+    def remove_containers(self, selection=None):
+        """Remove all or selected docker containers, see `Docker`."""
+        return self._run(self._remove_containers, selection)
+
+    async def _remove_containers(self, client, selection):
+        if selection and selection.skips('containers'):
+            return False
+        if selection and selection.older_than:
+            return await self._prune(client, 'containers',
+                                     selection.prune_filters())
+        pruned = False
+        if selection is None:
+            pruned = await self._prune(client, 'containers')
+        filters = selection.list_filters() if selection else None
+        containers = await client.request('GET', '/containers/json', all='1',
+                                          filters=convert_filters(filters))
+        removed = await self._remove_each(
+            client, 'containers', [obj['Id'] for obj in containers])
+        return pruned or removed
+
+    @timed('docker.remove_images')
+    def remove_images(self, selection=None):
+        """Remove all or selected docker images, see `Docker`."""
+        return self._run(self._remove_images, selection)
+
+    async def _remove_images(self, client, selection):
+        if selection and selection.older_than and not selection.min_size:
+            return await self._prune(client, 'images',
+                                     selection.prune_filters(dangling=False))
+        pruned = False
+        if selection is None:
+            pruned = await self._prune(client, 'images', {'dangling': False})
+        filters = selection.list_filters() if selection else None
+        listing = await client.request('GET', '/images/json',
+                                       filters=convert_filters(filters))
+        images = [Resource(image['Id'], image) for image in listing]
+        if selection:
+            images = [image for image in images if selection.match(
+                image.attrs.get('Created'), image.attrs.get('Size'))]
+        parents = None
+        if len(images) > 1:
+            parents = Docker.parent_ids(await client.request(
+                'GET', '/images/json', all='1'))
+        removed = False
+        for wave in Docker.image_waves(images, parents):
+            removed |= await self._remove_each(client, 'images',
+                                               [image.id for image in wave])
+        return pruned or removed
+
+    @timed('docker.remove_networks')
+    def remove_networks(self, selection=None):
+        """Remove all or selected unused networks, see `Docker`."""
+        if selection and selection.skips('networks'):
+            return False
+        filters = selection.prune_filters() if selection else None
+        return self._run(self._prune, 'networks', filters)
+
+    @timed('docker.remove_build_cache')
+    def remove_build_cache(self, selection=None):
+        """Remove build cache not used by running builds, see `Docker`."""
+        filters = build_cache_filters(selection)
+        if filters is None:
+            return False
+        return self._run(self._prune, 'caches', filters, '/build/prune')
+
+    def df(self):  # pylint: disable=invalid-name
+        """Get disk usage of every object as `docker system df` does."""
+        return self._run(lambda client: client.request('GET', '/system/df'))
+
+    @timed('docker.remove_volumes')
+    def remove_volumes(self, selection=None):
+        """Remove all or selected docker volumes, see `Docker`."""
+        return self._run(self._remove_volumes, selection)
+
+    async def _remove_volumes(self, client, selection):
+        if selection and selection.skips('volumes'):
+            return False
+        pruned = False
+        if selection is None:
+            pruned = await self._prune(client, 'volumes')
+        filters = selection.list_filters() if selection else None
+        listing = await client.request('GET', '/volumes',
+                                       filters=convert_filters(filters))
+        volumes = listing.get('Volumes') or []
+        if selection:
+            volumes = [volume for volume in volumes if selection.match(
+                parse_timestamp(volume.get('CreatedAt')))]
+        removed = await self._remove_each(
+            client, 'volumes', [volume['Name'] for volume in volumes])
+        return pruned or removed
@@ -1,120 +1,524 @@
 """Banneret main entry point."""
 
+import json
 import logging
 import sys
+from itertools import groupby
 
 import click
 
 from banneret import Banneret
-from banneret.main import docker_api, PWD, DESKTOP
+from banneret.main import import_docker, KINDS, Selection, SettingsNotFound
+from banneret.paths import paths
+from banneret.properties import vm_option
+from banneret.timing import timer
+from banneret.units import format_size, parse_duration, parse_size
 from banneret.version import __version__
+from banneret.watch import DOCKER_ROOT, Watcher
 
 LINUX = {'linux', 'linux2'}
 MACOS = {'darwin'}
 PLATFORMS = LINUX | MACOS
 
+# names of banneret.archive.FORMATS, which is imported only to archive
+ARCHIVE_FORMATS = ('bztar', 'gztar', 'tar', 'xztar', 'zip', 'zstdtar')
+
+
+def convert(parse):
+    """Create click callback converting option value with parse function."""
+    def callback(ctx, param, value):  # pylint: disable=unused-argument
+        try:
+            return None if value is None else parse(value)
+        except ValueError as error:
+            raise click.BadParameter(str(error))
+    return callback
+
 
 @click.group()
 @click.version_option(version=__version__)
 @click.option('-v', '--verbose', is_flag=True, help='Enable debug logging.')
+@click.option('--profile', is_flag=True,
+              help='Print time spent in every phase of the command.')
+@click.option('--profile-output', metavar='FILE',
+              type=click.Path(dir_okay=False),
+              help='Write phases to FILE.json, cProfile stats to other FILE.')
 @click.pass_context
-def cli(ctx, verbose):
+def cli(ctx, verbose, profile, profile_output):
     """Execute main entry point."""
     if sys.platform not in PLATFORMS:
         logging.info('Wrong os: %s', sys.platform)
         sys.exit(1)
     else:
         ctx.obj = Banneret()
+    if profile or profile_output:
+        start_profile(ctx, profile, profile_output)
 
     logging_level = logging.DEBUG if verbose else logging.INFO
     logging.basicConfig(level=logging_level, format='%(message)s')
     logging.debug('CLI arguments: %s', ', '.join(sys.argv[1:]))
 
 
+def start_profile(ctx, table=True, output=None):
+    """Time phases of the command, report them once it is finished.
+
+    Output with .json extension gets timed phases, any other one gets
+    cProfile stats of the main thread readable by pstats.
+    """
+    profiler = None
+    if output and not output.endswith('.json'):
+        import cProfile  # pylint: disable=import-outside-toplevel
+        profiler = cProfile.Profile()
+
+    def report():
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(output)
+        timer.disable()
+        if output and not profiler:
+            timer.save(output)
+        if table:
+            show_phases(timer)
+
+    ctx.call_on_close(report)
+    timer.enable()
+    if profiler:
+        profiler.enable()
+
+
+def show_phases(phases_timer):
+    """Print calls and durations of timed phases to stderr."""
+    row = '%-26s %6s %10s %10s %10s'
+    click.echo(row % ('PHASE', 'CALLS', 'TOTAL', 'MEAN', 'MAX'), err=True)
+    for phase in phases_timer.phases():
+        click.echo(row % (phase.name, phase.calls, '%.3fs' % phase.total,
+                          '%.3fs' % (phase.total / phase.calls),
+                          '%.3fs' % phase.longest), err=True)
+    click.echo(row % ('elapsed', '', '%.3fs' % phases_timer.elapsed(), '',
+                      ''), err=True)
+
+
+def read_versions(bnrt, versions, version_file=None):
+    """Normalize versions given as arguments and in file, drop duplicates.
+
+    File holds a version per line, blank and # comment lines are skipped.
+    Exact versions of IDE given without version are dropped as well.
+    """
+    versions = list(versions)
+    if version_file:
+        versions.extend(line.strip() for line in version_file
+                        if line.strip() and not line.strip().startswith('#'))
+    if not versions:
+        raise click.UsageError('No versions given')
+    normalized = []
+    for version in versions:
+        try:
+            pair = bnrt.normalize_version(version)
+        except ValueError:
+            logging.info('Wrong or unsupported version: %s', version)
+            sys.exit(1)
+        if pair not in normalized:
+            normalized.append(pair)
+    everything = set(ide for ide, version in normalized if version == '*')
+    return [(ide, version) for ide, version in normalized
+            if version == '*' or ide not in everything]
+
+
 @cli.command(help='Remove IDE settings.')
-@click.argument('version')
+@click.argument('versions', nargs=-1, metavar='[VERSION]...')
+@click.option('-f', '--from', 'version_file', type=click.File(),
+              help='Read versions from file, one per line, - for stdin.')
 @click.option('-s', '--configs', is_flag=True, help='Remove configurations.')
 @click.option('-c', '--caches', is_flag=True, help='Remove caches.')
 @click.option('-p', '--plugins', is_flag=True, help='Remove plugins.')
 @click.option('-l', '--logs', is_flag=True, help='Remove logs.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of deletion threads.')
+@click.option('--fast', is_flag=True,
+              help='Move to trash and remove in background.')
+@click.option('-n', '--dry-run', is_flag=True,
+              help='Show what would be removed and its size.')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Show dry run as JSON.')
+@click.option('-k', '--keep', type=click.IntRange(min=0), metavar='N',
+              help='Keep N newest versions, remove the rest.')
 @click.pass_obj
-def clean(bnrt, version, **kwargs):
+def clean(bnrt, versions, version_file, jobs, fast, **kwargs):
     """Execute clean command for settings wipe."""
-    try:
-        ide, version = bnrt.normalize_version(version)
-    except ValueError:
-        logging.info('Wrong or unsupported version: %s', version)
+    if jobs:
+        bnrt.workers = jobs
+    dry_run, as_json = kwargs.pop('dry_run'), kwargs.pop('as_json')
+    keep = kwargs.pop('keep')
+    pairs = read_versions(bnrt, versions, version_file)
+    everything = any(version == '*' for _, version in pairs)
+    if keep is None:
+        versions = [ide + version for ide, version in pairs]
+    elif not all(version == '*' for _, version in pairs):
+        logging.info('Versions to keep are counted for IDE without version')
         sys.exit(1)
-    if version != '*' or click.confirm('Remove all versions?'):
-        removed = bnrt.remove_all(ide + version, **kwargs)
-        if not removed:
+    else:
+        versions = [ide + old for ide, _ in pairs
+                    for old in bnrt.versions(ide, **kwargs)[keep:]]
+    if dry_run or as_json:
+        plan = bnrt.plan(*versions, **kwargs)
+        if not plan:
             logging.info('Nothing to remove')
             sys.exit(1)
+        show_plan(plan, as_json)
+    elif not everything or keep or click.confirm('Remove all versions?'):
+        if not versions or not bnrt.remove_all(*versions, fast=fast,
+                                               **kwargs):
+            logging.info('Nothing to remove')
+            sys.exit(1)
+        elif fast:
+            bnrt.spawn_reaper()
     else:
         logging.info('Abort')
         sys.exit(1)
 
 
+def show_plan(plan, as_json=False):
+    """Print clean plan as a table or JSON."""
+    files = sum(target.files for target in plan)
+    size = sum(target.size for target in plan)
+    if as_json:
+        click.echo(json.dumps({
+            'targets': [target._asdict() for target in plan],
+            'files': files, 'size': size}, indent=2, sort_keys=True))
+        return
+    row = '%10s %9s  %s'
+    click.echo(row % ('SIZE', 'FILES', 'PATH'))
+    for target in plan:
+        click.echo(row % (format_size(target.size), target.files,
+                          target.path))
+    click.echo(row % (format_size(size), files, 'total'))
+
+
+@cli.command(help='Show disk usage of IDE settings.')
+@click.option('--json', 'as_json', is_flag=True, help='Show usage as JSON.')
+@click.option('--rescan', is_flag=True,
+              help='Read all folders ignoring results of previous runs.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of scanning threads.')
+@click.pass_obj
+def du(bnrt, as_json, rescan, jobs):  # pylint: disable=invalid-name
+    """Execute du command to show settings disk usage."""
+    if jobs:
+        bnrt.workers = jobs
+    usage = bnrt.disk_usage(paths.du_cache, rescan)
+    if not usage:
+        logging.info('No settings found')
+        sys.exit(1)
+    show_usage(usage, as_json)
+
+
+def show_usage(usage, as_json=False):
+    """Print disk usage per IDE version as a table or JSON."""
+    if as_json:
+        click.echo(json.dumps([folder._asdict() for folder in usage],
+                              indent=2, sort_keys=True))
+        return
+    row = '%-14s %-10s' + ' %10s' * (len(KINDS) + 1)
+    header = ['IDE', 'VERSION'] + [kind.upper() for kind in KINDS]
+    click.echo(row % tuple(header + ['TOTAL']))
+
+    def echo(ide, version, folders):
+        sizes = [sum(folder.size for folder in folders if folder.kind == kind)
+                 for kind in KINDS]
+        sizes.append(sum(sizes))
+        click.echo(row % ((ide, version) + tuple(map(format_size, sizes))))
+
+    for ide, ide_folders in groupby(usage, lambda folder: folder.ide):
+        ide_folders = list(ide_folders)
+        for version, folders in groupby(ide_folders,
+                                        lambda folder: folder.version):
+            echo(ide, version, list(folders))
+        echo(ide, 'total', ide_folders)
+    echo('total', '', usage)
+
+
+@cli.command(help='Remove settings moved to trash by fast clean.')
+@click.pass_obj
+def reap(bnrt):
+    """Execute reap command to empty trash."""
+    if not bnrt.reap():
+        logging.info('Nothing to remove')
+        sys.exit(1)
+
+
 @cli.command(help='Archive current project.')
-@click.option('-p', '--project', default=PWD)
-@click.option('-t', '--target', default=DESKTOP)
+@click.option('-p', '--project', help='Project path or name, current folder '
+              'by default.')
+@click.option('-t', '--target', help='Archive folder, desktop by default.')
+@click.option('-f', '--format', 'archive_format', default='zip',
+              type=click.Choice(ARCHIVE_FORMATS), help='Archive format.')
+@click.option('-l', '--level', type=int, help='Compression level.')
+@click.option('-i', '--incremental', is_flag=True,
+              help='Archive only changes since the last archive.')
+@click.option('--exclude', multiple=True, metavar='GLOB',
+              help='Skip matching paths.')
+@click.option('--include', multiple=True, metavar='GLOB',
+              help='Keep matching paths even if ignored.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of compression threads.')
 @click.pass_obj
-def archive(bnrt, project, target):
+def archive(bnrt, project, target, jobs, **kwargs):
     """Execute archive command to backup project."""
+    if jobs:
+        bnrt.workers = jobs
     try:
-        bnrt.archive_project(project, target)
+        bnrt.archive_project(
+            project, target, archive_format=kwargs['archive_format'],
+            level=kwargs['level'], incremental=kwargs['incremental'],
+            excludes=kwargs['exclude'], includes=kwargs['include'])
     except IOError:
         logging.info('Unknown project or target')
         sys.exit(1)
+    except ValueError as error:
+        logging.info(error)
+        sys.exit(1)
+
+
+@cli.command(help='Restore project from archive and its bases.')
+@click.argument('archive_name', metavar='ARCHIVE')
+@click.argument('target')
+@click.pass_obj
+def restore(bnrt, archive_name, target):
+    """Execute restore command to rebuild project from archives."""
+    try:
+        bnrt.restore_project(archive_name, target)
+    except IOError:
+        logging.info('Unknown archive or its manifest')
+        sys.exit(1)
+    except ValueError as error:
+        logging.info(error)
+        sys.exit(1)
 
 
 @cli.command(help='Remove Docker artifacts.')
 @click.option('-c', '--containers', is_flag=True, help='Remove containers.')
 @click.option('-i', '--images', is_flag=True, help='Remove images.')
 @click.option('-v', '--volumes', is_flag=True, help='Remove volumes.')
+@click.option('--networks', is_flag=True, help='Remove unused networks.')
+@click.option('--build-cache', is_flag=True, help='Remove build cache.')
+@click.option('--report', is_flag=True,
+              help='Show reclaimable space, remove nothing unless asked.')
+@click.option('--older-than', metavar='AGE', callback=convert(parse_duration),
+              help='Remove only objects older than AGE, e.g. 12h or 7d.')
+@click.option('--label', multiple=True, metavar='KEY[=VALUE]',
+              help='Remove only objects with the label.')
+@click.option('--dangling', is_flag=True, default=None,
+              help='Remove only dangling images and volumes.')
+@click.option('--min-size', metavar='SIZE', callback=convert(parse_size),
+              help='Remove only images bigger than SIZE, e.g. 500M.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of concurrent API requests.')
+@click.option('--async', 'asynchronous', is_flag=True,
+              help='Talk to the daemon socket with asyncio, no Docker SDK '
+                   'required (Python 3).')
 @click.pass_obj
-def docker(bnrt, containers, images, volumes):
+def docker(bnrt, jobs, asynchronous, report, **kwargs):
     """Execute docker command to remove docker-related objects."""
-    if not docker_api:
+    if jobs:
+        bnrt.workers = jobs
+    targets = dict((kind, kwargs.pop(kind)) for kind in (
+        'containers', 'images', 'volumes', 'networks', 'build_cache'))
+    selection = None
+    if any(kwargs.values()):
+        selection = Selection(kwargs['older_than'], kwargs['label'],
+                              kwargs['dangling'], kwargs['min_size'])
+    if asynchronous and sys.version_info < (3, 5):
+        raise click.UsageError('--async requires Python 3.5+')
+    if not asynchronous and not import_docker():
         logging.info('Docker API SDK required to operate'
                      ' - pip install docker')
         sys.exit(1)
-    elif containers or images or volumes:
-        removed = bnrt.clean_docker(containers, images, volumes)
-    elif click.confirm('Remove all containers/images/volumes?'):
-        removed = bnrt.clean_docker()
+    if report:
+        show_docker_usage(bnrt.docker_usage(asynchronous))
+        if not any(targets.values()):
+            return
+    if any(targets.values()):
+        removed = bnrt.clean_docker(selection=selection,
+                                    asynchronous=asynchronous, **targets)
+    elif click.confirm('Remove all containers/images/volumes/networks/build '
+                       'cache?'):
+        removed = bnrt.clean_docker(selection=selection,
+                                    asynchronous=asynchronous, networks=True,
+                                    build_cache=True)
     else:
         logging.info('Abort')
         sys.exit(1)
+    if bnrt.docker_errors:
+        sys.exit(1)
     if not removed:
         logging.info('Nothing to remove')
         sys.exit(1)
 
 
+def show_docker_usage(usage):
+    """Print docker objects and their reclaimable size as a table."""
+    row = '%-12s %8s %8s %10s %12s'
+    click.echo(row % ('TYPE', 'TOTAL', 'ACTIVE', 'SIZE', 'RECLAIMABLE'))
+    for kind in usage:
+        click.echo(row % (kind.kind, kind.total, kind.active,
+                          format_size(kind.size),
+                          format_size(kind.reclaimable)))
+    click.echo(row % ('total', '', '', format_size(
+        sum(kind.size for kind in usage)), format_size(
+            sum(kind.reclaimable for kind in usage))))
+
+
 @cli.command(help='Enable notifications.')
-@click.argument('version')
+@click.argument('versions', nargs=-1, metavar='[VERSION]...')
+@click.option('-f', '--from', 'version_file', type=click.File(),
+              help='Read versions from file, one per line, - for stdin.')
 @click.option('-d', '--disable', )
 @click.pass_obj
-def errors(bnrt, version, disable):
+def errors(bnrt, versions, version_file, disable):
     """Execute enable error command to switch IDE error notification."""
-    try:
-        ide, version = bnrt.normalize_version(version)
-    except ValueError:
-        logging.info('Wrong or unsupported version: %s', version)
-        sys.exit(1)
+    pairs = read_versions(bnrt, versions, version_file)
     switch = 'disable' if disable else 'enable'
     answer = '{} for all versions?'.format(switch.capitalize())
-    if version != '*' or click.confirm(answer):
+    if all(version != '*' for _, version in pairs) or click.confirm(answer):
         try:
-            bnrt.enable_errors(version=ide + version, disable=disable)
-            logging.info('Restart PyCharm to apply changes')
+            changed = bnrt.enable_errors(
+                *[ide + version for ide, version in pairs], disable=disable)
         except IOError:
             logging.info('No settings folder - try to start PyCharm once')
             sys.exit(1)
+        if not changed:
+            sys.exit(1)
+        logging.info('Restart PyCharm to apply changes')
     else:
         logging.info('Abort')
         sys.exit(1)
 
 
+@cli.group(help='Edit IDE properties.')
+def props():
+    """Execute props command group to edit IDE configuration files."""
+
+
+@props.command('set', help='Set idea.properties keys and JVM options.')
+@click.argument('args', nargs=-1, metavar='[KEY=VALUE]... [VERSION]...')
+@click.option('-f', '--from', 'version_file', type=click.File(),
+              help='Read versions from file, one per line, - for stdin.')
+@click.option('--vm', multiple=True, metavar='OPTION',
+              help='Set JVM option, e.g. Xmx2g or Dkey=value.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of editing threads.')
+@click.pass_obj
+def set_props(bnrt, args, version_file, vm, jobs):
+    """Execute props set command to edit configuration files."""
+    if jobs:
+        bnrt.workers = jobs
+    properties = dict(arg.split('=', 1) for arg in args if '=' in arg)
+    vmoptions = dict(vm_option(option) for option in vm)
+    if not properties and not vmoptions:
+        raise click.UsageError('No properties given')
+    pairs = read_versions(bnrt, [arg for arg in args if '=' not in arg],
+                          version_file)
+    if any(version == '*' for _, version in pairs) and not click.confirm(
+            'Update all versions?'):
+        logging.info('Abort')
+        sys.exit(1)
+    try:
+        changed = bnrt.set_properties(
+            [ide + version for ide, version in pairs], properties, vmoptions)
+    except SettingsNotFound:
+        logging.info('No settings folder - try to start PyCharm once')
+        sys.exit(1)
+    except IOError as error:
+        logging.info('Failed to update: %s', error)
+        sys.exit(1)
+    if not changed:
+        logging.info('Nothing to update')
+        sys.exit(1)
+    logging.info('Restart PyCharm to apply changes')
+
+
+@cli.command('relocate-caches',
+             help='Move IDE caches and indexes to another folder.')
+@click.argument('versions', nargs=-1, metavar='[VERSION]...')
+@click.option('-f', '--from', 'version_file', type=click.File(),
+              help='Read versions from file, one per line, - for stdin.')
+@click.option('--to', 'target', type=click.Path(file_okay=False),
+              help='Folder to move caches to, e.g. on a faster disk.')
+@click.option('--undo', is_flag=True, help='Move caches back.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of copying threads.')
+@click.pass_obj
+def relocate_caches(bnrt, versions, version_file, target, **kwargs):
+    """Execute relocate-caches command to move IDE system folders."""
+    if bool(target) == kwargs['undo']:
+        raise click.UsageError('Either --to or --undo is required')
+    if kwargs['jobs']:
+        bnrt.workers = kwargs['jobs']
+    pairs = read_versions(bnrt, versions, version_file)
+    if any(version == '*' for _, version in pairs) and not click.confirm(
+            'Move caches of all versions?'):
+        logging.info('Abort')
+        sys.exit(1)
+    try:
+        moved = bnrt.relocate_caches(
+            [ide + version for ide, version in pairs], target)
+    except SettingsNotFound:
+        logging.info('No settings folder - try to start PyCharm once')
+        sys.exit(1)
+    except IOError as error:
+        logging.info('Failed to move caches: %s', error)
+        sys.exit(1)
+    if not moved:
+        logging.info('Nothing to move')
+        sys.exit(1)
+    logging.info('Restart PyCharm to apply changes')
+
+
+@cli.command(help='Keep disk usage under a threshold, evicting oldest data.')
+@click.option('--high', type=click.IntRange(1, 100), default=90,
+              metavar='PERCENT', help='Start evicting at PERCENT of disk '
+                                      'used, 90 by default.')
+@click.option('--low', type=click.IntRange(0, 99), default=80,
+              metavar='PERCENT', help='Stop evicting below PERCENT of disk '
+                                      'used, 80 by default.')
+@click.option('--interval', default='1m', metavar='TIME',
+              callback=convert(parse_duration),
+              help='Poll disk usage every TIME, 1m by default.')
+@click.option('--max-interval', default='15m', metavar='TIME',
+              callback=convert(parse_duration),
+              help='Back off up to TIME while disk usage stands still.')
+@click.option('-k', '--keep', type=click.IntRange(min=0), default=1,
+              metavar='N', help='Keep caches of N newest versions of IDE.')
+@click.option('--docker-root', default=DOCKER_ROOT, metavar='PATH',
+              help='Docker data root, %s by default.' % DOCKER_ROOT)
+@click.option('--no-docker', is_flag=True, help='Leave docker objects be.')
+@click.option('--once', is_flag=True, help='Check usage once and exit.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1),
+              help='Number of deletion threads and API requests.')
+@click.option('--async', 'asynchronous', is_flag=True,
+              help='Talk to the daemon socket with asyncio (Python 3).')
+@click.pass_obj
+def watch(bnrt, high, low, once, **kwargs):
+    """Execute watch command to keep disks used between watermarks."""
+    jobs, no_docker = kwargs.pop('jobs'), kwargs.pop('no_docker')
+    docker_root = kwargs.pop('docker_root')
+    if low >= high:
+        raise click.UsageError('--low must be below --high')
+    if not 0 < kwargs['interval'] <= kwargs['max_interval']:
+        raise click.UsageError('--interval must be positive and not above '
+                               '--max-interval')
+    if jobs:
+        bnrt.workers = jobs
+    if kwargs['asynchronous'] and sys.version_info < (3, 5):
+        raise click.UsageError('--async requires Python 3.5+')
+    if no_docker:
+        docker_root = None
+    elif not kwargs['asynchronous'] and not import_docker():
+        logging.info('Docker API SDK not installed, docker is not watched')
+        docker_root = None
+    watcher = Watcher(bnrt, high / 100.0, low / 100.0,
+                      docker_root=docker_root, **kwargs)
+    watcher.run(1 if once else None)
+
+
 if __name__ == '__main__':
     cli()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,307 @@
+"""Filesystem helpers."""
+
+import fcntl
+import fnmatch
+import json
+import logging
+import errno
+import os
+import re
+import shutil
+import stat
+import tempfile
+
+from banneret.pool import WORKERS, pmap
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    scandir = None
+
+LOCK = '.lock'
+
+
+def _raise(error):
+    raise error
+
+
+def rmtree(path, workers=WORKERS, pool=None):
+    """Remove directory tree using a bounded pool of worker threads.
+
+    The tree is walked once, files are unlinked concurrently and folders are
+    removed bottom-up only after all their children are gone. Symbolic links
+    are removed, never followed. See `pmap` for pool.
+    """
+    path = str(path)
+    if os.path.islink(path) or not os.path.isdir(path):
+        os.unlink(path)
+        return
+
+    files, folders = [], []
+    for root, dirs, names in os.walk(path, onerror=_raise):
+        folders.append(root)
+        for name in list(dirs):
+            if os.path.islink(os.path.join(root, name)):
+                dirs.remove(name)
+                names.append(name)
+        files.extend(os.path.join(root, name) for name in names)
+
+    pmap(os.unlink, files, workers, pool)
+
+    # os.walk is top-down, so the reversed list has children before parents
+    for folder in reversed(folders):
+        os.rmdir(folder)
+
+
+def copytree(source, destination, workers=WORKERS):
+    """Copy tree with metadata using a bounded pool of worker threads.
+
+    The tree is walked once, folders are created upfront and files are
+    copied concurrently. Symbolic links are copied as links.
+    """
+    source, destination = str(source), str(destination)
+    files, folders = [], []
+    for root, dirs, names in os.walk(source, onerror=_raise):
+        target = os.path.join(destination, os.path.relpath(root, source))
+        os.makedirs(target)
+        folders.append((root, target))
+        for name in list(dirs):
+            if os.path.islink(os.path.join(root, name)):
+                dirs.remove(name)
+                names.append(name)
+        files.extend((os.path.join(root, name), os.path.join(target, name))
+                     for name in names)
+
+    def copy(paths):
+        if os.path.islink(paths[0]):
+            os.symlink(os.readlink(paths[0]), paths[1])
+        else:
+            shutil.copy2(*paths)
+
+    pmap(copy, files, workers)
+    for folder in reversed(folders):
+        shutil.copystat(*folder)
+
+
+def move_tree(source, destination, workers=WORKERS):
+    """Move tree to destination, which must not exist yet.
+
+    Tree is renamed if both are on the same filesystem, otherwise it is
+    copied with `copytree` and removed with `rmtree` afterwards.
+    """
+    source, destination = str(source), str(destination)
+    if os.path.lexists(destination):
+        raise OSError(errno.EEXIST, 'Destination exists', destination)
+    parent = os.path.dirname(destination)
+    if parent and not os.path.isdir(parent):
+        os.makedirs(parent)
+    try:
+        os.rename(source, destination)
+        return
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+    logging.debug('Copy %s to another device', source)
+    try:
+        copytree(source, destination, workers)
+    except BaseException:
+        if os.path.isdir(destination):
+            rmtree(destination, workers)
+        raise
+    rmtree(source, workers)
+
+
+def move_to_trash(path, trash):
+    """Atomically move path into a new unique entry of trash folder.
+
+    Rename only works within one filesystem, OSError with EXDEV errno is
+    raised otherwise and path is left intact.
+    """
+    path = str(path).rstrip(os.sep)
+    if not os.path.isdir(trash):
+        os.makedirs(trash)
+    entry = tempfile.mkdtemp(dir=trash)
+    try:
+        os.rename(path, os.path.join(entry, os.path.basename(path)))
+    except OSError:
+        os.rmdir(entry)
+        raise
+    return entry
+
+
+def empty_trash(trash, workers=WORKERS):
+    """Remove all trash entries, return False if trash was already empty.
+
+    Only one process reaps the trash at a time, others return immediately
+    as the active reaper picks up entries added while it runs.
+    """
+    if not os.path.isdir(trash):
+        return False
+    reaped = False
+    with open(os.path.join(trash, LOCK), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            logging.debug('Trash is being reaped by another process')
+            return False
+        entries = _trash_entries(trash)
+        while entries:
+            for entry in entries:
+                logging.debug('rm %s', entry)
+                rmtree(entry, workers)
+            reaped = True
+            entries = _trash_entries(trash)
+    return reaped
+
+
+class FolderIndex(object):
+    """Folder listings read once and matched against patterns in memory."""
+
+    def __init__(self):
+        """Create empty index."""
+        self.listings = {}
+        self.patterns = {}
+
+    def names(self, root):
+        """Get entry names of root folder, empty if it is unreadable."""
+        root = str(root)
+        if root not in self.listings:
+            try:
+                if scandir:
+                    names = [entry.name for entry in scandir(root)]
+                else:
+                    names = os.listdir(root)
+            except OSError as error:
+                logging.debug('Failed to list %s: %s', root, error)
+                names = []
+            self.listings[root] = sorted(names)
+        return self.listings[root]
+
+    def match(self, root, pattern):
+        """Get sorted names in root matching glob pattern.
+
+        Like glob, only patterns starting with a dot match hidden entries.
+        """
+        if pattern not in self.patterns:
+            self.patterns[pattern] = re.compile(fnmatch.translate(pattern))
+        regex, hidden = self.patterns[pattern], pattern.startswith('.')
+        return [name for name in self.names(root) if regex.match(name) and (
+            hidden or not name.startswith('.'))]
+
+    def forget(self, root):
+        """Drop cached listing of changed root folder."""
+        self.listings.pop(str(root), None)
+
+
+def _trash_entries(trash):
+    return [os.path.join(trash, name)
+            for name in os.listdir(trash) if name != LOCK]
+
+
+def _read_folder(path, mtime):
+    """Describe files of a single folder, symbolic links are files.
+
+    Files with a single link are summed up, multi-linked ones are listed as
+    [inode, size] to be counted once across the tree.
+    """
+    record = {'mtime': mtime, 'files': 0, 'size': 0, 'links': [],
+              'folders': []}
+    if scandir:
+        entries = ((entry.name, entry.is_dir(follow_symlinks=False),
+                    entry.stat(follow_symlinks=False))
+                   for entry in scandir(path))
+    else:
+        entries = ((name, None, os.lstat(os.path.join(path, name)))
+                   for name in os.listdir(path))
+    for name, is_dir, entry_stat in entries:
+        if is_dir or is_dir is None and stat.S_ISDIR(entry_stat.st_mode):
+            record['folders'].append(name)
+        elif entry_stat.st_nlink > 1:
+            record['links'].append([entry_stat.st_ino, entry_stat.st_size])
+        else:
+            record['files'] += 1
+            record['size'] += entry_stat.st_size
+    return record
+
+
+class DiskUsage(object):
+    """Disk usage of trees counting every file and folder once.
+
+    Folder listings are cached by folder path and mtime, so unchanged
+    folders are not read again. Folder mtime is not updated when a file is
+    rewritten in place, such size changes show up once the folder changes.
+    """
+
+    def __init__(self, cache=None, workers=WORKERS):
+        """Create counter on top of cache from a previous run."""
+        self.cache = cache or {}
+        self.workers = workers
+        self.visited = {}
+        self.links = set()
+
+    @classmethod
+    def load(cls, cache_file, workers=WORKERS):
+        """Create counter with cache read from file, if it is readable."""
+        try:
+            with open(cache_file) as cache:
+                return cls(json.load(cache), workers)
+        except (IOError, ValueError) as error:
+            logging.debug('Disk usage cache is not used: %s', error)
+            return cls(workers=workers)
+
+    def save(self, cache_file):
+        """Write listings of folders visited by this counter to file."""
+        try:
+            with open(cache_file, 'w') as cache:
+                json.dump(self.visited, cache)
+        except IOError as error:
+            logging.debug('Disk usage cache is not saved: %s', error)
+
+    def _scan_folder(self, path):
+        """Get (device, record) of a folder, None if it is unreadable."""
+        try:
+            folder_stat = os.lstat(path)
+            record = self.cache.get(path)
+            if not record or record['mtime'] != folder_stat.st_mtime:
+                record = _read_folder(path, folder_stat.st_mtime)
+        except OSError as error:
+            logging.debug('Failed to scan %s: %s', path, error)
+            return None
+        self.visited[path] = record
+        return folder_stat.st_dev, record
+
+    def usage(self, path):
+        """Get (files, size) of a tree, size is a sum of file sizes in bytes.
+
+        Tree is scanned level by level, folders of a level are listed
+        concurrently. Symbolic links are counted as files, never followed.
+        Files and folders counted by previous calls are skipped.
+        """
+        path = str(path)
+        if os.path.islink(path) or not os.path.isdir(path):
+            return 1, os.lstat(path).st_size
+        files, size, level = 0, 0, [path]
+        while level:
+            level = [folder for folder in level if folder not in self.visited]
+            scanned = pmap(self._scan_folder, level, self.workers)
+            children = []
+            for folder, result in zip(level, scanned):
+                if result is None:
+                    continue
+                device, record = result
+                files += record['files']
+                size += record['size']
+                for inode, link_size in record['links']:
+                    if (device, inode) not in self.links:
+                        self.links.add((device, inode))
+                        files += 1
+                        size += link_size
+                children.extend(os.path.join(folder, name)
+                                for name in record['folders'])
+            level = children
+        return files, size
+
+
+def tree_size(path, workers=WORKERS):
+    """Get (files, size) of a tree, see `DiskUsage.usage`."""
+    return DiskUsage(workers=workers).usage(path)
@@ -0,0 +1,176 @@
+"""Ignore rules for project archiving."""
+
+import logging
+import os
+import re
+
+DEFAULTS = ('.git/', '.hg/', '.svn/', '.bzr/', '__pycache__/', '*.py[cod]',
+            '.tox/', '.venv/', 'venv/', 'node_modules/')
+
+IGNORE_FILES = ('.gitignore', '.bnrtignore')
+HG_IGNORE_FILE = '.hgignore'
+
+
+def translate(pattern):
+    """Translate gitignore glob to regex matching slash separated paths."""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    index, result = 0, []
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith('**/', index):
+            result.append('(?:.*/)?')
+            index += 2
+        elif pattern.startswith('**', index):
+            result.append('.*')
+            index += 1
+        elif char == '*':
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '[' and ']' in pattern[index + 2:]:
+            end = pattern.index(']', index + 2)
+            body = pattern[index + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            result.append('[%s]' % body.replace('\\', '\\\\'))
+            index = end
+        elif char == '\\' and index + 1 < len(pattern):
+            index += 1
+            result.append(re.escape(pattern[index]))
+        else:
+            result.append(re.escape(char))
+        index += 1
+    return ('' if anchored else '(?:.*/)?') + ''.join(result) + r'\Z'
+
+
+def parse_gitignore(lines):
+    """Parse gitignore lines into (regex, negate, dir_only) rules."""
+    rules = []
+    for line in lines:
+        line = line.rstrip('\n').rstrip('\r')
+        if not line.endswith('\\ '):
+            line = line.rstrip(' ')
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate or line.startswith('\\!') or line.startswith('\\#'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        rules.append((translate(line.rstrip('/')), negate, dir_only))
+    return rules
+
+
+def parse_hgignore(lines):
+    """Parse hgignore lines into (regex, negate, dir_only) rules."""
+    rules, syntax = [], 'regexp'
+    for line in lines:
+        line = re.sub(r'(?<!\\)#.*', '', line).strip().replace('\\#', '#')
+        if not line:
+            continue
+        if line.startswith('syntax:'):
+            syntax = line.split(':', 1)[1].strip()
+            continue
+        kind, pattern = syntax, line
+        for prefix in ('re', 'regexp', 'glob', 'rootglob'):
+            if line.startswith(prefix + ':'):
+                kind, pattern = prefix, line[len(prefix) + 1:]
+        if kind in ('re', 'regexp'):
+            rules.append(('.*?(?:%s)' % pattern, False, False))
+        elif kind == 'rootglob':
+            rules.append((translate('/' + pattern), False, False))
+        else:
+            rules.append(('(?:.*/)?' + translate('/' + pattern), False, False))
+    return rules
+
+
+class Rules(object):  # pylint: disable=too-few-public-methods
+    """Compiled rules of a single source applied to paths under base."""
+
+    def __init__(self, rules, base=''):
+        """Compile (regex, negate, dir_only) rules."""
+        self.base = base
+        self.rules = [(re.compile(regex), negate, dir_only)
+                      for regex, negate, dir_only in rules]
+        # single regex per entry kind quickly rejects paths no rule matches
+        self.any_file = self._combine([regex for regex, _, dir_only in rules
+                                       if not dir_only])
+        self.any_dir = self._combine([regex for regex, _, _ in rules])
+
+    @staticmethod
+    def _combine(regexes):
+        return re.compile('|'.join('(?:%s)' % regex for regex in regexes)
+                          ) if regexes else None
+
+    def match(self, path, is_dir):
+        """Check path, None is returned if no rule matches it.
+
+        True means path is ignored, False - path is explicitly included.
+        """
+        if not path.startswith(self.base):
+            return None
+        path = path[len(self.base):]
+        combined = self.any_dir if is_dir else self.any_file
+        if combined is None or not combined.match(path):
+            return None
+        for regex, negate, dir_only in reversed(self.rules):
+            if (is_dir or not dir_only) and regex.match(path):
+                return not negate
+        return None
+
+
+class Ignore(object):  # pylint: disable=too-few-public-methods
+    """Ignore rules configuration for project walk.
+
+    Project ignore files (.gitignore, .bnrtignore in any folder and root
+    .hgignore) are read during the walk. Excludes are gitignore patterns
+    applied on top of them, includes win over any other rule.
+    """
+
+    def __init__(self, excludes=(), includes=(), defaults=DEFAULTS):
+        """Compile excludes, includes and default rules."""
+        self.excludes = Rules(parse_gitignore(excludes))
+        self.includes = Rules(parse_gitignore(includes))
+        self.defaults = Rules(parse_gitignore(defaults))
+
+    def matcher(self):
+        """Create matcher for a single project walk."""
+        return Matcher(self)
+
+
+class Matcher(object):
+    """Ignore rules state collected during a single project walk."""
+
+    def __init__(self, ignore):
+        """Create matcher with given configuration."""
+        self.ignore = ignore
+        self.sources = [ignore.defaults]
+
+    def load(self, dirpath, arcdir, filenames):
+        """Read ignore files found in folder, arcdir is its slashed path."""
+        names = IGNORE_FILES
+        if not arcdir:
+            names = (HG_IGNORE_FILE,) + names
+        for name in names:
+            if name not in filenames:
+                continue
+            parse = parse_hgignore if name == HG_IGNORE_FILE else \
+                parse_gitignore
+            try:
+                with open(os.path.join(dirpath, name)) as ignore_file:
+                    rules = parse(ignore_file)
+                self.sources.append(Rules(rules, arcdir))
+            except (IOError, re.error) as error:
+                logging.debug('Broken ignore file %s: %s', name, error)
+
+    def ignored(self, path, is_dir):
+        """Check if slash separated path relative to project is ignored."""
+        if self.ignore.includes.match(path, is_dir):
+            return False
+        if self.ignore.excludes.match(path, is_dir):
+            return True
+        for rules in reversed(self.sources):
+            result = rules.match(path, is_dir)
+            if result is not None:
+                return result
+        return False
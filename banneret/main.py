@@ -1,17 +1,23 @@
 """Main application logic."""
 
-import getpass
+import calendar
+import errno
 import logging
 import os
 import re
+import subprocess
 import sys
-from glob import glob
-from shutil import rmtree, make_archive
+import threading
+import time
+from collections import namedtuple
 
-try:
-    import docker as docker_api
-except ImportError:
-    docker_api = None
+from banneret.fs import DiskUsage, FolderIndex, rmtree, move_to_trash, \
+    move_tree, empty_trash
+from banneret.paths import paths
+from banneret.pool import WORKERS, pmap, shared_pool
+from banneret.properties import Properties, VmOptions, edit
+from banneret.timing import timed
+from banneret.units import format_size
 
 ALIASES = {
     'pycharm': 'PyCharm',
@@ -23,73 +29,275 @@ ALIASES = {
     'ideaic': 'IdeaIC',
 }
 
-USER = getpass.getuser()
-PWD = os.getcwd()
+
+def import_docker():
+    """Import Docker SDK on first use, None is returned if not installed.
+
+    The SDK pulls in requests and urllib3, which is too slow for commands
+    not working with Docker.
+    """
+    try:
+        import docker  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return docker
+
+
+KINDS = ('configs', 'caches', 'plugins', 'logs')
+
+ERROR_NOTIFICATION = 'idea.fatal.error.notification'
+SYSTEM_PATH = 'idea.system.path'
+
+PRODUCTS = {
+    'PyCharm': 'pycharm',
+    'PyCharmCE': 'pycharm',
+    'IntelliJIdea': 'idea',
+    'IdeaIC': 'idea',
+}
 
 if sys.platform == 'darwin':
-    HOME = '/Users/{user}'.format(user=USER)
-    CONFIGS = '{home}/Library/Preferences'.format(home=HOME)
-    CACHES = '{home}/Library/Caches'.format(home=HOME)
-    PLUGINS = '{home}/Library/Application Support'.format(home=HOME)
-    LOGS = '{home}/Library/Logs'.format(home=HOME)
-elif sys.platform.startswith('linux'):
-    HOME = '/home/{user}'.format(user=USER)
-    CONFIGS = '{home}/.{{version}}/config'.format(home=HOME)
-    CACHES = '{home}/.{{version}}/system/caches'.format(home=HOME)
-    PLUGINS = '{home}/.{{version}}/config/plugins'.format(home=HOME)
-    LOGS = '{home}/.{{version}}/system/log'.format(home=HOME)
+    VMOPTIONS = '{product}.vmoptions'
 else:
-    HOME = None
-    CONFIGS = None
-    CACHES = None
-    PLUGINS = None
-    LOGS = None
+    VMOPTIONS = '{product}64.vmoptions'
 
-DESKTOP = '{home}/Desktop'.format(home=HOME)
-PROJECTS = '{home}/PycharmProjects'.format(home=HOME)
+Target = namedtuple('Target', 'path files size')
+Usage = namedtuple('Usage', 'ide version kind path files size')
+DockerUsage = namedtuple('DockerUsage', 'kind total active size reclaimable')
 
+# selection fields docker objects of every kind can be selected by
+SELECTABLE = {
+    'containers': ('older_than', 'labels'),
+    'images': ('older_than', 'labels', 'dangling', 'min_size'),
+    'volumes': ('older_than', 'labels', 'dangling'),
+    'networks': ('older_than', 'labels'),
+    'build cache': ('older_than',),
+}
 
-class BanneretMacOS(object):
+
+class SettingsNotFound(IOError):
+    """No settings folder of given versions."""
+
+
+class BanneretMacOS(object):  # pylint: disable=too-many-public-methods
     """Main application logic for macOS."""
 
+    def __init__(self, workers=WORKERS):
+        """Create application with given number of worker threads."""
+        self.workers = workers
+        self.index = FolderIndex()
+        self.pool = None  # shared by concurrent removals of `remove_all`
+        self.docker_errors = []  # failures of the last `clean_docker`
+
+    @timed('find')
+    def find(self, path, version):
+        """Find all version folders in path, version is a glob pattern.
+
+        Every settings root is listed once, later lookups are served from
+        the index.
+        """
+        root, prefix, suffix = self.locate(path)
+        folders = [os.path.join(root, name) + suffix
+                   for name in self.index.match(root, prefix + version)]
+        if suffix:
+            folders = [folder for folder in folders if os.path.exists(folder)]
+        return folders
+
     @staticmethod
-    def remove(path, version):
+    def locate(path):
+        """Get (root, prefix, suffix) of version folders in path.
+
+        Version folder is root/<prefix><version><suffix>.
+        """
+        return str(path), '', ''
+
+    def listing(self, path):
+        """Get names of all version folders in path."""
+        root, prefix, _ = self.locate(path)
+        return [folder[len(root) + 1 + len(prefix):]
+                for folder in self.find(path, '?*')]
+
+    def versions(self, ide, **kwargs):
+        """Get versions of IDE having given settings, newest first."""
+        pattern = re.compile(r'%s([\d.]+)$' % re.escape(ide))
+        versions = set()
+        for path in self.targets(**kwargs):
+            for name in self.listing(path):
+                match = pattern.match(name)
+                if match:
+                    versions.add(match.group(1))
+        return sorted(versions, key=version_key, reverse=True)
+
+    @timed('remove')
+    def remove(self, path, version):
         """Remove all version folders from path."""
-        path = str(path)
-        folders = glob('%s/%s' % (path, version))
+        folders = self.find(path, version)
         for folder in folders:
             logging.info('rm %s', folder)
-            rmtree(folder)
+            rmtree(folder, self.workers, self.pool)
+        self.index.forget(self.locate(path)[0])
         return bool(folders)
 
-    def remove_all(self, version, **kwargs):
-        """Remove given settings for given IDE version."""
-        removed = False
+    @timed('trash')
+    def trash(self, path, version, trash=None):
+        """Move all version folders from path to trash for later removal."""
+        trash = trash or paths.trash
+        folders = self.find(path, version)
+        for folder in folders:
+            try:
+                move_to_trash(folder, trash)
+                logging.info('mv %s %s', folder, trash)
+            except OSError as error:
+                if error.errno != errno.EXDEV:
+                    raise
+                logging.debug('Trash is on another device')
+                logging.info('rm %s', folder)
+                rmtree(folder, self.workers, self.pool)
+        self.index.forget(self.locate(path)[0])
+        return bool(folders)
+
+    @timed('reap')
+    def reap(self, trash=None):
+        """Remove folders moved to trash by fast clean."""
+        trash = trash or paths.trash
+        logging.debug('Reap: trash %s', trash)
+        return empty_trash(trash, self.workers)
+
+    @staticmethod
+    def spawn_reaper():
+        """Reap trash in a background process detached from terminal."""
+        command = [sys.executable, '-m', 'banneret.cli', 'reap']
+        with open(os.devnull, 'r+b') as devnull:
+            # the reaper outlives this process, it is never waited for
+            # pylint: disable=consider-using-with
+            if sys.version_info >= (3, 2):
+                subprocess.Popen(command, stdin=devnull, stdout=devnull,
+                                 stderr=devnull, close_fds=True,
+                                 start_new_session=True)
+            else:
+                # python 2 has no start_new_session
+                # pylint: disable=subprocess-popen-preexec-fn
+                subprocess.Popen(command, stdin=devnull, stdout=devnull,
+                                 stderr=devnull, close_fds=True,
+                                 preexec_fn=os.setsid)
+
+    @staticmethod
+    def targets(**kwargs):
+        """Get locations of given settings, all of them by default."""
         everything = not any(kwargs.values())
         configs = kwargs.get('configs', False)
         caches = kwargs.get('caches', False)
         plugins = kwargs.get('plugins', False)
         logs = kwargs.get('logs', False)
 
+        targets = []
         if configs or everything:
-            removed |= self.remove(CONFIGS, version)
+            targets.append(paths.configs)
         if caches or everything:
-            removed |= self.remove(CACHES, version)
+            targets.append(paths.caches)
         if plugins or everything:
-            removed |= self.remove(PLUGINS, version)
+            targets.append(paths.plugins)
         if logs or everything:
-            removed |= self.remove(LOGS, version)
-        return removed
+            targets.append(paths.logs)
+        # nested targets (e.g. plugins inside configs) go with their parent
+        return [path for path in targets
+                if not any(path.startswith(other + '/') for other in targets)]
 
-    @staticmethod
-    def archive_project(project=PWD, target=DESKTOP, projects=PROJECTS):
-        """Archive given project and send to target."""
-        project, target, projects = str(project), str(target), str(projects)
+    @timed('remove_all')
+    def remove_all(self, *versions, **kwargs):
+        """Remove given settings for given IDE versions.
+
+        Locations are processed concurrently, versions of one location go
+        one by one, so overlapping versions never race. Files of all
+        locations are removed by one shared pool of workers. In fast mode
+        (fast=True) folders are only moved to trash, see `reap`.
+        """
+        drop = self.trash if kwargs.pop('fast', False) else self.remove
+        with shared_pool(self.workers) as pool:
+            self.pool = pool
+            try:
+                removed = pmap(lambda path: [drop(path, version)
+                                             for version in versions],
+                               self.targets(**kwargs))
+            finally:
+                self.pool = None
+        return any(any(dropped) for dropped in removed)
+
+    def plan(self, *versions, **kwargs):
+        """Get folders `remove_all` would remove with their sizes."""
+        folders = sorted(set(folder for path in self.targets(**kwargs)
+                             for version in versions
+                             for folder in self.find(path, version)))
+        counter = DiskUsage(workers=self.workers)
+        return [Target(folder, *counter.usage(folder)) for folder in folders]
+
+    def disk_usage(self, cache_file=None, rescan=False):
+        """Get usage of every settings folder of every known IDE version.
+
+        Nested folders (e.g. plugins inside configs) and hard links are
+        counted once. Folder listings are cached in cache_file if given,
+        rescan ignores listings cached before.
+        """
+        folders = []
+        for ide in sorted(set(ALIASES.values())):
+            pattern = re.compile(r'(?:^|/)\.?%s([\d.]+)(?:/|$)' % ide)
+            for kind in KINDS:
+                for path in self.find(getattr(paths, kind), ide + '*'):
+                    match = pattern.search(path)
+                    if match:
+                        folders.append((ide, match.group(1), kind, path))
+        counter = DiskUsage(workers=self.workers)
+        if cache_file and not rescan:
+            counter = DiskUsage.load(cache_file, self.workers)
+        # the deepest go first, so their parents skip them
+        folders.sort(key=lambda folder: -folder[3].count('/'))
+        usage = [Usage(*(folder + counter.usage(folder[3])))
+                 for folder in folders]
+        if cache_file:
+            counter.save(cache_file)
+        return sorted(usage)
+
+    @timed('archive_project')
+    def archive_project(self, project=None, target=None, projects=None,
+                        **options):
+        """Archive given project and send to target.
+
+        Project defaults to current folder, target - to desktop. Options are
+        archive_format ('zip'), level and incremental to only hold changes
+        since the previous archive. Files ignored by VCS and .bnrtignore are
+        skipped, excludes and includes options are extra gitignore-like
+        patterns.
+        """
+        # archiving modules are loaded by archive command only
+        # pylint: disable=import-outside-toplevel
+        from banneret.ignore import Ignore
+        from banneret.manifest import archive_delta, archive_full
+        project = str(project or paths.pwd)
+        target = str(target or paths.desktop)
+        projects = str(projects or paths.projects)
         if os.sep not in project:
             project = os.path.join(projects, project)
         archive_path = os.path.join(target, project.split(os.sep)[-1])
-        make_archive(base_name=archive_path, format='zip', root_dir=project)
-        logging.info('Archive %s.zip is created', archive_path)
+        make = archive_delta if options.get('incremental') else archive_full
+        archive_name = make(base_name=archive_path, root_dir=project,
+                            archive_format=options.get('archive_format',
+                                                       'zip'),
+                            level=options.get('level'), workers=self.workers,
+                            ignore=Ignore(options.get('excludes', ()),
+                                          options.get('includes', ())))
+        if archive_name:
+            logging.info('Archive %s is created', archive_name)
+        else:
+            logging.info('No changes since the last archive')
+        return archive_name
+
+    @staticmethod
+    def restore_project(archive_name, target):
+        """Restore project from archive and all archives it is based on."""
+        # pylint: disable=import-outside-toplevel
+        from banneret.manifest import restore
+        archive_name, target = str(archive_name), str(target)
+        restore(archive_name, target)
+        logging.info('Project is restored to %s', target)
 
     @staticmethod
     def normalize_version(version):
@@ -104,124 +312,540 @@ class BanneretMacOS(object):
             logging.debug('Normalize result: ide %s, version %s', ide, version)
             return ide, version
 
-    @staticmethod
-    def clean_docker(containers=True, images=True, volumes=True):
-        """Remove given docker objects from system."""
-        logging.debug('Clean docker: containers=%s, images=%s, volumes=%s',
-                      containers, images, volumes)
+    def docker_client(self, asynchronous=False):
+        """Get Docker wrapper, asynchronous one requires Python 3."""
+        if asynchronous:
+            # pylint: disable=import-outside-toplevel
+            from banneret.asyncdocker import AsyncDocker
+            return AsyncDocker(self.workers)
+        return Docker(self.workers)
+
+    def docker_usage(self, asynchronous=False):
+        """Get DockerUsage of every object kind with a single API call."""
+        return summarize_df(self.docker_client(asynchronous).df())
+
+    @timed('clean_docker')
+    def clean_docker(self, containers=True, images=True, volumes=True,
+                     **options):
+        """Remove given docker objects from system.
+
+        Containers go first as they hold the rest, which is removed
+        concurrently. Options are networks and build_cache to remove too,
+        selection limiting what is removed and asynchronous to talk to the
+        daemon socket without Docker SDK, it requires Python 3.
+        """
+        selection = options.get('selection')
+        networks = options.get('networks', False)
+        build_cache = options.get('build_cache', False)
+        logging.debug('Clean docker: containers=%s, images=%s, volumes=%s, '
+                      'networks=%s, build_cache=%s, selection=%s', containers,
+                      images, volumes, networks, build_cache, selection)
         removed = False
-        docker_client = Docker()
+        docker_client = self.docker_client(options.get('asynchronous',
+                                                       False))
 
         if containers:
-            removed |= docker_client.remove_containers()
+            removed |= docker_client.remove_containers(selection)
+        phases = []
         if images:
-            removed |= docker_client.remove_images()
+            phases.append(docker_client.remove_images)
         if volumes:
-            removed |= docker_client.remove_volumes()
+            phases.append(docker_client.remove_volumes)
+        if networks:
+            phases.append(docker_client.remove_networks)
+        if build_cache:
+            phases.append(docker_client.remove_build_cache)
+        removed |= any(pmap(lambda phase: phase(selection), phases))
+        self.docker_errors = docker_client.errors
+        if docker_client.errors:
+            logging.info('Failed to remove %d objects',
+                         len(docker_client.errors))
+        if docker_client.reclaimed:
+            logging.info('Reclaimed %s', format_size(docker_client.reclaimed))
         return removed
 
     @staticmethod
+    @timed('enable_error')
     def enable_error(folder, switch):
-        """Switch exception notification for specific settings folder."""
-        folder = str(folder)
-        option = slice(0, 29)
-        value = slice(30, None)
-        config_file = os.path.join(folder, 'idea.properties')
-        config_line = 'idea.fatal.error.notification=%sd\n' % switch
-        try:
-            with open(config_file, 'r') as idea_properties:
-                lines = idea_properties.readlines()
-        except IOError:
-            logging.debug('Config file was not found')
-            lines = [config_line]
-        else:
-            for i, line in enumerate(lines):
-                if line[option] == 'idea.fatal.error.notification':
-                    if switch in line[value]:
-                        logging.info('Already %sd', switch)
-                        sys.exit(1)
-                    else:
-                        logging.debug('Config line was found')
-                        lines[i] = config_line
-                        break
-            else:
-                lines.append(config_line)
-        with open(config_file, 'w') as idea_properties:
-            logging.info('Notifications %sd for %s', switch, config_file)
-            idea_properties.writelines(lines)
-
-    def enable_errors(self, version, path=CONFIGS, disable=False):
-        """Switch exception notification for given version."""
-        path = str(path)
-        switch = 'disable' if disable else 'enable'
-        folders = glob('%s/%s' % (path, version))
-        for folder in folders:
-            self.enable_error(folder, switch)
+        """Switch exception notification for specific settings folder.
+
+        False is returned if notifications are already switched.
+        """
+        config_file = os.path.join(str(folder), 'idea.properties')
+        if not edit(config_file, {ERROR_NOTIFICATION: '%sd' % switch}):
+            logging.info('Already %sd for %s', switch, config_file)
+            return False
+        logging.info('Notifications %sd for %s', switch, config_file)
+        return True
+
+    def enable_errors(self, *versions, **kwargs):
+        """Switch exception notification for given versions.
+
+        Configurations are looked up in path (configs location by default)
+        and edited concurrently, IOError is raised if none is found. False
+        is returned if nothing has changed.
+        """
+        switch = 'disable' if kwargs.get('disable') else 'enable'
+        folders = self.config_folders(versions, kwargs.get('path'))
+        return any(pmap(lambda folder: self.enable_error(folder, switch),
+                        folders, self.workers))
+
+    def config_folders(self, versions, path=None):
+        """Get configuration folders, SettingsNotFound if there is none.
+
+        Folders are looked up in path, configs location by default.
+        """
+        path = path or paths.configs
+        folders = sorted(set(folder for version in versions
+                             for folder in self.find(path, version)))
         if not folders:
-            raise IOError
+            raise SettingsNotFound(errno.ENOENT, 'No settings folder', path)
+        return folders
+
+    def set_properties(self, versions, properties=None, vmoptions=None,
+                       path=None):
+        """Set idea.properties and JVM options of given versions.
+
+        Folders are edited concurrently, each file is read and atomically
+        written once. JVM options go to every .vmoptions file of a folder,
+        VMOPTIONS one is created if there is none. SettingsNotFound is
+        raised if no folder is found, False is returned if nothing has
+        changed.
+        """
+        def edit_folder(folder):
+            changed = False
+            if properties:
+                changed |= self._edit(os.path.join(folder, 'idea.properties'),
+                                      properties, Properties)
+            if vmoptions:
+                names = [name for name in os.listdir(folder)
+                         if name.endswith('.vmoptions')]
+                for name in names or [self._vmoptions_file(folder)]:
+                    changed |= self._edit(os.path.join(folder, name),
+                                          vmoptions, VmOptions)
+            return changed
+
+        folders = self.config_folders(versions, path)
+        return any(pmap(edit_folder, folders, self.workers))
+
+    @staticmethod
+    def _edit(config_file, values, kind):
+        if edit(config_file, values, kind):
+            logging.info('Updated %s', config_file)
+            return True
+        logging.debug('Nothing to update in %s', config_file)
+        return False
+
+    def relocate_caches(self, versions, target=None):
+        """Move system folders (caches, indexes) of versions into target.
+
+        IDE is pointed to the new location via idea.system.path, versions
+        relocated before are skipped. Without target relocated folders are
+        moved back. False is returned if nothing has been moved,
+        SettingsNotFound is raised if no version is found.
+        """
+        if target is None:
+            return self._restore_caches(versions)
+        target = os.path.abspath(str(target))
+        relocated = False
+        for config in self.config_folders(versions):
+            name = version_name(config)
+            properties_file = os.path.join(config, 'idea.properties')
+            current = Properties.read(properties_file).get(SYSTEM_PATH)
+            if current:
+                logging.info('%s caches are already in %s', name, current)
+                continue
+            source = self._system_folder(name)
+            destination = os.path.join(target, name)
+            if os.path.isdir(source):
+                logging.info('mv %s %s', source, destination)
+                move_tree(source, destination, self.workers)
+            edit(properties_file, {SYSTEM_PATH: destination})
+            relocated = True
+        return relocated
+
+    def _restore_caches(self, versions):
+        """Move system folders relocated by `relocate_caches` back."""
+        restored = False
+        for config in self.config_folders(versions):
+            properties_file = os.path.join(config, 'idea.properties')
+            properties = Properties.read(properties_file)
+            current = properties.get(SYSTEM_PATH)
+            if not current:
+                continue
+            destination = self._system_folder(version_name(config))
+            if os.path.isdir(current):
+                logging.info('mv %s %s', current, destination)
+                move_tree(current, destination, self.workers)
+            properties.remove(SYSTEM_PATH)
+            properties.write(properties_file)
+            restored = True
+        return restored
+
+    def _system_folder(self, name):
+        """Get default system folder of IDE version like PyCharm2017.2."""
+        root, prefix, suffix = self.locate(paths.system)
+        return os.path.join(root, prefix + name) + suffix
+
+    @staticmethod
+    def _vmoptions_file(folder):
+        """Get name of JVM options file of IDE owning configuration folder."""
+        for ide, product in PRODUCTS.items():
+            if re.search(r'(?:^|/)\.?%s[\d.]+(?:/|$)' % ide, folder):
+                return VMOPTIONS.format(product=product)
+        return VMOPTIONS.format(product='idea')
 
 
 class BanneretLinux(BanneretMacOS):
     """Main application logic for Linux."""
 
     @staticmethod
-    def remove(path, version):
-        """Remove all version folders from path."""
-        path = str(path).format(version=version)
-        folders = glob(path)
-        for folder in folders:
-            logging.info('rm %s', folder)
-            rmtree(folder)
-        return bool(folders)
+    def locate(path):
+        """Get (root, prefix, suffix) of version folders in path template."""
+        head, suffix = str(path).split('{version}', 1)
+        root, prefix = os.path.split(head)
+        return root, prefix, suffix
 
-    def remove_all(self, version, **kwargs):
-        """Remove given settings for given IDE version."""
-        removed = False
-        everything = not any(kwargs.values())
-        if everything:
-            removed |= self.remove(HOME + '/.{version}', version)
-        else:
-            removed |= super(BanneretLinux, self).remove_all(version, **kwargs)
-        return removed
+    @staticmethod
+    def targets(**kwargs):
+        """Get locations of given settings, all of them by default."""
+        if not any(kwargs.values()):
+            return [paths.home + '/.{version}']
+        return BanneretMacOS.targets(**kwargs)
 
-    def enable_errors(self, version, path=CONFIGS, disable=False):
-        """Switch exception notification for given version."""
-        path = str(path).format(version=version)
-        switch = 'disable' if disable else 'enable'
-        folders = glob(path)
-        for folder in folders:
-            self.enable_error(folder, switch)
-        if not folders:
-            raise IOError
+
+def version_name(folder):
+    """Get IDE version like PyCharm2017.2 owning settings folder."""
+    names = re.findall(r'(?:^|/)\.?([a-zA-Z]+[\d.]+)(?=/|$)', folder)
+    return names[-1] if names else os.path.basename(folder)
+
+
+def version_key(version):
+    """Convert version like 2017.2 to a sortable (2017, 2) tuple."""
+    return tuple(int(part) for part in version.split('.') if part)
+
+
+def parse_timestamp(timestamp):
+    """Convert RFC 3339 timestamp used by Docker API to epoch seconds."""
+    match = re.match(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.\d+)?'
+                     r'(Z|([+-])(\d\d):(\d\d))$', timestamp or '')
+    if not match:
+        return None
+    moment = time.strptime(match.group(1), '%Y-%m-%dT%H:%M:%S')
+    offset = 0
+    if match.group(2) != 'Z':
+        offset = int(match.group(4)) * 3600 + int(match.group(5)) * 60
+        offset *= -1 if match.group(3) == '-' else 1
+    return calendar.timegm(moment) - offset
+
+
+class Selection(namedtuple('Selection',
+                           'older_than labels dangling min_size')):
+    """Docker objects selection made on the daemon side where possible.
+
+    Age is given in seconds, labels are 'key' or 'key=value' strings,
+    dangling is None to select regardless of it and min_size is in bytes.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, older_than=None, labels=(), dangling=None,
+                min_size=None):
+        """Create selection, everything is selected by default."""
+        return super(Selection, cls).__new__(cls, older_than, tuple(labels),
+                                             dangling, min_size)
+
+    def list_filters(self, dangling=True):
+        """Get daemon list filters, dangling is dropped if unsupported."""
+        filters = {}
+        if self.labels:
+            filters['label'] = list(self.labels)
+        if dangling and self.dangling is not None:
+            filters['dangling'] = self.dangling
+        return filters
+
+    def prune_filters(self, dangling=None):
+        """Get daemon prune filters, dangling defaults to given value."""
+        filters = self.list_filters(dangling is not None)
+        if dangling is not None and self.dangling is None:
+            filters['dangling'] = dangling
+        if self.older_than:
+            filters['until'] = '%ds' % self.older_than
+        return filters
+
+    def skips(self, kind):
+        """Check if objects of kind can not be selected, log the reason.
+
+        Kind is skipped as a whole rather than removed regardless of a
+        filter it does not support.
+        """
+        for field in self._fields:
+            if getattr(self, field) not in (None, ()) and \
+                    field not in SELECTABLE[kind]:
+                logging.info('Skip %s, they can not be selected by %s', kind,
+                             field.replace('_', ' '))
+                return True
+        return False
+
+    def match(self, created=None, size=None):
+        """Check age and size which the daemon can not filter by."""
+        if self.older_than and created is not None:
+            if created > time.time() - self.older_than:
+                return False
+        if self.min_size and size is not None:
+            if size < self.min_size:
+                return False
+        return True
+
+
+def build_cache_filters(selection):
+    """Get build cache prune filters, None if selection can not be met."""
+    if not selection:
+        return {}
+    if selection.skips('build cache'):
+        return None
+    return {'until': '%ds' % selection.older_than}
+
+
+def summarize_df(df):  # pylint: disable=invalid-name
+    """Get DockerUsage of every kind from system df response.
+
+    Reclaimable sizes are computed like `docker system df` does: unused
+    images, stopped containers, unreferenced volumes and build cache not
+    in use. Shared build cache is not counted.
+    """
+    images = df.get('Images') or []
+    layers = df.get('LayersSize') or 0
+    used = sum(image['Size'] - image.get('SharedSize', 0) for image in images
+               if image.get('Containers') and image.get('SharedSize') != -1)
+    active = sum(1 for image in images if image.get('Containers'))
+    usage = [DockerUsage('images', len(images), active, layers,
+                         max(layers - used, 0))]
+
+    volumes = [volume for volume in df.get('Volumes') or []
+               if (volume.get('UsageData') or {}).get('Size', -1) != -1]
+    caches = [cache for cache in df.get('BuildCache') or []
+              if not cache.get('Shared')]
+    kinds = (
+        ('containers', df.get('Containers') or [],
+         lambda obj: obj.get('SizeRw') or 0,
+         lambda obj: obj.get('State') == 'running'),
+        ('volumes', volumes,
+         lambda obj: obj['UsageData']['Size'],
+         lambda obj: obj['UsageData'].get('RefCount')),
+        ('build cache', caches,
+         lambda obj: obj.get('Size') or 0,
+         lambda obj: obj.get('InUse')),
+    )
+    for kind, objects, size, active in kinds:
+        usage.append(DockerUsage(
+            kind, len(objects), sum(1 for obj in objects if active(obj)),
+            sum(size(obj) for obj in objects),
+            sum(size(obj) for obj in objects if not active(obj))))
+    return usage
 
 
 class Docker:
     """Main docker related application logic."""
 
-    def __init__(self):
-        """Create Docker API wrapper."""
-        self.client = docker_api.from_env()
-
-    def remove_containers(self):
-        """Remove all docker containers."""
-        containers = self.client.containers.list(all=True)
-        for container in containers:
-            logging.info('rm %s', container)
-            container.remove(force=True)
-        return bool(containers)
-
-    def remove_images(self):
-        """Remove all docker images."""
-        images = self.client.images.list()
+    def __init__(self, workers=WORKERS):
+        """Create Docker API wrapper sharing one client between threads."""
+        self.api = import_docker()
+        try:
+            self.client = self.api.from_env(max_pool_size=workers)
+        except TypeError:  # docker SDK < 4.3 has no connection pool option
+            self.client = self.api.from_env()
+        self.workers = workers
+        self.errors = []
+        self.reclaimed = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, collection, key, filters=None):
+        """Bulk remove unused objects with a single API call."""
+        return self._pruned(collection.prune(filters=filters), key)
+
+    def _pruned(self, result, key):
+        """Account prune result, check if anything was deleted."""
+        result = result or {}
+        deleted = result.get(key) or []
+        with self._lock:
+            self.reclaimed += result.get('SpaceReclaimed') or 0
+        logging.info('Pruned %d %s', len(deleted), key[:-len('Deleted')]
+                     .lower())
+        return bool(deleted)
+
+    def _remove_each(self, objects, remove):
+        """Remove objects concurrently, collect (object, error) failures.
+
+        False is returned if no object has been removed.
+        """
+        def remove_one(obj):
+            logging.info('rm %s', obj)
+            try:
+                remove(obj)
+            except self.api.errors.NotFound:
+                logging.debug('Already removed %s', obj)
+            except self.api.errors.APIError as error:
+                logging.info('Failed to remove %s: %s', obj, error)
+                self.errors.append((obj, error))
+            else:
+                return True
+            return False
+
+        return any(pmap(remove_one, objects, self.workers))
+
+    @timed('docker.remove_containers')
+    def remove_containers(self, selection=None):
+        """Remove all or selected docker containers.
+
+        Without selection stopped containers are pruned in bulk first, only
+        the running ones are removed one by one. Age selects among stopped
+        containers only as the daemon filters by age on prune only.
+        Selection by dangling or size skips containers.
+        """
+        if selection and selection.skips('containers'):
+            return False
+        if selection and selection.older_than:
+            return self._prune(self.client.containers, 'ContainersDeleted',
+                               selection.prune_filters())
+        pruned = False
+        if selection is None:
+            pruned = self._prune(self.client.containers, 'ContainersDeleted')
+        containers = self.client.containers.list(
+            all=True, filters=selection and selection.list_filters())
+        removed = self._remove_each(
+            containers, lambda container: container.remove(force=True))
+        return pruned or removed
+
+    @timed('docker.remove_images')
+    def remove_images(self, selection=None):
+        """Remove all or selected docker images, each exactly once.
+
+        Without selection unused images are pruned in bulk first. The rest
+        is removed in waves so a parent goes only after all its children are
+        gone, which avoids conflicts on layered images.
+        """
+        if selection and selection.older_than and not selection.min_size:
+            return self._prune(self.client.images, 'ImagesDeleted',
+                               selection.prune_filters(dangling=False))
+        pruned = False
+        if selection is None:
+            pruned = self._prune(self.client.images, 'ImagesDeleted',
+                                 {'dangling': False})
+        images = self.client.images.list(
+            filters=selection and selection.list_filters())
+        if selection:
+            # inspected images are created at an RFC 3339 timestamp
+            images = [image for image in images if selection.match(
+                parse_timestamp(image.attrs.get('Created')),
+                image.attrs.get('Size'))]
+        # a single image needs no order, parents cost one more listing
+        parents = self.parent_ids(self.client.api.images(
+            all=True)) if len(images) > 1 else None
+        removed = False
+        for wave in self.image_waves(images, parents):
+            removed |= self._remove_each(
+                wave, lambda image: self.client.images.remove(
+                    image=image.short_id, force=True))
+        return pruned or removed
+
+    @staticmethod
+    def parent_ids(listing):
+        """Map image IDs of listing of all images to their parent IDs."""
+        return dict((image['Id'], image.get('ParentId')) for image in listing)
+
+    @staticmethod
+    def image_waves(images, parents=None):
+        """Split images into removal waves, children before parents.
+
+        Duplicated image IDs are dropped, images of a single wave do not
+        depend on each other. Parents maps IDs of all images to their
+        parent IDs: listings leave intermediate images out, so an image is
+        linked to its nearest listed ancestor through them.
+        """
+        by_id, unique = {}, []
         for image in images:
-            logging.info('rm %s', image)
-            self.client.images.remove(image=image.short_id, force=True)
-        return bool(images)
-
-    def remove_volumes(self):
-        """Remove all docker volumes."""
-        volumes = self.client.volumes.list()
-        for volume in volumes:
-            logging.info('rm %s', volume)
-            volume.remove(force=True)
-        return bool(volumes)
+            if image.id not in by_id:
+                by_id[image.id] = image
+                unique.append(image)
+        parents = dict(parents or {})
+        for image in unique:
+            parents.setdefault(image.id, image.attrs.get('ParentId'))
+        links, children = {}, dict.fromkeys(by_id, 0)
+        for image in unique:
+            parent, seen = parents.get(image.id), set()
+            while parent and parent not in by_id and parent not in seen:
+                seen.add(parent)
+                parent = parents.get(parent)
+            if parent in by_id:
+                links[image.id] = parent
+                children[parent] += 1
+
+        wave = [image for image in unique if not children[image.id]]
+        while wave:
+            yield wave
+            ready = []
+            for image in wave:
+                parent = links.get(image.id)
+                if parent:
+                    children[parent] -= 1
+                    if not children[parent]:
+                        ready.append(by_id[parent])
+            wave = ready
+
+    @timed('docker.remove_networks')
+    def remove_networks(self, selection=None):
+        """Remove all or selected networks not used by any container.
+
+        Networks are pruned only, the ones in use are kept by the daemon.
+        Selection by dangling or size skips networks.
+        """
+        if selection and selection.skips('networks'):
+            return False
+        filters = selection.prune_filters() if selection else None
+        return self._prune(self.client.networks, 'NetworksDeleted', filters)
+
+    @timed('docker.remove_build_cache')
+    def remove_build_cache(self, selection=None):
+        """Remove build cache not used by running builds.
+
+        Build cache is selected by age only, other selections skip it.
+        """
+        filters = build_cache_filters(selection)
+        if filters is None:
+            return False
+        try:
+            result = self.client.api.prune_builds(filters=filters or None)
+        except TypeError:  # docker SDK < 4 prunes build cache without filters
+            if filters:
+                logging.info('Build cache age requires newer docker SDK')
+                return False
+            result = self.client.api.prune_builds()
+        return self._pruned(result, 'CachesDeleted')
+
+    def df(self):  # pylint: disable=invalid-name
+        """Get disk usage of every object as `docker system df` does."""
+        return self.client.df()
+
+    @timed('docker.remove_volumes')
+    def remove_volumes(self, selection=None):
+        """Remove all or selected docker volumes.
+
+        Without selection unused volumes are pruned in bulk first, the ones
+        prune keeps (e.g. named volumes on newer daemons) are removed one by
+        one. Daemon does not filter volumes by age, so it is checked against
+        the listing. Selection by size skips volumes.
+        """
+        if selection and selection.skips('volumes'):
+            return False
+        pruned = False
+        if selection is None:
+            pruned = self._prune(self.client.volumes, 'VolumesDeleted')
+        volumes = self.client.volumes.list(
+            filters=selection and selection.list_filters())
+        if selection:
+            volumes = [volume for volume in volumes if selection.match(
+                parse_timestamp(volume.attrs.get('CreatedAt')))]
+        removed = self._remove_each(
+            volumes, lambda volume: volume.remove(force=True))
+        return pruned or removed
@@ -0,0 +1,188 @@
+"""Archive manifests for incremental archiving and restore."""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+
+from banneret.archive import FORMATS, extract_archive, make_archive, walk
+from banneret.pool import WORKERS, pmap
+
+SUFFIX = '.manifest.json'
+CHUNK = 1024 * 1024
+
+
+def digest(path):
+    """Get content hash of a file."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def scan(root_dir, previous=None, workers=WORKERS, ignore=None):
+    """Describe project tree as {'files': ..., 'folders': ...} manifest part.
+
+    Files map to [size, mtime, hash]; hashes of files with the same size and
+    mtime as in previous manifest are reused, the rest are computed in
+    parallel.
+    """
+    known = previous['files'] if previous else {}
+    files, folders, todo = {}, [], []
+    for path, arcname, is_dir in walk(root_dir, ignore=ignore):
+        arcname = arcname.replace(os.sep, '/')
+        if is_dir:
+            folders.append(arcname)
+            continue
+        stat = os.stat(path)
+        entry = [stat.st_size, stat.st_mtime]
+        old = known.get(arcname)
+        if old and old[:2] == entry:
+            entry.append(old[2])
+        else:
+            todo.append((path, entry))
+        files[arcname] = entry
+    for (_, entry), sha1 in zip(todo, pmap(digest, [path for path, _ in todo],
+                                           workers)):
+        entry.append(sha1)
+    return {'files': files, 'folders': folders}
+
+
+def diff(previous, current):
+    """Get (changed, deleted) paths between two manifests.
+
+    Changed are new or modified files and new folders, deleted are files
+    and folders missing from current manifest, folders end with a slash.
+    """
+    old_files, new_files = previous['files'], current['files']
+    old_folders, new_folders = set(previous['folders']), set(
+        current['folders'])
+    changed = list(new_folders - old_folders)
+    changed += [name for name, entry in new_files.items()
+                if name not in old_files or old_files[name][2] != entry[2]]
+    deleted = [name for name in old_files if name not in new_files]
+    deleted += [folder + '/' for folder in old_folders - new_folders]
+    return sorted(changed), sorted(deleted)
+
+
+def read(archive_name):
+    """Read manifest of given archive."""
+    with open(archive_name + SUFFIX) as manifest_file:
+        return json.load(manifest_file)
+
+
+def write(archive_name, manifest):
+    """Write manifest next to given archive."""
+    with open(archive_name + SUFFIX, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+
+def chain(base_name, archive_format='zip'):
+    """Get archives of base_name ordered from full archive to last delta.
+
+    Only archives of given format form the chain, archives in other formats
+    are left be. Unknown format has no chain.
+    """
+    if archive_format not in FORMATS:
+        return []
+    folder, name = os.path.split(base_name)
+    pattern = re.compile(r'%s(\.delta(\d+))?%s%s$' % (
+        re.escape(name), re.escape(FORMATS[archive_format].extension),
+        re.escape(SUFFIX)))
+    archives = []
+    for entry in os.listdir(folder or os.curdir):
+        match = pattern.match(entry)
+        if match:
+            number = int(match.group(2) or 0)
+            archive_name = os.path.join(folder, entry[:-len(SUFFIX)])
+            archives.append((number, archive_name))
+    return [archive_name for _, archive_name in sorted(archives)]
+
+
+def archive_full(base_name, root_dir, archive_format='zip', level=None,
+                 **options):
+    """Create full archive with manifest, dropping deltas of older chain.
+
+    Archive is built under a temporary name and the older chain is dropped
+    only once it is complete, so a failure keeps the last good archive.
+    Options are workers and ignore.
+    """
+    partial = base_name + '.partial'
+    try:
+        temp_name = make_archive(partial, root_dir, archive_format, level,
+                                 **options)
+        manifest = scan(root_dir, **options)
+        manifest.update(base=None, deleted=[])
+        write(temp_name, manifest)
+    except BaseException:
+        remove(*[partial + description.extension + suffix
+                 for description in FORMATS.values()
+                 for suffix in ('', SUFFIX)])
+        raise
+    remove(*[path for archive_name in chain(base_name, archive_format)
+             for path in (archive_name, archive_name + SUFFIX)])
+    archive_name = base_name + temp_name[len(partial):]
+    os.rename(temp_name, archive_name)
+    os.rename(temp_name + SUFFIX, archive_name + SUFFIX)
+    return archive_name
+
+
+def remove(*paths):
+    """Remove files, missing ones are skipped."""
+    for path in paths:
+        if os.path.exists(path):
+            logging.debug('rm %s', path)
+            os.remove(path)
+
+
+def archive_delta(base_name, root_dir, archive_format='zip', level=None,
+                  **options):
+    """Create delta archive against the last archive of base_name chain.
+
+    Delta contains only new and changed files, deleted paths are listed in
+    its manifest. Full archive is created if there is no chain yet, None is
+    returned if nothing has changed. Options are workers and ignore.
+    """
+    archives = chain(base_name, archive_format)
+    if not archives:
+        logging.info('No previous archive - creating full one')
+        return archive_full(base_name, root_dir, archive_format, level,
+                            **options)
+    previous = read(archives[-1])
+    manifest = scan(root_dir, previous, **options)
+    changed, deleted = diff(previous, manifest)
+    if not changed and not deleted:
+        return None
+    delta_name = '%s.delta%d' % (base_name, len(archives))
+    archive_name = make_archive(delta_name, root_dir, archive_format, level,
+                                only=set(changed), **options)
+    manifest.update(base=os.path.basename(archives[-1]), deleted=deleted)
+    write(archive_name, manifest)
+    return archive_name
+
+
+def restore(archive_name, target):
+    """Rebuild project tree in target from archive and all its bases."""
+    folder = os.path.dirname(archive_name)
+    archives = []
+    while archive_name:
+        archives.append((archive_name, read(archive_name)))
+        base = archives[-1][1]['base']
+        archive_name = base and os.path.join(folder, base)
+    for name, manifest in reversed(archives):
+        delete(manifest['deleted'], target)
+        extract_archive(name, target)
+
+
+def delete(names, target):
+    """Delete files and folders (ending with a slash) listed in manifest."""
+    for name in names:
+        path = os.path.join(target, *name.rstrip('/').split('/'))
+        logging.debug('rm %s', path)
+        if name.endswith('/'):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,124 @@
+"""User folders and IDE settings locations resolved on first use."""
+
+import getpass
+import os
+import sys
+
+LAYOUTS = {
+    'darwin': {
+        'configs': '{home}/Library/Preferences',
+        'caches': '{home}/Library/Caches',
+        'plugins': '{home}/Library/Application Support',
+        'logs': '{home}/Library/Logs',
+        'system': '{home}/Library/Caches',
+    },
+    'linux': {
+        'configs': '{home}/.{{version}}/config',
+        'caches': '{home}/.{{version}}/system/caches',
+        'plugins': '{home}/.{{version}}/config/plugins',
+        'logs': '{home}/.{{version}}/system/log',
+        'system': '{home}/.{{version}}/system',
+    },
+}
+
+
+def platform():
+    """Get LAYOUTS key of current platform, None if it is unsupported."""
+    if sys.platform == 'darwin':
+        return 'darwin'
+    if sys.platform.startswith('linux'):
+        return 'linux'
+    return None
+
+
+class lazy(object):  # pylint: disable=invalid-name,too-few-public-methods
+    """Property computed on first access and cached in the instance."""
+
+    def __init__(self, func):
+        """Wrap method computing the value."""
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        """Compute value once, later lookups hit the instance dict."""
+        if instance is None:
+            return self
+        value = instance.__dict__[self.func.__name__] = self.func(instance)
+        return value
+
+
+class Paths(object):
+    """Locations of current user, nothing is looked up until requested.
+
+    Settings locations of Linux are templates with {version} placeholder,
+    all of them are None on unsupported platforms.
+    """
+
+    @lazy
+    def user(self):
+        """Get name of current user."""
+        return getpass.getuser()
+
+    @lazy
+    def home(self):
+        """Get home folder of current user."""
+        homes = {'darwin': '/Users/%s', 'linux': '/home/%s'}
+        key = platform()
+        return homes[key] % self.user if key else None
+
+    @lazy
+    def pwd(self):
+        """Get current working folder."""
+        return os.getcwd()
+
+    def _layout(self, name):
+        key = platform()
+        return LAYOUTS[key][name].format(home=self.home) if key else None
+
+    @lazy
+    def configs(self):
+        """Get IDE configurations location."""
+        return self._layout('configs')
+
+    @lazy
+    def caches(self):
+        """Get IDE caches location."""
+        return self._layout('caches')
+
+    @lazy
+    def plugins(self):
+        """Get IDE plugins location."""
+        return self._layout('plugins')
+
+    @lazy
+    def logs(self):
+        """Get IDE logs location."""
+        return self._layout('logs')
+
+    @lazy
+    def system(self):
+        """Get IDE system folders (caches, indexes) location."""
+        return self._layout('system')
+
+    @lazy
+    def desktop(self):
+        """Get default archive target."""
+        return '%s/Desktop' % self.home
+
+    @lazy
+    def projects(self):
+        """Get PyCharm projects folder."""
+        return '%s/PycharmProjects' % self.home
+
+    @lazy
+    def trash(self):
+        """Get trash folder of fast clean."""
+        return '%s/.bnrt-trash' % self.home
+
+    @lazy
+    def du_cache(self):
+        """Get disk usage cache file."""
+        return '%s/.bnrt-du.json' % self.home
+
+
+paths = Paths()  # pylint: disable=invalid-name
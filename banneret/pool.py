@@ -0,0 +1,43 @@
+"""Thread pool helpers."""
+
+from contextlib import contextmanager
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+WORKERS = min(32, cpu_count() + 4)
+
+
+def pmap(func, items, workers=WORKERS, pool=None):
+    """Apply function to every item using a bounded pool of threads.
+
+    Results are returned in the order of items, the first exception raised
+    by a worker is re-raised in the caller. Pool of `shared_pool` is used
+    instead of a new one if given.
+    """
+    items = list(items)
+    if len(items) < 2 or workers < 2:
+        return [func(item) for item in items]
+    if pool is not None:
+        return pool.map(func, items)
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+@contextmanager
+def shared_pool(workers=WORKERS):
+    """Create pool of threads shared by concurrent `pmap` calls.
+
+    Total number of threads stays bounded however many callers run at
+    once. Functions run on the pool must not use it themselves, otherwise
+    they may wait for each other forever.
+    """
+    pool = ThreadPool(workers)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.join()
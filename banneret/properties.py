@@ -0,0 +1,194 @@
+"""Java properties and JVM options files editing."""
+
+import logging
+import os
+import re
+import tempfile
+
+KEY = re.compile(r'\s*((?:[^\s=:\\]|\\.)+)')
+SEPARATOR = re.compile(r'\s*[=:]?\s*')
+
+# JVM options with value glued to the name, e.g. -Xmx2g
+SIZE_OPTIONS = ('Xmx', 'Xms', 'Xss', 'Xmn')
+
+
+def _continued(line):
+    """Check if logical line goes on, i.e. ends with odd backslashes."""
+    line = line.rstrip('\r\n')
+    return (len(line) - len(line.rstrip('\\'))) % 2 == 1
+
+
+def _unescape(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+class Properties(object):
+    """Properties file keeping its layout, comments and order of keys.
+
+    File is parsed once into an index of key to its physical lines, values
+    are replaced without touching the rest of the file.
+    """
+
+    def __init__(self, lines=()):
+        """Parse lines of a properties file."""
+        self.lines = list(lines)
+        self.index = {}
+        self._parse()
+
+    def _parse(self):
+        start = 0
+        while start < len(self.lines):
+            end = start
+            while _continued(self.lines[end]) and end + 1 < len(self.lines):
+                end += 1
+            line = self.lines[start].lstrip()
+            if line.strip() and not line.startswith(('#', '!')):
+                match = KEY.match(line)
+                if match:
+                    self.index[_unescape(match.group(1))] = (start, end + 1)
+            start = end + 1
+
+    @classmethod
+    def read(cls, path):
+        """Read properties file, missing file has no properties."""
+        try:
+            with open(path) as properties:
+                return cls(properties.readlines())
+        except IOError:
+            logging.debug('No properties file %s', path)
+            return cls()
+
+    def __contains__(self, key):
+        """Check if key is set."""
+        return key in self.index
+
+    def _logical(self, start, end):
+        """Join physical lines of a logical one."""
+        text = ''
+        for number in range(start, end):
+            line = self.lines[number].rstrip('\r\n')
+            if number > start:
+                line = line.lstrip()
+            if number < end - 1:
+                line = line[:-1]
+            text += line
+        return text.lstrip()
+
+    def get(self, key, default=None):
+        """Get value of key, continuation lines are joined."""
+        if key not in self.index:
+            return default
+        text = self._logical(*self.index[key])
+        text = text[KEY.match(text).end():]
+        return _unescape(text[SEPARATOR.match(text).end():])
+
+    def set(self, key, value):
+        """Set key to value, return False if it already has this value."""
+        if self.get(key) == value:
+            return False
+        line = self._format(key, value)
+        if key in self.index:
+            start = self.index[key][0]
+            self._replace(key, [line])
+            self.index[key] = (start, start + 1)
+        else:
+            if self.lines and not self.lines[-1].endswith('\n'):
+                self.lines[-1] += '\n'
+            self.lines.append(line)
+            self.index[key] = (len(self.lines) - 1, len(self.lines))
+        return True
+
+    def remove(self, key):
+        """Remove key, return False if it is not set."""
+        if key not in self.index:
+            return False
+        self._replace(key, [])
+        del self.index[key]
+        return True
+
+    def _replace(self, key, lines):
+        """Replace lines of key, lines of the keys below are shifted."""
+        start, end = self.index[key]
+        self.lines[start:end] = lines
+        shift = len(lines) - (end - start)
+        for other, (other_start, other_end) in list(self.index.items()):
+            if shift and other_start > start:
+                self.index[other] = (other_start + shift, other_end + shift)
+
+    @staticmethod
+    def _format(key, value):
+        return '%s=%s\n' % (key, value)
+
+    def update(self, values):
+        """Set every key of values dict, return True if anything changed."""
+        changed = [self.set(key, value) for key, value in values.items()]
+        return any(changed)
+
+    def write(self, path):
+        """Write properties atomically via a temp file in the same folder."""
+        path = os.path.realpath(path)
+        folder, name = os.path.split(path)
+        descriptor, temp = tempfile.mkstemp(prefix='.%s.' % name,
+                                            dir=folder)
+        try:
+            with os.fdopen(descriptor, 'w') as properties:
+                properties.writelines(self.lines)
+                properties.flush()
+                os.fsync(properties.fileno())
+            mode = 0o644
+            if os.path.exists(path):
+                mode = os.stat(path).st_mode & 0o7777
+            os.chmod(temp, mode)
+            os.rename(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+
+
+def vm_option(option):
+    """Split JVM option like -Xmx2g or -Dkey=value into (key, value).
+
+    Leading dash is optional, key is the option name without it.
+    """
+    option = option.strip().lstrip('-')
+    for name in SIZE_OPTIONS:
+        if option.startswith(name):
+            return name, option[len(name):]
+    key, _, value = option.partition('=')
+    return key, value
+
+
+class VmOptions(Properties):
+    """JVM options file with an option per line, keys are `vm_option` ones.
+
+    Options without value (e.g. -XX:+UseG1GC) have empty string value.
+    """
+
+    def _parse(self):
+        for number, line in enumerate(self.lines):
+            if line.strip() and not line.lstrip().startswith('#'):
+                self.index[vm_option(line)[0]] = (number, number + 1)
+
+    def get(self, key, default=None):
+        """Get value of option."""
+        if key not in self.index:
+            return default
+        return vm_option(self.lines[self.index[key][0]])[1]
+
+    @staticmethod
+    def _format(key, value):
+        if key in SIZE_OPTIONS:
+            return '-%s%s\n' % (key, value)
+        return '-%s=%s\n' % (key, value) if value else '-%s\n' % key
+
+
+def edit(path, values, kind=Properties):
+    """Set values in file of given kind, return True if anything changed.
+
+    File is read once and written only if a value actually changes.
+    """
+    properties = kind.read(path)
+    if not properties.update(values):
+        return False
+    properties.write(path)
+    return True
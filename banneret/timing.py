@@ -0,0 +1,135 @@
+"""Timing spans of command phases, collected only when enabled."""
+
+import functools
+import json
+import threading
+import time
+from collections import namedtuple
+
+# wall clock of Python 2 as the last resort
+CLOCK = getattr(time, 'perf_counter', time.time)
+
+Span = namedtuple('Span', 'name start duration depth thread')
+Phase = namedtuple('Phase', 'name calls total longest')
+
+
+class _NoSpan(object):  # pylint: disable=too-few-public-methods
+    """Context manager doing nothing, shared by all disabled spans."""
+
+    def __enter__(self):
+        """Enter nothing."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Exit nothing."""
+        return False
+
+
+class _ActiveSpan(object):  # pylint: disable=too-few-public-methods
+    """Context manager recording its block as a span of timer."""
+
+    def __init__(self, owner, name):
+        """Create span of given name recorded by owner timer."""
+        self.timer = owner
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        """Start timing, nested spans go one level deeper."""
+        self.timer.local.depth = getattr(self.timer.local, 'depth', 0) + 1
+        self.start = CLOCK()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop timing and record the span, even if block raised."""
+        end = CLOCK()
+        self.timer.local.depth -= 1
+        self.timer.record(Span(
+            self.name, self.start - self.timer.started, end - self.start,
+            self.timer.local.depth, threading.current_thread().name))
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Timer(object):
+    """Collector of named spans of time, a no-op until enabled.
+
+    Spans may be nested and opened concurrently by worker threads, every
+    thread keeps its own nesting depth. Span start is relative to `enable`.
+    """
+
+    def __init__(self):
+        """Create disabled timer."""
+        self.enabled = False
+        self.started = None
+        self.stopped = None
+        self.spans = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def enable(self):
+        """Drop recorded spans and start collecting new ones."""
+        self.spans = []
+        self.started = CLOCK()
+        self.stopped = None
+        self.enabled = True
+
+    def disable(self):
+        """Stop collecting spans, recorded ones are kept."""
+        self.stopped = CLOCK()
+        self.enabled = False
+
+    def span(self, name):
+        """Get context manager timing its block as span name."""
+        return _ActiveSpan(self, name) if self.enabled else NO_SPAN
+
+    def record(self, span):
+        """Add finished span."""
+        with self.lock:
+            self.spans.append(span)
+
+    def elapsed(self):
+        """Get seconds since `enable` till `disable` or now."""
+        return (self.stopped or CLOCK()) - self.started
+
+    def phases(self):
+        """Get calls, total and longest duration of every span name.
+
+        Durations of nested and concurrent spans overlap, so totals may add
+        up to more than `elapsed`. The longest phases go first.
+        """
+        phases = {}
+        for span in self.spans:
+            calls, total, longest = phases.get(span.name, (0, 0, 0))
+            phases[span.name] = (calls + 1, total + span.duration,
+                                 max(longest, span.duration))
+        return sorted((Phase(name, *phase) for name, phase in phases.items()),
+                      key=lambda phase: (-phase.total, phase.name))
+
+    def save(self, path):
+        """Write elapsed time and all recorded spans to JSON file."""
+        with open(path, 'w') as output:
+            json.dump({'elapsed': self.elapsed(),
+                       'spans': [span._asdict() for span in self.spans]},
+                      output, indent=2)
+
+
+timer = Timer()  # pylint: disable=invalid-name
+
+
+def timed(name):
+    """Decorate function to time its calls as span name.
+
+    Disabled timer costs a single attribute lookup per call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not timer.enabled:
+                return func(*args, **kwargs)
+            with _ActiveSpan(timer, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
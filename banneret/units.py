@@ -0,0 +1,38 @@
+"""Sizes and durations parsing and formatting."""
+
+import re
+
+UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60,
+             'w': 7 * 24 * 60 * 60}
+
+
+def format_size(size):
+    """Format size in bytes for humans."""
+    size = float(size)
+    for unit in UNITS[:-1]:
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = UNITS[-1]
+    return ('%d %s' if unit == 'B' else '%.1f %s') % (size, unit)
+
+
+def parse_size(size):
+    """Convert size like 512, 100K, 1.5G or 2GB to bytes."""
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)B?\s*$', size, re.I)
+    if not match:
+        raise ValueError('Wrong size: %s' % size)
+    number, unit = match.groups()
+    power = UNITS.index((unit.upper() + 'B') if unit else 'B')
+    return int(float(number) * 1024 ** power)
+
+
+def parse_duration(duration):
+    """Convert duration like 90s, 30m, 12h, 7d or 2w to seconds."""
+    match = re.match(r'^\s*(\d+)\s*([smhdw])\s*$', duration, re.I)
+    if not match:
+        raise ValueError('Wrong duration: %s' % duration)
+    number, unit = match.groups()
+    return int(number) * DURATIONS[unit.lower()]
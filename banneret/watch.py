@@ -0,0 +1,170 @@
+"""Disk usage watch evicting IDE caches and docker objects, oldest first."""
+
+import logging
+import os
+import time
+from collections import namedtuple
+
+from banneret.main import ALIASES, Selection, version_key
+from banneret.paths import paths
+from banneret.timing import timed
+
+DOCKER_ROOT = '/var/lib/docker'
+# docker objects are removed by age, older ones go first
+DOCKER_AGES = ((4 * 7 * 24 * 3600, '4w'), (7 * 24 * 3600, '1w'),
+               (24 * 3600, '1d'), (3600, '1h'))
+# smaller change of used share between polls means the system is idle
+IDLE_CHANGE = 0.001
+
+Step = namedtuple('Step', 'name evict')
+
+
+def used_share(path):
+    """Get used share of the file system holding path, None if missing.
+
+    Space reserved for root is left out, like df does.
+    """
+    try:
+        stat = os.statvfs(path)
+    except OSError:
+        return None
+    used = stat.f_blocks - stat.f_bfree
+    if not used + stat.f_bavail:
+        return None
+    return float(used) / (used + stat.f_bavail)
+
+
+def device(path):
+    """Get ID of the device holding path, None if missing."""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+class Watcher(object):  # pylint: disable=too-many-instance-attributes
+    """Keep used share of disks between low and high watermarks.
+
+    Usage is polled with a statvfs call per disk, roots on the same disk
+    are polled once. Once a disk is used above high share, its data is
+    evicted, oldest first, until usage drops below low share: caches of
+    old IDE versions (the newest keep versions of every IDE stay), then
+    docker objects older than 4 weeks, a week, a day and an hour.
+    Containers, images, networks and build cache are pruned, while old
+    volumes are force-removed one by one as the daemon can not prune them
+    by age; the daemon refuses to remove running containers and volumes in
+    use, such failures are logged. Polling interval doubles up to
+    max_interval while usage stands still.
+    """
+
+    def __init__(self, bnrt, high=0.9, low=0.8, **options):
+        """Create watcher of IDE caches and docker_root if it is given.
+
+        Options are interval (60) and max_interval (900) in seconds, keep
+        (1), docker_root and asynchronous (False).
+        """
+        self.bnrt = bnrt
+        self.high = high
+        self.low = low
+        self.interval = options.pop('interval', 60)
+        self.max_interval = options.pop('max_interval', 900)
+        self.keep = options.pop('keep', 1)
+        self.docker_root = options.pop('docker_root', DOCKER_ROOT)
+        self.asynchronous = options.pop('asynchronous', False)
+        if options:
+            raise TypeError('Unknown watcher options: %s'
+                            % ', '.join(sorted(options)))
+        self.delay = self.interval
+        self.shares = {}
+
+    def disks(self):
+        """Get {device: roots} of watched roots, missing ones are skipped."""
+        roots = [self.bnrt.locate(paths.caches)[0]]
+        if self.docker_root:
+            roots.append(self.docker_root)
+        disks = {}
+        for root in roots:
+            key = device(root)
+            if key is None:
+                logging.debug('No watched folder %s', root)
+            else:
+                disks.setdefault(key, []).append(root)
+        return disks
+
+    def steps(self, root):
+        """Get eviction steps freeing space in root, oldest data first."""
+        if root == self.docker_root:
+            return [Step('docker objects older than %s' % name,
+                         self._docker_eviction(age))
+                    for age, name in DOCKER_AGES]
+        self.bnrt.index.forget(self.bnrt.locate(paths.caches)[0])
+        old = []
+        for ide in sorted(set(ALIASES.values())):
+            old.extend((version_key(version), ide + version) for version in
+                       self.bnrt.versions(ide, caches=True)[self.keep:])
+        return [Step('%s caches' % name, self._ide_eviction(name))
+                for _, name in sorted(old)]
+
+    def _ide_eviction(self, version):
+        return lambda: self.bnrt.remove_all(version, caches=True)
+
+    def _docker_eviction(self, age):
+        return lambda: self.bnrt.clean_docker(
+            selection=Selection(older_than=age),
+            asynchronous=self.asynchronous, networks=True, build_cache=True)
+
+    @timed('watch.evict')
+    def evict(self, roots):
+        """Evict data of roots on one disk until it is used below low share.
+
+        Failed steps are logged and skipped, so the watch goes on.
+        """
+        evicted = False
+        for root in roots:
+            for step in self.steps(root):
+                share = used_share(root)
+                if share is None or share < self.low:
+                    return evicted
+                logging.info('Evict %s, disk is %.1f%% full', step.name,
+                             share * 100)
+                try:
+                    evicted |= bool(step.evict())
+                except (IOError, OSError) as error:
+                    logging.info('Failed to evict %s: %s', step.name, error)
+        if (used_share(roots[0]) or 0) >= self.low:
+            logging.info('Nothing else to evict from %s', ', '.join(roots))
+        return evicted
+
+    def check(self):
+        """Poll usage once, evict if needed, get seconds till the next poll.
+
+        Polls back off while used share of every disk stands still.
+        """
+        busy = False
+        shares = {}
+        for key, roots in sorted(self.disks().items()):
+            share = used_share(roots[0])
+            if share is None:
+                continue
+            if share >= self.high:
+                busy |= self.evict(roots)
+                share = used_share(roots[0]) or share
+            busy |= abs(share - self.shares.get(key, -1)) >= IDLE_CHANGE
+            shares[key] = share
+        self.shares = shares
+        if busy:
+            self.delay = self.interval
+        else:
+            self.delay = min(self.delay * 2, self.max_interval)
+        logging.debug('Next poll in %ds', self.delay)
+        return self.delay
+
+    def run(self, polls=None, sleep=time.sleep):
+        """Poll usage given number of times, forever by default."""
+        done = 0
+        while True:
+            delay = self.check()
+            done += 1
+            if polls is not None and done >= polls:
+                return
+            sleep(delay)
@@ -0,0 +1 @@
+"""Banneret benchmarks."""
@@ -0,0 +1,52 @@
+"""Compare archive formats by wall time and output size.
+
+Run with ``python -m benchmarks.archive_formats``.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import click
+
+from banneret.archive import FORMATS, make_archive
+from benchmarks.synthetic import create_project
+
+
+@click.command()
+@click.option('--files', default=2000, help='Number of files.')
+@click.option('--depth', default=4, help='Folders nesting level.')
+@click.option('--size', default=32 * 1024, help='Size of each file.')
+@click.option('-l', '--level', 'levels', type=int, multiple=True,
+              help='Levels to compare, format default if omitted.')
+def main(files, depth, size, levels):
+    """Archive synthetic project in every available format."""
+    workdir = tempfile.mkdtemp()
+    try:
+        project = create_project(os.path.join(workdir, 'project'), files,
+                                 depth, size)
+        total = files * size
+        click.echo('%-8s %5s %10s %12s %7s' % (
+            'format', 'level', 'seconds', 'bytes', 'ratio'))
+        for archive_format in sorted(FORMATS):
+            for level in levels or [None]:
+                if level is not None and level not in FORMATS[
+                        archive_format].levels:
+                    continue
+                base_name = os.path.join(workdir, 'archive')
+                start = time.time()
+                name = make_archive(base_name, project, archive_format, level)
+                elapsed = time.time() - start
+                archive_size = os.path.getsize(name)
+                os.remove(name)
+                click.echo('%-8s %5s %10.3f %12d %7.3f' % (
+                    archive_format,
+                    '-' if level is None else level,
+                    elapsed, archive_size, float(archive_size) / total))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
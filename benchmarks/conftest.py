@@ -0,0 +1,89 @@
+"""Benchmark options and fixtures, see `make bench`."""
+
+import os
+from collections import namedtuple
+
+import pytest
+
+from banneret import Banneret
+from banneret.paths import paths
+from benchmarks.synthetic import create_project, create_settings
+from tests.fake_docker import FakeDocker
+
+Scale = namedtuple('Scale', 'files depth size versions objects latency')
+
+VERSIONS = ['PyCharm2017.%d' % minor for minor in range(1, 10)]
+
+
+def pytest_addoption(parser):
+    """Add options scaling synthetic trees and Docker objects."""
+    group = parser.getgroup('banneret benchmarks')
+    group.addoption('--bench-files', type=int, default=200,
+                    help='Files in every settings and project tree.')
+    group.addoption('--bench-depth', type=int, default=3,
+                    help='Folders nesting level of trees.')
+    group.addoption('--bench-size', type=int, default=4096,
+                    help='Bytes in every file.')
+    group.addoption('--bench-versions', type=int, default=3,
+                    help='IDE versions with settings, at most 9.')
+    group.addoption('--bench-objects', type=int, default=1000,
+                    help='Docker objects of every kind.')
+    group.addoption('--bench-latency', type=float, default=0,
+                    help='Seconds fake Docker daemon spends per request.')
+
+
+@pytest.fixture(scope='session')
+def scale(request):
+    """Get sizes given by options."""
+    option = request.config.getoption
+    return Scale(option('--bench-files'), option('--bench-depth'),
+                 option('--bench-size'), option('--bench-versions'),
+                 option('--bench-objects'), option('--bench-latency'))
+
+
+@pytest.fixture
+def bnrt():
+    """Get application instance."""
+    return Banneret()
+
+
+@pytest.fixture
+def settings(tmpdir, monkeypatch, scale):
+    """Get function (re)creating settings of versions in a temp home."""
+    home = tmpdir.mkdir('home').strpath
+    versions = VERSIONS[:scale.versions]
+
+    def create():
+        locations = create_settings(home, versions, scale.files,
+                                    depth=scale.depth, size=scale.size)
+        for kind, location in locations.items():
+            monkeypatch.setattr(paths, kind, location)
+        return versions
+
+    monkeypatch.setattr(paths, 'home', home)
+    monkeypatch.setattr(paths, 'trash', os.path.join(home, '.bnrt-trash'))
+    return create
+
+
+@pytest.fixture(scope='session')
+def project(tmpdir_factory, scale):
+    """Get project folder with synthetic sources."""
+    return create_project(tmpdir_factory.mktemp('projects').join('project'),
+                          scale.files, scale.depth, scale.size)
+
+
+@pytest.fixture(scope='session')
+def fake_docker():
+    """Get fake Docker daemon running for the whole session."""
+    daemon = FakeDocker().start()
+    yield daemon
+    daemon.stop()
+
+
+@pytest.fixture
+def docker_host(fake_docker, monkeypatch, scale):
+    """Point Docker SDK to the fake daemon."""
+    pytest.importorskip('docker')
+    fake_docker.latency = scale.latency
+    monkeypatch.setenv('DOCKER_HOST', fake_docker.url)
+    return fake_docker
@@ -0,0 +1,72 @@
+"""Synthetic trees for benchmarks."""
+
+import os
+import random
+
+from banneret.main import KINDS
+from banneret.paths import LAYOUTS, platform
+
+WORDS = ['def', 'class', 'return', 'import', 'self', 'value', 'result',
+         'logging', 'folder', 'version', 'path', 'for', 'in', 'if', 'else']
+
+
+def create_project(root, files=500, depth=3, size=16 * 1024, **options):
+    """Create project tree with mostly source-like and some random files.
+
+    Files are spread over folders nested up to depth levels, binary option
+    is a share of incompressible files (0.1). Same seed option produces the
+    same tree.
+    """
+    rng = random.Random(options.get('seed', 0))
+    binary = options.get('binary', 0.1)
+    root = str(root)
+    folders = [root]
+    for i in range(max(1, files // 20)):
+        parent = rng.choice(folders)
+        if parent.count(os.sep) - root.count(os.sep) < depth:
+            folders.append(os.path.join(parent, 'package%d' % i))
+    for folder in folders:
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    for i in range(files):
+        path = os.path.join(rng.choice(folders), 'module%d.py' % i)
+        with open(path, 'wb') as module:
+            if rng.random() < binary:
+                module.write(os.urandom(size))
+            else:
+                module.write(source(rng, size))
+    return root
+
+
+def source(rng, size):
+    """Generate compressible source-like text of given size."""
+    lines, total = [], 0
+    while total < size:
+        line = ' ' * 4 * rng.randint(0, 3) + ' '.join(
+            rng.choice(WORDS) for _ in range(rng.randint(2, 10))) + '\n'
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines).encode('ascii')[:size]
+
+
+def create_settings(home, versions, files=100, **options):
+    """Create settings of IDE versions in home laid out as on this platform.
+
+    Every settings location of a version gets a tree like `create_project`
+    one, options are its depth (2), size (1024) and seed. Locations dict
+    maps KINDS to paths to patch `paths` with.
+    """
+    locations = {}
+    for kind in KINDS:
+        location = LAYOUTS[platform()][kind].format(home=str(home))
+        locations[kind] = location
+        for version in versions:
+            if '{version}' in location:
+                folder = location.format(version=version)
+            else:
+                folder = os.path.join(location, version)
+            create_project(folder, files, options.get('depth', 2),
+                           options.get('size', 1024), binary=0,
+                           seed=options.get('seed', 0))
+    return locations
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'gztar'])
+def test_archive_project(benchmark, bnrt, project, tmpdir, archive_format):
+    target = tmpdir.mkdir('target')
+    assert benchmark(bnrt.archive_project, project, target,
+                     archive_format=archive_format)
+
+
+def test_unchanged_incremental(benchmark, bnrt, project, tmpdir):
+    target = tmpdir.mkdir('target')
+    bnrt.archive_project(project, target)
+    assert benchmark(bnrt.archive_project, project, target,
+                     incremental=True) is None
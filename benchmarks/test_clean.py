@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_remove_all(benchmark, bnrt, settings, fast):
+    def setup():
+        return settings(), {'fast': fast}
+
+    removed = benchmark.pedantic(bnrt.remove_all, setup=setup, rounds=5)
+    assert removed
+
+
+def test_plan(benchmark, bnrt, settings):
+    versions = settings()
+    assert benchmark(bnrt.plan, *versions)
+
+
+def test_normalize_version(benchmark, bnrt):
+    versions = ['pycharm2017.2', 'PyCharmCE', 'idea2018.1.2', 'ideaic',
+                'IntelliJIdea2017.3', 'pycharm']
+
+    def normalize():
+        return [bnrt.normalize_version(version) for version in versions]
+
+    assert len(benchmark(normalize)) == len(versions)
@@ -0,0 +1,48 @@
+import sys
+
+import pytest
+
+from banneret import Docker
+from banneret.main import Selection
+
+CLIENTS = ['sdk']
+AsyncDocker = None
+if sys.version_info >= (3, 5):
+    from banneret.asyncdocker import AsyncDocker
+    CLIENTS.append('async')
+
+# seed options and selection making each kind go the one by one path
+ONE_BY_ONE = {
+    'containers': ({'used': 1}, None),
+    'images': ({'used': 1, 'layers': 4}, None),
+    'volumes': ({'used': 0, 'labels': {'bench': '1'}},
+                Selection(labels=('bench',))),
+}
+
+
+@pytest.mark.parametrize('client', CLIENTS)
+@pytest.mark.parametrize('workers', [1, 8])
+@pytest.mark.parametrize('kind', sorted(ONE_BY_ONE))
+def test_remove(benchmark, docker_host, scale, kind, workers, client):
+    options, selection = ONE_BY_ONE[kind]
+    wrapper = AsyncDocker if client == 'async' else Docker
+
+    def setup():
+        docker_host.seed(**dict(options, **{kind: scale.objects}))
+        return (wrapper(workers),), {}
+
+    def remove(client):
+        return getattr(client, 'remove_' + kind)(selection)
+
+    assert benchmark.pedantic(remove, setup=setup, rounds=3)
+    assert not docker_host.count(kind)
+
+
+@pytest.mark.parametrize('client', CLIENTS)
+def test_clean_docker(benchmark, bnrt, docker_host, scale, client):
+    def setup():
+        docker_host.seed(containers=scale.objects, images=scale.objects,
+                         volumes=scale.objects)
+        return (), {'asynchronous': client == 'async'}
+
+    assert benchmark.pedantic(bnrt.clean_docker, setup=setup, rounds=3)
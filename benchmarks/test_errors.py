@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from banneret.paths import paths
+
+
+@pytest.fixture
+def configs(bnrt, settings):
+    """Get versions and their configuration folders."""
+    versions = settings()
+    return versions, bnrt.config_folders(versions)
+
+
+def test_switch(benchmark, bnrt, configs):
+    versions, folders = configs
+
+    def setup():
+        for folder in folders:
+            with open(os.path.join(folder, 'idea.properties'), 'w') as config:
+                config.write('idea.fatal.error.notification=enabled\n')
+        return versions, {'disable': True, 'path': paths.configs}
+
+    assert benchmark.pedantic(bnrt.enable_errors, setup=setup, rounds=20)
+
+
+def test_already_switched(benchmark, bnrt, configs):
+    versions, _ = configs
+    bnrt.enable_errors(*versions)
+    assert not benchmark(bnrt.enable_errors, *versions)
@@ -13,7 +13,8 @@ URL = 'https://github.com/lancelote/banneret'
 
 setup(
     name='banneret',
-    packages=find_packages(exclude=['tests', '*.test', '*.test.*']),
+    packages=find_packages(exclude=['tests', 'benchmarks', 'benchmarks.*',
+                                    '*.test', '*.test.*']),
     version=__version__,
     description='CLI helpers for PyCharm management',
     author='Pavel Karateev',
@@ -32,6 +33,8 @@ setup(
     extras_require={
         'test': ['pytest', 'pytest-mock', 'tox'],
         'lint': ['pylint', 'pydocstyle', 'pycodestyle', 'mypy'],
-        'docker': ['docker']
+        'bench': ['pytest-benchmark'],
+        'docker': ['docker'],
+        'zstd': ['zstandard']
     }
 )
@@ -6,6 +6,7 @@ from click.testing import CliRunner
 
 from banneret import Banneret, Docker
 from banneret.cli import LINUX, MACOS
+from tests.fake_docker import FakeDocker
 
 only_mac = pytest.mark.skipif(sys.platform not in MACOS, reason='Not macOS')
 only_linux = pytest.mark.skipif(sys.platform not in LINUX, reason='Not Linux')
@@ -21,6 +22,21 @@ def docker_daemon():
     return Docker()
 
 
+@pytest.fixture(scope='session')
+def fake_docker_server():
+    with FakeDocker() as server:
+        yield server
+
+
+@pytest.fixture
+def fake_docker(fake_docker_server, monkeypatch):
+    """Get empty fake daemon without latency, Docker SDK is pointed to it."""
+    fake_docker_server.seed()
+    fake_docker_server.latency = 0
+    monkeypatch.setenv('DOCKER_HOST', fake_docker_server.url)
+    return fake_docker_server
+
+
 @pytest.fixture
 def runner():
     return CliRunner()
@@ -47,11 +63,26 @@ def mock_remove_all(mocker):
     yield mocker.patch('banneret.Banneret.remove_all')
 
 
+@pytest.fixture
+def mock_reap(mocker):
+    yield mocker.patch('banneret.Banneret.reap')
+
+
+@pytest.fixture
+def mock_spawn_reaper(mocker):
+    yield mocker.patch('banneret.Banneret.spawn_reaper')
+
+
 @pytest.fixture
 def mock_archive_project(mocker):
     yield mocker.patch('banneret.Banneret.archive_project')
 
 
+@pytest.fixture
+def mock_restore_project(mocker):
+    yield mocker.patch('banneret.Banneret.restore_project')
+
+
 @pytest.fixture
 def mock_clean_docker(mocker):
     yield mocker.patch('banneret.Banneret.clean_docker')
@@ -92,3 +123,28 @@ def create_settings(base_path, versions):
             base_path.mkdir('.' + version)
     else:
         raise OSError('Unsupported OS')
+
+
+def settings_target(base_path):
+    """Get settings location to find versions in depending on the OS."""
+    if sys.platform in MACOS:
+        return base_path.strpath
+    return base_path.strpath + '/.{version}'
+
+
+def settings_folder(base_path, version):
+    """Get settings folder of version created by `create_settings`."""
+    if sys.platform in MACOS:
+        return base_path.join(version)
+    return base_path.join('.' + version)
+
+
+def create_tree(base_path):
+    """Create tree of 15 files of 30 bytes in total and an empty folder."""
+    tree = base_path.mkdir('tree')
+    for i in range(3):
+        folder = tree.mkdir('folder%d' % i).mkdir('nested')
+        for j in range(5):
+            folder.join('file%d' % j).write('x' * j)
+    tree.mkdir('empty')
+    return tree
@@ -0,0 +1,316 @@
+"""In-process fake Docker Engine API for tests and benchmarks.
+
+Only the endpoints `banneret.main.Docker` calls are implemented: listing,
+inspecting, removing and pruning of containers, images and volumes,
+pruning of networks and build cache, and system df. List and prune
+filters support label and dangling, age filters match everything.
+Point the SDK to it with DOCKER_HOST set to `FakeDocker.url`.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, unquote, urlparse
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import parse_qs, urlparse
+
+CREATED = 1514764800  # 2018-01-01
+KINDS = ('containers', 'images', 'volumes', 'networks', 'caches')
+ROUTE = re.compile(r'^(?:/v[\d.]+)?/(containers|images|volumes|networks|build'
+                   r'|system)'
+                   r'(?:/([^/]+))?(?:/(json))?$')
+
+
+def object_id(kind, number):
+    """Get 64 hex digits ID of object, short IDs of objects differ."""
+    return hashlib.sha256(('%s%d' % (kind, number)).encode()).hexdigest()
+
+
+def iso(timestamp):
+    """Format timestamp as the daemon does."""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+class FakeDocker(object):
+    """Docker daemon with seeded objects and fixed latency of every request.
+
+    Objects are dicts with id, labels, used and (for images) parent and
+    dangling keys. Used objects survive prune, images with children and
+    used volumes can not be removed, running containers are removed only
+    by force. Like the daemon, image listing leaves out intermediate
+    images unless all are asked, and image removal drops untagged parents
+    left without children. Every request is counted in `calls` by (kind,
+    action), action is one of list, inspect, remove and prune.
+    """
+
+    def __init__(self, latency=0):
+        """Create daemon without objects, see `seed`."""
+        self.latency = latency
+        self.objects = dict((kind, {}) for kind in KINDS)
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.server = None
+
+    def __enter__(self):
+        """Start serving."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop serving."""
+        self.stop()
+
+    def seed(self, used=0.5, layers=1, labels=None, **counts):
+        """Replace all objects with given number of new ones.
+
+        Counts are containers, images, volumes, networks and caches, none
+        by default. Used is a share of used objects, e.g. running
+        containers or build cache of running builds. Images form chains of
+        layers images, only tips of chains are tagged. Labels are set on
+        every object.
+        """
+        labels = labels or {}
+        images = counts.get('images', 0)
+        with self.lock:
+            self.calls.clear()
+            for kind, name in zip(KINDS, ('containers', 'images', 'volumes',
+                                          'networks', 'caches')):
+                count = counts.get(name, 0)
+                self.objects[kind] = {}
+                for number in range(count):
+                    key = object_id(kind, number)
+                    self.objects[kind][key] = {
+                        'id': key, 'labels': dict(labels),
+                        'used': number < count * used}
+            for number in range(images):
+                image = self.objects['images'][object_id('images', number)]
+                layer = number % layers
+                image['parent'] = object_id('images', number - 1) \
+                    if layer else ''
+                image['dangling'] = layer != layers - 1 and \
+                    number != images - 1
+
+    def count(self, kind):
+        """Get number of objects of kind left."""
+        return len(self.objects[kind])
+
+    @property
+    def url(self):
+        """Get DOCKER_HOST of the running server."""
+        return 'tcp://127.0.0.1:%d' % self.server.server_address[1]
+
+    def start(self):
+        """Serve API on a free local port in a background thread."""
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.fake = self
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, path):
+        """Get (status, body) of request, body is None if it is empty."""
+        # pylint: disable=too-many-return-statements
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(path)
+        match = ROUTE.match(url.path)
+        if not match:
+            return 404, {'message': 'page not found'}
+        kind, name, suffix = match.groups()
+        kind = 'caches' if kind == 'build' else kind
+        name = name and unquote(name)
+        query = dict((key, values[-1])
+                     for key, values in parse_qs(url.query).items())
+        filters = json.loads(query.get('filters') or '{}')
+        with self.lock:
+            if kind == 'system' and name == 'df':
+                return self._df()
+            if method == 'GET' and name in (None, 'json'):
+                return self._list(kind, filters, query.get('all') in (
+                    '1', 'true', 'True'))
+            if method == 'POST' and name == 'prune':
+                return self._prune(kind, filters)
+            if method == 'GET' and suffix == 'json':
+                return self._inspect(kind, name)
+            if method == 'DELETE' and not suffix:
+                return self._remove(kind, name, query.get('force') in (
+                    '1', 'true', 'True'))
+        return 405, {'message': 'not implemented'}
+
+    def _select(self, kind, filters):
+        """Get objects matching label and dangling filters."""
+        labels = [label.split('=', 1) for label in filters.get('label', [])]
+        dangling = filters.get('dangling')
+        selected = []
+        for obj in self.objects[kind].values():
+            if not all(obj['labels'].get(label[0]) == label[-1]
+                       if len(label) == 2 else label[0] in obj['labels']
+                       for label in labels):
+                continue
+            if dangling and kind != 'containers' and obj.get(
+                    'dangling', not obj['used']) != (dangling[0] == 'true'):
+                continue
+            selected.append(obj)
+        return selected
+
+    def _list(self, kind, filters, everything=False):
+        """List objects, intermediate images only if everything is asked."""
+        self.calls[kind, 'list'] += 1
+        listing = [self.describe(kind, obj)
+                   for obj in self._select(kind, filters)
+                   if everything or kind != 'images' or not (
+                       obj['dangling'] and self._children(obj))]
+        if kind == 'volumes':
+            return 200, {'Volumes': listing, 'Warnings': None}
+        return 200, listing
+
+    def _inspect(self, kind, name):
+        self.calls[kind, 'inspect'] += 1
+        obj = self._lookup(kind, name)
+        if obj is None:
+            return 404, {'message': 'No such object: %s' % name}
+        description = self.describe(kind, obj)
+        if kind == 'images':
+            description.update(Parent=description.pop('ParentId'),
+                               Created=iso(CREATED))
+        if kind == 'containers':
+            description.update(Name=description['Names'][0],
+                               Created=iso(CREATED),
+                               Config={'Labels': obj['labels']})
+        return 200, description
+
+    def _df(self):
+        self.calls['system', 'df'] += 1
+        images = self.objects['images'].values()
+        return 200, {
+            'LayersSize': 1024 * len(images),
+            'Images': [dict(self.describe('images', obj), SharedSize=0,
+                            Containers=int(obj['used'])) for obj in images],
+            'Containers': [dict(self.describe('containers', obj), SizeRw=1024)
+                           for obj in self.objects['containers'].values()],
+            'Volumes': [
+                dict(self.describe('volumes', obj), UsageData={
+                    'Size': 1024, 'RefCount': int(obj['used'])})
+                for obj in self.objects['volumes'].values()],
+            'BuildCache': [
+                {'ID': obj['id'], 'Size': 1024, 'InUse': obj['used'],
+                 'Shared': False}
+                for obj in self.objects['caches'].values()],
+        }
+
+    def _children(self, image):
+        return [other for other in self.objects['images'].values()
+                if other['parent'] == image['id']]
+
+    def _remove(self, kind, name, force):
+        self.calls[kind, 'remove'] += 1
+        obj = self._lookup(kind, name)
+        if obj is None:
+            return 404, {'message': 'No such object: %s' % name}
+        if kind == 'images' and self._children(obj):
+            return 409, {'message': 'conflict: image has dependent child '
+                                    'images'}
+        if obj['used'] and (kind == 'volumes' or not force):
+            return 409, {'message': 'conflict: %s is in use' % name}
+        del self.objects[kind][obj['id']]
+        if kind != 'images':
+            return 204, None
+        deleted = [{'Deleted': 'sha256:' + obj['id']}]
+        parent = self.objects['images'].get(obj['parent'])
+        while parent and parent['dangling'] and not self._children(parent):
+            del self.objects['images'][parent['id']]
+            deleted.append({'Deleted': 'sha256:' + parent['id']})
+            parent = self.objects['images'].get(parent['parent'])
+        return 200, deleted
+
+    def _prune(self, kind, filters):
+        self.calls[kind, 'prune'] += 1
+        if kind == 'images' and 'dangling' not in filters:
+            filters = dict(filters, dangling=['true'])
+        if filters.get('dangling') == ['false']:
+            del filters['dangling']
+        deleted = []
+        pruned = True
+        while pruned:  # parents of pruned images may become prunable
+            pruned = [obj for obj in self._select(kind, filters)
+                      if not obj['used'] and not (
+                          kind == 'images' and self._children(obj))]
+            for obj in pruned:
+                del self.objects[kind][obj['id']]
+                deleted.append(obj['id'])
+        key = '%sDeleted' % kind.capitalize()
+        return 200, {key: deleted or None, 'SpaceReclaimed': 1024 * len(
+            deleted)}
+
+    def _lookup(self, kind, name):
+        """Get object by name, ID or unique ID prefix."""
+        name = name.split(':')[-1]
+        if name in self.objects[kind]:
+            return self.objects[kind][name]
+        matches = [key for key in self.objects[kind] if key.startswith(name)]
+        return self.objects[kind][matches[0]] if len(matches) == 1 else None
+
+    @staticmethod
+    def describe(kind, obj):
+        """Get listing entry of object."""
+        if kind == 'containers':
+            return {'Id': obj['id'], 'Names': ['/c%s' % obj['id'][:8]],
+                    'Image': 'image', 'Created': CREATED,
+                    'State': 'running' if obj['used'] else 'exited',
+                    'Labels': obj['labels']}
+        if kind == 'images':
+            return {'Id': 'sha256:' + obj['id'],
+                    'ParentId': obj['parent'] and 'sha256:' + obj['parent'],
+                    'Created': CREATED, 'Size': 1024, 'Labels': obj['labels'],
+                    'RepoTags': None if obj['dangling'] else [
+                        'image%s:latest' % obj['id'][:8]]}
+        return {'Name': obj['id'], 'Driver': 'local',
+                'CreatedAt': iso(CREATED), 'Labels': obj['labels'],
+                'Mountpoint': '/var/lib/docker/volumes/' + obj['id']}
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    """HTTP server handling every connection in its own thread."""
+
+    daemon_threads = True
+    fake = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Request handler passing requests to `FakeDocker.handle`."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def respond(self):
+        """Handle request and write JSON response."""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        status, body = self.server.fake.handle(self.command, self.path)
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_DELETE = respond
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep output clean."""
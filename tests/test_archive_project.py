@@ -1,5 +1,7 @@
 from zipfile import ZipFile
 
+from banneret.manifest import SUFFIX
+
 
 def test_folder_is_correctly_archived(tmpdir, bnrt):
     project = tmpdir.mkdir('project')
@@ -12,7 +14,8 @@ def test_folder_is_correctly_archived(tmpdir, bnrt):
     with ZipFile(archive.strpath) as file_archive:
         file_archive.extractall(unpack_target.strpath)
 
-    assert target.listdir() == [archive]
+    assert target.listdir() == [archive,
+                                target.join('project.zip' + SUFFIX)]
     assert unpack_target.listdir() == [unpack_target.join('sample.py')]
 
 
@@ -28,5 +31,16 @@ def test_only_project_name_is_passed(tmpdir, bnrt):
     with ZipFile(archive.strpath) as file_archive:
         file_archive.extractall(unpack_target.strpath)
 
-    assert target.listdir() == [archive]
+    assert target.listdir() == [archive,
+                                target.join('project.zip' + SUFFIX)]
     assert unpack_target.listdir() == [unpack_target.join('sample.py')]
+
+
+def test_archive_format(tmpdir, bnrt):
+    project = tmpdir.mkdir('project')
+    target = tmpdir.mkdir('target')
+    project.join('sample.py').write('print("hello")')
+
+    bnrt.archive_project(project, target, archive_format='gztar', level=1)
+
+    assert target.join('project.tar.gz').check()
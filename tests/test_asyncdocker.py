@@ -0,0 +1,129 @@
+import asyncio
+import sys
+
+import pytest
+
+from banneret.main import Selection
+
+if sys.version_info < (3, 5):
+    pytest.skip('No asyncio client on Python 2', allow_module_level=True)
+
+from banneret.asyncdocker import (  # noqa: E402 pylint: disable=C0413
+    APIError, AsyncDocker, Connection, convert_filters)
+from banneret.watch import Watcher  # noqa: E402 pylint: disable=C0413
+
+
+def read_response(data, writer):
+    """Parse raw HTTP response with `Connection.request`."""
+    loop = asyncio.new_event_loop()
+    try:
+        reader = asyncio.StreamReader(loop=loop)
+        reader.feed_data(data)
+        reader.feed_eof()
+
+        connection = Connection(reader, writer, 'docker')
+        response = loop.run_until_complete(connection.request('GET', '/'))
+        return response, connection.reusable
+    finally:
+        loop.close()
+
+
+class TestConnection:
+
+    def test_content_length(self, mocker):
+        assert read_response(
+            b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n[]',
+            mocker.Mock()) == ((200, []), True)
+
+    def test_chunked(self, mocker):
+        assert read_response(
+            b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n'
+            b'Connection: close\r\n\r\n'
+            b'3\r\n[1,\r\n2;ext\r\n2]\r\n0\r\n\r\n',
+            mocker.Mock()) == ((200, [1, 2]), False)
+
+    def test_no_content(self, mocker):
+        assert read_response(b'HTTP/1.1 204 No Content\r\n\r\n',
+                             mocker.Mock()) == ((204, None), True)
+
+    def test_closed_connection(self, mocker):
+        with pytest.raises(ConnectionResetError):
+            read_response(b'', mocker.Mock())
+
+
+def test_convert_filters():
+    assert convert_filters({}) is None
+    assert convert_filters({'dangling': False}) == '{"dangling": ["false"]}'
+    assert convert_filters({'label': ['ci']}) == '{"label": ["ci"]}'
+
+
+class TestAsyncDocker:
+
+    def test_containers_are_not_inspected(self, fake_docker):
+        fake_docker.seed(containers=100)
+        assert AsyncDocker(8).remove_containers()
+        assert not fake_docker.count('containers')
+        assert fake_docker.calls['containers', 'remove'] == 50
+        assert not fake_docker.calls['containers', 'inspect']
+
+    def test_used_volumes_are_reported(self, fake_docker):
+        fake_docker.seed(volumes=10)
+        docker_daemon = AsyncDocker(4)
+        assert docker_daemon.remove_volumes()
+        assert len(docker_daemon.errors) == 5
+        assert docker_daemon.reclaimed == 5 * 1024
+
+    def test_selection_is_filtered_on_daemon(self, fake_docker):
+        fake_docker.seed(containers=10, images=10, labels={'ci': '1'})
+        docker_daemon = AsyncDocker(4)
+        selection = Selection(labels=('ci=2',))
+        assert not docker_daemon.remove_containers(selection)
+        assert not docker_daemon.remove_images(selection)
+        assert fake_docker.count('containers') == 10
+
+    @pytest.mark.parametrize('selection', [
+        Selection(dangling=True), Selection(min_size=1024 ** 3)])
+    def test_unsupported_selection_skips_kind(self, bnrt, fake_docker,
+                                              selection):
+        fake_docker.seed(containers=10, volumes=10)
+        bnrt.clean_docker(selection=selection, asynchronous=True)
+        assert fake_docker.count('containers') == 10
+        assert not fake_docker.calls['containers', 'remove']
+        if selection.min_size:
+            assert fake_docker.count('volumes') == 10
+
+    def test_clean_docker(self, bnrt, fake_docker, log):
+        fake_docker.seed(containers=10, images=10, volumes=10)
+        assert bnrt.clean_docker(asynchronous=True)
+        assert 'Failed to remove 5 objects' in log.text
+        assert fake_docker.count('volumes') == 5
+
+    def test_networks_and_build_cache_are_pruned(self, fake_docker):
+        fake_docker.seed(networks=10, caches=10)
+        docker_daemon = AsyncDocker(4)
+        assert docker_daemon.remove_networks()
+        assert docker_daemon.remove_build_cache(Selection(older_than=3600))
+        assert fake_docker.count('networks') == 5
+        assert fake_docker.count('caches') == 5
+        assert docker_daemon.reclaimed == 10 * 1024
+
+    def test_usage(self, bnrt, fake_docker):
+        fake_docker.seed(images=4, caches=2)
+        usage = bnrt.docker_usage(asynchronous=True)
+        assert usage[0].reclaimable == 2048
+        assert usage[-1].reclaimable == 1024
+        assert fake_docker.calls['system', 'df'] == 1
+
+
+def test_watch_survives_daemon_errors(bnrt, mocker, tmpdir, log):
+    mocker.patch('banneret.watch.device', return_value=1)
+    mocker.patch('banneret.watch.used_share', return_value=0.95)
+    mocker.patch.object(bnrt, 'locate', return_value=(str(tmpdir), '', ''))
+    mocker.patch.object(bnrt, 'versions', return_value=[])
+    remove = mocker.patch.object(
+        AsyncDocker, 'remove_containers',
+        side_effect=APIError(409, 'a prune operation is already running'))
+    watcher = Watcher(bnrt, docker_root='/docker', asynchronous=True)
+    assert watcher.check() == 60
+    assert remove.call_count == 4
+    assert 'Failed to evict' in log.text
@@ -1,6 +1,9 @@
 import pytest
 
-from banneret.cli import cli, PLATFORMS
+from banneret.archive import FORMATS
+from banneret.cli import cli, ARCHIVE_FORMATS, PLATFORMS
+from banneret.main import DockerUsage, Selection
+from banneret.watch import Watcher
 
 
 class TestOSSupport:
@@ -66,6 +69,26 @@ class TestCleanCommand:
         assert 'Abort' in log.text
         mock_remove_all.assert_not_called()
 
+    def test_jobs(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.2', '-j', '2'])
+        assert result.exit_code == 0
+        mock_remove_all.assert_called_once_with(
+            'PyCharm2017.2', fast=False, configs=False, caches=False,
+            plugins=False, logs=False)
+
+    def test_fast(self, runner, mock_remove_all, mock_spawn_reaper):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.2', '--fast'])
+        assert result.exit_code == 0
+        assert mock_remove_all.call_args[1]['fast']
+        mock_spawn_reaper.assert_called_once()
+
+    def test_fast_nothing_to_remove(self, runner, mock_remove_all,
+                                    mock_spawn_reaper):
+        mock_remove_all.return_value = False
+        result = runner.invoke(cli, ['clean', 'pycharm2017.2', '--fast'])
+        assert result.exit_code == 1
+        mock_spawn_reaper.assert_not_called()
+
     def test_nothing_to_remove(self, runner, log, mock_remove_all):
         mock_remove_all.return_value = False
         result = runner.invoke(cli, ['clean', 'pycharm2017.2'])
@@ -74,6 +97,64 @@ class TestCleanCommand:
         mock_remove_all.assert_called_once()
 
 
+class TestBatch:
+
+    def test_many_versions(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.1', 'idea2018.1',
+                                     'PyCharm2017.1', '-c'])
+        assert result.exit_code == 0
+        mock_remove_all.assert_called_once_with(
+            'PyCharm2017.1', 'IntelliJIdea2018.1', fast=False, configs=False,
+            caches=True, plugins=False, logs=False)
+
+    def test_versions_covered_by_ide(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.1', 'pycharm'],
+                               input='y\n')
+        assert result.exit_code == 0
+        assert mock_remove_all.call_args[0] == ('PyCharm*',)
+
+    def test_versions_from_stdin(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'ideaic2018.1', '--from', '-'],
+                               input='pycharm2017.1\n# comment\n\n'
+                                     '  idea2018.1  \n')
+        assert result.exit_code == 0
+        assert mock_remove_all.call_args[0] == (
+            'IdeaIC2018.1', 'PyCharm2017.1', 'IntelliJIdea2018.1')
+
+    def test_versions_from_file(self, runner, tmpdir, mock_enable_errors):
+        version_file = tmpdir.join('versions.txt')
+        version_file.write('pycharm2017.1\nideaic2018.1\n')
+        result = runner.invoke(cli, ['errors', '-f', version_file.strpath])
+        assert result.exit_code == 0
+        mock_enable_errors.assert_called_once_with(
+            'PyCharm2017.1', 'IdeaIC2018.1', disable=None)
+
+    def test_no_versions(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean'])
+        assert result.exit_code == 2
+        mock_remove_all.assert_not_called()
+
+    def test_wrong_version_stops_batch(self, runner, log, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.1', 'ruby2017.1'])
+        assert result.exit_code == 1
+        assert 'Wrong or unsupported version: ruby2017.1' in log.text
+        mock_remove_all.assert_not_called()
+
+
+class TestReapCommand:
+
+    def test_reaped(self, runner, mock_reap):
+        result = runner.invoke(cli, ['reap'])
+        assert result.exit_code == 0
+        mock_reap.assert_called_once()
+
+    def test_nothing_to_reap(self, runner, log, mock_reap):
+        mock_reap.return_value = False
+        result = runner.invoke(cli, ['reap'])
+        assert result.exit_code == 1
+        assert 'Nothing to remove' in log.text
+
+
 class TestArchiveCommand:
 
     def test_wrong_target_or_project(self, runner, log, mock_archive_project):
@@ -88,11 +169,65 @@ class TestArchiveCommand:
         assert result.exit_code == 0
         mock_archive_project.assert_called_once()
 
+    def test_format_and_level(self, runner, mock_archive_project):
+        result = runner.invoke(cli, ['archive', '-f', 'gztar', '-l', '1'])
+        assert result.exit_code == 0
+        assert mock_archive_project.call_args[1] == {
+            'archive_format': 'gztar', 'level': 1, 'incremental': False,
+            'excludes': (), 'includes': ()}
+
+    def test_exclude_and_include(self, runner, mock_archive_project):
+        result = runner.invoke(cli, ['archive', '--exclude', '*.log',
+                                     '--exclude', 'build/',
+                                     '--include', 'venv/'])
+        assert result.exit_code == 0
+        kwargs = mock_archive_project.call_args[1]
+        assert kwargs['excludes'] == ('*.log', 'build/')
+        assert kwargs['includes'] == ('venv/',)
+
+    def test_incremental(self, runner, mock_archive_project):
+        result = runner.invoke(cli, ['archive', '-i'])
+        assert result.exit_code == 0
+        assert mock_archive_project.call_args[1]['incremental']
+
+    def test_wrong_level(self, runner, log, mock_archive_project):
+        mock_archive_project.side_effect = ValueError('Wrong level')
+        result = runner.invoke(cli, ['archive', '-l', '42'])
+        assert result.exit_code == 1
+        assert 'Wrong level' in log.text
+
+    def test_formats(self):
+        assert set(FORMATS) <= set(ARCHIVE_FORMATS)
+
+    def test_default_project_and_target(self, runner, mock_archive_project):
+        result = runner.invoke(cli, ['archive'])
+        assert result.exit_code == 0
+        assert mock_archive_project.call_args[0] == (None, None)
+
+    def test_wrong_jobs(self, runner, mock_archive_project):
+        result = runner.invoke(cli, ['archive', '-j', '0'])
+        assert result.exit_code == 2
+        mock_archive_project.assert_not_called()
+
+
+class TestRestoreCommand:
+
+    def test_restore(self, runner, mock_restore_project):
+        result = runner.invoke(cli, ['restore', 'project.zip', 'target'])
+        assert result.exit_code == 0
+        mock_restore_project.assert_called_once_with('project.zip', 'target')
+
+    def test_unknown_archive(self, runner, log, mock_restore_project):
+        mock_restore_project.side_effect = IOError
+        result = runner.invoke(cli, ['restore', 'project.zip', 'target'])
+        assert result.exit_code == 1
+        assert 'Unknown archive' in log.text
+
 
 class TestDockerCommand:
 
     def test_no_docker(self, mocker, runner, log, mock_clean_docker):
-        mocker.patch('banneret.cli.docker_api', None)
+        mocker.patch('banneret.cli.import_docker', return_value=None)
         result = runner.invoke(cli, ['docker'])
         assert result.exit_code == 1
         assert 'Docker API SDK required' in log.text
@@ -101,12 +236,66 @@ class TestDockerCommand:
     def test_remove_only_something(self, runner, mock_clean_docker):
         result = runner.invoke(cli, ['docker', '-i'])
         assert result.exit_code == 0
-        mock_clean_docker.assert_called_with(False, True, False)
+        mock_clean_docker.assert_called_with(
+            selection=None, asynchronous=False, containers=False, images=True,
+            volumes=False, networks=False, build_cache=False)
 
     def test_remove_everything(self, runner, mock_clean_docker):
         result = runner.invoke(cli, ['docker'], input='y\n')
         assert result.exit_code == 0
-        mock_clean_docker.assert_called_with()
+        mock_clean_docker.assert_called_with(
+            selection=None, asynchronous=False, networks=True,
+            build_cache=True)
+
+    def test_selection(self, runner, mock_clean_docker):
+        result = runner.invoke(cli, [
+            'docker', '-i', '--older-than', '7d', '--label', 'ci',
+            '--label', 'env=test', '--dangling', '--min-size', '1K'])
+        assert result.exit_code == 0
+        mock_clean_docker.assert_called_with(
+            selection=Selection(7 * 24 * 3600, ('ci', 'env=test'), True,
+                                1024),
+            asynchronous=False, containers=False, images=True, volumes=False,
+            networks=False, build_cache=False)
+
+    def test_async_does_not_need_docker_sdk(self, mocker, runner,
+                                            mock_clean_docker):
+        mocker.patch('banneret.cli.import_docker', return_value=None)
+        result = runner.invoke(cli, ['docker', '-v', '--async'])
+        assert result.exit_code == 0
+        assert mock_clean_docker.call_args[1]['asynchronous']
+
+    def test_networks_and_build_cache(self, runner, mock_clean_docker):
+        result = runner.invoke(cli, ['docker', '--networks', '--build-cache'])
+        assert result.exit_code == 0
+        mock_clean_docker.assert_called_with(
+            selection=None, asynchronous=False, containers=False,
+            images=False, volumes=False, networks=True, build_cache=True)
+
+    def test_report_only(self, mocker, runner, mock_clean_docker):
+        mocker.patch('banneret.Banneret.docker_usage', return_value=[
+            DockerUsage('images', 3, 1, 3072, 2048),
+            DockerUsage('build cache', 2, 0, 1024, 1024)])
+        result = runner.invoke(cli, ['docker', '--report'])
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            'TYPE            TOTAL   ACTIVE       SIZE  RECLAIMABLE',
+            'images              3        1     3.0 KB       2.0 KB',
+            'build cache         2        0     1.0 KB       1.0 KB',
+            'total                              4.0 KB       3.0 KB']
+        mock_clean_docker.assert_not_called()
+
+    def test_report_before_removal(self, mocker, runner, mock_clean_docker):
+        mocker.patch('banneret.Banneret.docker_usage', return_value=[])
+        result = runner.invoke(cli, ['docker', '--report', '-i'])
+        assert result.exit_code == 0
+        assert 'RECLAIMABLE' in result.output
+        mock_clean_docker.assert_called_once()
+
+    def test_wrong_selection(self, runner, mock_clean_docker):
+        result = runner.invoke(cli, ['docker', '--older-than', 'week'])
+        assert result.exit_code == 2
+        mock_clean_docker.assert_not_called()
 
     def test_remove_all_abort(self, runner, log, mock_clean_docker):
         result = runner.invoke(cli, ['docker'], input='N\n')
@@ -121,6 +310,13 @@ class TestDockerCommand:
         assert 'Nothing to remove' in log.text
         mock_clean_docker.assert_called_once()
 
+    def test_failed_removals(self, runner, log, fake_docker):
+        fake_docker.seed(volumes=10)
+        result = runner.invoke(cli, ['docker', '-v'])
+        assert result.exit_code == 1
+        assert 'Failed to remove 5 objects' in log.text
+        assert fake_docker.count('volumes') == 5
+
 
 class TestRunErrorsCommand:
 
@@ -148,9 +344,49 @@ class TestRunErrorsCommand:
         assert 'Abort' in log.text
         mock_enable_errors.assert_not_called()
 
+    def test_nothing_has_changed(self, runner, log, mock_enable_errors):
+        mock_enable_errors.return_value = False
+        result = runner.invoke(cli, ['errors', 'pycharm2017.3'])
+        assert result.exit_code == 1
+        assert 'Restart PyCharm' not in log.text
+
     def test_no_settings_was_found(self, runner, log, mock_enable_errors):
         mock_enable_errors.side_effect = IOError
         result = runner.invoke(cli, ['errors', 'pycharm'], input='y\n')
         assert result.exit_code == 1
         assert 'No settings folder' in log.text
         mock_enable_errors.assert_called_once()
+
+
+class TestWatchCommand:
+
+    @pytest.fixture
+    def mock_run(self, mocker):
+        yield mocker.patch('banneret.watch.Watcher.run')
+
+    def test_once(self, mocker, runner, mock_run):
+        init = mocker.spy(Watcher, '__init__')
+        result = runner.invoke(cli, ['watch', '--once', '--high', '95',
+                                     '--low', '70', '--max-interval', '1h'])
+        assert result.exit_code == 0
+        mock_run.assert_called_once_with(1)
+        _, _, high, low = init.call_args[0]
+        assert (high, low) == (0.95, 0.7)
+        assert init.call_args[1]['max_interval'] == 3600
+
+    def test_no_docker(self, mocker, runner, mock_run):
+        init = mocker.spy(Watcher, '__init__')
+        result = runner.invoke(cli, ['watch', '--no-docker'])
+        assert result.exit_code == 0
+        mock_run.assert_called_once_with(None)
+        assert init.call_args[1]['docker_root'] is None
+
+    @pytest.mark.parametrize('args', [
+        ['--low', '90'],
+        ['--interval', '0s'],
+        ['--interval', '1h', '--max-interval', '1m'],
+    ])
+    def test_wrong_watermarks(self, runner, mock_run, args):
+        result = runner.invoke(cli, ['watch'] + args)
+        assert result.exit_code == 2
+        mock_run.assert_not_called()
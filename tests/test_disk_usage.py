@@ -0,0 +1,134 @@
+import json
+import os
+
+import pytest
+
+from banneret.cli import cli
+from banneret.fs import DiskUsage
+from banneret.main import KINDS, Usage
+from banneret.paths import paths
+from tests.conftest import create_settings, settings_target
+
+
+def create_nested_tree(base_path):
+    tree = base_path.mkdir('tree')
+    tree.mkdir('nested').join('file').write('x' * 10)
+    tree.join('file').write('x' * 5)
+    return tree
+
+
+class TestDiskUsage:
+
+    def test_usage(self, base_path):
+        assert DiskUsage().usage(create_nested_tree(base_path)) == (2, 15)
+
+    def test_hard_links_are_counted_once(self, base_path):
+        tree = create_nested_tree(base_path)
+        os.link(tree.join('file').strpath, tree.join('link').strpath)
+        other = base_path.mkdir('other')
+        os.link(tree.join('file').strpath, other.join('link').strpath)
+        counter = DiskUsage()
+        assert counter.usage(tree) == (2, 15)
+        assert counter.usage(other) == (0, 0)
+
+    def test_nested_folders_are_counted_once(self, base_path):
+        tree = create_nested_tree(base_path)
+        counter = DiskUsage()
+        assert counter.usage(tree.join('nested')) == (1, 10)
+        assert counter.usage(tree) == (1, 5)
+
+    def test_symlinks_are_not_followed(self, base_path):
+        tree = create_nested_tree(base_path)
+        os.symlink(base_path.strpath, tree.join('loop').strpath)
+        files, size = DiskUsage().usage(tree)
+        assert files == 3
+        assert size < 1000
+
+    def test_cache_is_reused(self, mocker, base_path):
+        tree = create_nested_tree(base_path)
+        cache_file = base_path.join('cache.json').strpath
+        first = DiskUsage()
+        first.usage(tree)
+        first.save(cache_file)
+        read_folder = mocker.patch('banneret.fs._read_folder')
+        assert DiskUsage.load(cache_file).usage(tree) == (2, 15)
+        read_folder.assert_not_called()
+
+    def test_changed_folder_is_read(self, base_path):
+        tree = create_nested_tree(base_path)
+        counter = DiskUsage()
+        counter.usage(tree)
+        tree.join('new').write('x' * 100)
+        os.utime(tree.strpath, (0, 0))
+        assert DiskUsage(counter.visited).usage(tree) == (3, 115)
+
+    def test_broken_cache(self, base_path):
+        cache_file = base_path.join('cache.json')
+        cache_file.write('{')
+        counter = DiskUsage.load(cache_file.strpath)
+        assert counter.usage(create_nested_tree(base_path)) == (2, 15)
+
+
+@pytest.fixture
+def settings(mocker, base_path):
+    for kind in KINDS:
+        folder = base_path.mkdir(kind)
+        create_settings(folder, ['PyCharm2017.2', 'PyCharmCE2017.2',
+                                 'IdeaIC2018.1', 'Unknown2018.1'])
+        mocker.patch.object(paths, kind, settings_target(folder),
+                            create=True)
+    return base_path
+
+
+def test_disk_usage(settings, bnrt):
+    for folder in settings.join('caches').listdir():
+        folder.join('index').write('x' * 10)
+    usage = bnrt.disk_usage()
+    assert len(usage) == 3 * len(KINDS)
+    assert [(folder.ide, folder.version) for folder in usage[::4]] == [
+        ('IdeaIC', '2018.1'), ('PyCharm', '2017.2'), ('PyCharmCE', '2017.2')]
+    assert sum(folder.size for folder in usage) == 30
+    caches = [folder for folder in usage if folder.kind == 'caches']
+    assert all(folder.size == 10 for folder in caches)
+
+
+def test_disk_usage_cache(settings, bnrt):
+    cache_file = settings.join('cache.json')
+    bnrt.disk_usage(cache_file.strpath)
+    assert len(json.loads(cache_file.read())) == 3 * len(KINDS)
+
+
+class TestDuCommand:
+
+    @pytest.fixture
+    def mock_disk_usage(self, mocker):
+        return mocker.patch('banneret.Banneret.disk_usage', return_value=[
+            Usage('PyCharm', '2017.1', 'caches', '/caches/PyCharm2017.1',
+                  1, 1024),
+            Usage('PyCharm', '2017.1', 'configs', '/configs/PyCharm2017.1',
+                  1, 1024),
+            Usage('PyCharm', '2017.2', 'logs', '/logs/PyCharm2017.2',
+                  1, 2048)])
+
+    def test_table(self, runner, mock_disk_usage):
+        result = runner.invoke(cli, ['du'])
+        assert result.exit_code == 0
+        lines = [line.split() for line in result.output.splitlines()]
+        assert lines[1][:2] == ['PyCharm', '2017.1']
+        assert lines[1][-2:] == ['2.0', 'KB']
+        assert lines[3][:2] == ['PyCharm', 'total']
+        assert lines[-1][0] == 'total'
+        assert lines[-1][-2:] == ['4.0', 'KB']
+        mock_disk_usage.assert_called_once_with(paths.du_cache, False)
+
+    def test_json(self, runner, mock_disk_usage):
+        result = runner.invoke(cli, ['du', '--json', '--rescan'])
+        assert result.exit_code == 0
+        assert json.loads(result.output)[2]['size'] == 2048
+        mock_disk_usage.assert_called_once_with(paths.du_cache, True)
+
+    def test_no_settings(self, runner, log, mock_disk_usage):
+        mock_disk_usage.return_value = []
+        result = runner.invoke(cli, ['du'])
+        assert result.exit_code == 1
+        assert 'No settings found' in log.text
@@ -1,3 +1,20 @@
+import sys
+import time
+from collections import namedtuple
+
+import docker as docker_api
+import pytest
+
+from banneret import Docker
+from banneret.main import (
+    DockerUsage, Selection, build_cache_filters, parse_timestamp, summarize_df)
+
+CLIENTS = [Docker]
+if sys.version_info >= (3, 5):
+    from banneret.asyncdocker import AsyncDocker
+    CLIENTS.append(AsyncDocker)
+
+
 class TestCleanDocker:
 
     def test_remove_everything(
@@ -104,6 +121,7 @@ class TestRemoveContainers:
 
     def test_no_containers_are_available(self, docker_daemon, mocker):
         docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.containers.prune.return_value = {}
         docker_client.containers.list.return_value = []
 
         result = docker_daemon.remove_containers()
@@ -113,6 +131,7 @@ class TestRemoveContainers:
         container1 = mocker.Mock()
         container2 = mocker.Mock()
         docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.containers.prune.return_value = {}
         docker_client.containers.list.return_value = [container1, container2]
 
         result = docker_daemon.remove_containers()
@@ -125,6 +144,7 @@ class TestRemoveImages:
 
     def test_no_images_are_available(self, docker_daemon, mocker):
         docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images.prune.return_value = {}
         docker_client.images.list.return_value = []
 
         result = docker_daemon.remove_images()
@@ -134,19 +154,137 @@ class TestRemoveImages:
         image1 = mocker.Mock()
         image2 = mocker.Mock()
         docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images.prune.return_value = {}
         docker_client.images.list.return_value = [image1, image2]
 
         result = docker_daemon.remove_images()
         assert result
         calls = [mocker.call(image=image1.short_id, force=True),
                  mocker.call(image=image2.short_id, force=True)]
-        docker_client.images.remove.assert_has_calls(calls)
+        docker_client.images.remove.assert_has_calls(calls, any_order=True)
+
+
+FakeImage = namedtuple('FakeImage', 'id short_id attrs')
+
+
+def fake_image(image_id, parent=''):
+    """Get image as Docker SDK lists it, with given ID and parent ID."""
+    return FakeImage(image_id, image_id, {'Id': image_id, 'ParentId': parent})
+
+
+class FakeImages(object):
+    """Images API which rejects removing images with children.
+
+    Intermediate images are listed only by `api_list` of all images and
+    removed along with their last child.
+    """
+
+    def __init__(self, images, intermediates=()):
+        self.images = images
+        self.intermediates = list(intermediates)
+        self.calls = 0
+        self.removed = []
+
+    def list(self, **_):
+        self.calls += 1
+        return [image for image in self.images
+                if image.id not in self.removed]
+
+    def api_list(self, all=False):  # pylint: disable=redefined-builtin
+        assert all
+        self.calls += 1
+        return [image.attrs for image in self.images + self.intermediates
+                if image.id not in self.removed]
+
+    def prune(self, **_):
+        self.calls += 1
+        deleted = [{'Deleted': image.id} for image in self.images
+                   if image.id not in self.removed]
+        self.removed.extend(item['Deleted'] for item in deleted)
+        return {'ImagesDeleted': deleted, 'SpaceReclaimed': 1024}
+
+    def remove(self, image, force):
+        assert force
+        self.calls += 1
+        everything = self.images + self.intermediates
+        alive = {item.id for item in everything} - set(self.removed)
+        if image not in alive:
+            raise docker_api.errors.NotFound('No such image')
+        if any(item.attrs['ParentId'] == image for item in everything
+               if item.id in alive):
+            raise docker_api.errors.APIError('Image has dependent children')
+        self.removed.append(image)
+        parents = dict((item.id, item.attrs['ParentId'])
+                       for item in everything)
+        for item in self.intermediates:
+            if item.id == parents[image]:
+                self.remove(item.id, force)
+
+
+class TestRemoveImagesOrder:
+
+    @pytest.fixture
+    def images(self):
+        base = fake_image('base')
+        python = fake_image('python', parent='base')
+        return [fake_image('app', parent='python'), python, base,
+                fake_image('tool', parent='base'), fake_image('single'),
+                python]
+
+    def test_each_image_is_removed_once(self, docker_daemon, mocker, images):
+        fake_images = FakeImages(images)
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images = fake_images
+
+        assert docker_daemon.remove_images(Selection(labels=['ci']))
+        assert docker_daemon.errors == []
+        assert sorted(fake_images.removed) == [
+            'app', 'base', 'python', 'single', 'tool']
+        assert fake_images.calls == 1 + 5
+
+    def test_everything_is_pruned_in_bulk(self, docker_daemon, mocker,
+                                          images):
+        fake_images = FakeImages(images)
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images = fake_images
+
+        assert docker_daemon.remove_images()
+        assert len(fake_images.removed) == 6
+        assert fake_images.calls == 2
+        assert docker_daemon.reclaimed == 1024
+
+    def test_intermediate_images_link_tagged_ones(self, docker_daemon,
+                                                  mocker):
+        layer = fake_image('layer', parent='base')
+        fake_images = FakeImages(
+            [fake_image('base'), fake_image('app', parent='layer')], [layer])
+        docker_daemon.workers = 1
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images = fake_images
+        docker_client.api.images = fake_images.api_list
+
+        assert docker_daemon.remove_images(Selection(labels=['ci']))
+        assert docker_daemon.errors == []
+        assert fake_images.removed == ['app', 'layer', 'base']
+
+    def test_waves_follow_unlisted_parents(self):
+        images = [fake_image('base'), fake_image('app')]
+        parents = {'app': 'layer', 'layer': 'base', 'base': ''}
+        waves = [[image.id for image in wave]
+                 for wave in Docker.image_waves(images, parents)]
+        assert waves == [['app'], ['base']]
+
+    def test_children_go_before_parents(self, images):
+        waves = [sorted(image.id for image in wave)
+                 for wave in Docker.image_waves(images)]
+        assert waves == [['app', 'single', 'tool'], ['python'], ['base']]
 
 
 class TestRemoveVolumes:
 
     def test_no_volumes_are_available(self, docker_daemon, mocker):
         docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.volumes.prune.return_value = {}
         docker_client.volumes.list.return_value = []
 
         result = docker_daemon.remove_volumes()
@@ -156,9 +294,285 @@ class TestRemoveVolumes:
         volume1 = mocker.Mock()
         volume2 = mocker.Mock()
         docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.volumes.prune.return_value = {}
         docker_client.volumes.list.return_value = [volume1, volume2]
 
         result = docker_daemon.remove_volumes()
         assert result
         volume1.remove.assert_called_once()
         volume2.remove_assert_called_once()
+
+
+class TestPrune:
+
+    def test_prune_without_leftovers(self, docker_daemon, mocker):
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.containers.prune.return_value = {
+            'ContainersDeleted': ['a', 'b'], 'SpaceReclaimed': 10}
+        docker_client.containers.list.return_value = []
+
+        assert docker_daemon.remove_containers()
+        assert docker_daemon.reclaimed == 10
+
+    def test_leftovers_are_removed_one_by_one(self, docker_daemon, mocker):
+        volume = mocker.Mock()
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.volumes.prune.return_value = {
+            'VolumesDeleted': None, 'SpaceReclaimed': 0}
+        docker_client.volumes.list.return_value = [volume]
+
+        assert docker_daemon.remove_volumes()
+        volume.remove.assert_called_once_with(force=True)
+
+    def test_filtered_selection_is_not_pruned(self, docker_daemon, mocker):
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.containers.list.return_value = []
+
+        selection = Selection(labels=['ci'])
+        assert not docker_daemon.remove_containers(selection)
+        docker_client.containers.prune.assert_not_called()
+        docker_client.containers.list.assert_called_once_with(
+            all=True, filters={'label': ['ci']})
+
+    @pytest.mark.parametrize('selection', [
+        Selection(labels=['ci'], dangling=True),
+        Selection(older_than=3600, min_size=1024),
+    ])
+    def test_unsupported_selection_skips_containers(
+            self, docker_daemon, mocker, log, selection):
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        assert not docker_daemon.remove_containers(selection)
+        assert not docker_client.containers.mock_calls
+        assert 'Skip containers' in log.text
+
+    def test_reclaimed_space_is_reported(self, bnrt, log, mocker):
+        docker_class = mocker.patch('banneret.main.Docker')
+        docker_class.return_value.errors = []
+        docker_class.return_value.reclaimed = 3 * 1024 * 1024
+        bnrt.clean_docker()
+        assert 'Reclaimed 3.0 MB' in log.text
+
+
+class TestSelection:
+
+    def test_age_is_pruned_on_daemon(self, docker_daemon, mocker):
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images.prune.return_value = {}
+        docker_daemon.remove_images(Selection(older_than=3600,
+                                              labels=['ci']))
+        docker_client.images.prune.assert_called_once_with(filters={
+            'label': ['ci'], 'dangling': False, 'until': '3600s'})
+        docker_client.images.list.assert_not_called()
+
+    def test_dangling_is_listed_on_daemon(self, docker_daemon, mocker):
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.volumes.list.return_value = []
+        docker_daemon.remove_volumes(Selection(dangling=True))
+        docker_client.volumes.list.assert_called_once_with(
+            filters={'dangling': True})
+        docker_client.volumes.prune.assert_not_called()
+
+    def test_min_size_is_checked_against_listing(self, docker_daemon,
+                                                 mocker):
+        small, big = fake_image('small'), fake_image('big')
+        small.attrs.update(Size=10, Created='2017-01-01T10:00:00Z')
+        big.attrs.update(Size=1000, Created='2017-01-01T10:00:00.5Z')
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.images.list.return_value = [small, big]
+        docker_daemon.remove_images(Selection(older_than=60, min_size=100))
+        docker_client.images.list.assert_called_once_with(filters={})
+        docker_client.images.remove.assert_called_once_with(
+            image='big', force=True)
+
+    def test_volume_age_is_checked_against_listing(self, docker_daemon,
+                                                   mocker):
+        old, new = mocker.Mock(), mocker.Mock()
+        old.attrs = {'CreatedAt': '2017-01-01T10:00:00+01:00'}
+        new.attrs = {'CreatedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                                time.gmtime())}
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.volumes.list.return_value = [old, new]
+        docker_daemon.remove_volumes(Selection(older_than=24 * 3600))
+        old.remove.assert_called_once_with(force=True)
+        new.remove.assert_not_called()
+
+    @pytest.mark.parametrize('timestamp, expected', [
+        ('2018-03-01T10:00:00Z', 1519898400),
+        ('2018-03-01T10:00:00.123456789+01:00', 1519894800),
+        ('2018-03-01T10:00:00-00:30', 1519900200),
+        ('', None),
+    ])
+    def test_parse_timestamp(self, timestamp, expected):
+        assert parse_timestamp(timestamp) == expected
+
+
+class TestRemoveConcurrently:
+
+    def test_errors_are_collected(self, docker_daemon, mocker):
+        container1 = mocker.Mock()
+        container1.remove.side_effect = docker_api.errors.APIError('busy')
+        container2 = mocker.Mock()
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.containers.prune.return_value = {}
+        docker_client.containers.list.return_value = [container1, container2]
+
+        result = docker_daemon.remove_containers()
+        assert result
+        container2.remove.assert_called_once()
+        assert [obj for obj, _ in docker_daemon.errors] == [container1]
+
+    def test_many_objects(self, docker_daemon, mocker):
+        volumes = [mocker.Mock() for _ in range(50)]
+        docker_client = mocker.patch.object(docker_daemon, 'client')
+        docker_client.volumes.prune.return_value = {}
+        docker_client.volumes.list.return_value = volumes
+
+        assert docker_daemon.remove_volumes()
+        for volume in volumes:
+            volume.remove.assert_called_once_with(force=True)
+
+    def test_containers_are_removed_first(
+            self,
+            bnrt,
+            mocker,
+            mock_remove_containers,
+            mock_remove_images,
+            mock_remove_volumes
+    ):
+        order = mocker.Mock()
+        order.attach_mock(mock_remove_containers, 'containers')
+        order.attach_mock(mock_remove_images, 'images')
+        order.attach_mock(mock_remove_volumes, 'volumes')
+        bnrt.clean_docker()
+        phases = [name for name, _, _ in order.mock_calls if '.' not in name]
+        assert phases[0] == 'containers'
+        assert sorted(phases[1:]) == ['images', 'volumes']
+
+
+class TestFakeDaemon:
+
+    def test_stopped_containers_are_pruned(self, fake_docker):
+        fake_docker.seed(containers=100)
+        assert Docker(8).remove_containers()
+        assert not fake_docker.count('containers')
+        assert fake_docker.calls['containers', 'prune'] == 1
+        assert fake_docker.calls['containers', 'list'] == 1
+        assert fake_docker.calls['containers', 'remove'] == 50
+
+    @pytest.mark.parametrize('client', CLIENTS)
+    def test_images_are_removed_without_conflicts(self, fake_docker, client):
+        fake_docker.seed(images=100, layers=4, used=1)
+        docker_daemon = client(8)
+        assert docker_daemon.remove_images()
+        assert not docker_daemon.errors
+        assert not fake_docker.count('images')
+        assert fake_docker.calls['images', 'remove'] == 25
+
+    def test_used_volumes_are_reported(self, fake_docker):
+        fake_docker.seed(volumes=10)
+        docker_daemon = Docker(4)
+        assert docker_daemon.remove_volumes()
+        assert len(docker_daemon.errors) == 5
+        assert fake_docker.count('volumes') == 5
+
+    @pytest.mark.parametrize('client', CLIENTS)
+    def test_failed_removals_are_not_success(self, fake_docker, client):
+        fake_docker.seed(volumes=10, used=1)
+        docker_daemon = client(4)
+        assert not docker_daemon.remove_volumes()
+        assert len(docker_daemon.errors) == 10
+
+    def test_selection_is_filtered_on_daemon(self, fake_docker):
+        fake_docker.seed(containers=10, labels={'ci': '1'})
+        assert not Docker(4).remove_containers(Selection(labels=('ci=2',)))
+        assert fake_docker.count('containers') == 10
+        assert not fake_docker.calls['containers', 'remove']
+
+    def test_thousands_of_objects(self, fake_docker):
+        fake_docker.seed(volumes=1000, used=0, labels={'ci': '1'})
+        assert Docker(8).remove_volumes(Selection(labels=('ci',)))
+        assert not fake_docker.count('volumes')
+        assert fake_docker.calls['volumes', 'list'] == 1
+        assert fake_docker.calls['volumes', 'remove'] == 1000
+
+    def test_latency_is_overlapped(self, fake_docker):
+        fake_docker.seed(volumes=40, used=0, labels={'ci': '1'})
+        fake_docker.latency = 0.02
+        start = time.time()
+        Docker(8).remove_volumes(Selection(labels=('ci',)))
+        assert time.time() - start < 40 * fake_docker.latency / 2
+
+    def test_networks_and_build_cache_are_pruned(self, fake_docker):
+        fake_docker.seed(networks=10, caches=10)
+        docker_daemon = Docker(4)
+        assert docker_daemon.remove_networks()
+        assert docker_daemon.remove_build_cache()
+        assert fake_docker.count('networks') == 5
+        assert fake_docker.count('caches') == 5
+        assert docker_daemon.reclaimed == 10 * 1024
+
+    @pytest.mark.parametrize('kind', ['containers', 'volumes'])
+    def test_min_size_skips_kind(self, bnrt, fake_docker, kind):
+        fake_docker.seed(containers=10, images=10, volumes=10)
+        assert bnrt.clean_docker(selection=Selection(min_size=512))
+        assert fake_docker.count(kind) == 10
+        assert not fake_docker.calls[kind, 'remove']
+        assert not fake_docker.calls[kind, 'prune']
+        assert not fake_docker.count('images')
+
+    def test_image_age_and_size_are_checked(self, fake_docker):
+        fake_docker.seed(images=10)
+        docker_daemon = Docker(4)
+        assert docker_daemon.remove_images(Selection(older_than=3600,
+                                                     min_size=512))
+        assert not docker_daemon.errors
+        assert not fake_docker.count('images')
+
+    def test_dangling_skips_containers(self, bnrt, fake_docker):
+        fake_docker.seed(containers=10, volumes=10)
+        assert bnrt.clean_docker(selection=Selection(dangling=True))
+        assert fake_docker.count('containers') == 10
+        assert not fake_docker.calls['containers', 'remove']
+        assert fake_docker.count('volumes') == 5
+
+    def test_build_cache_is_selected_by_age_only(self, fake_docker):
+        fake_docker.seed(caches=10)
+        assert not Docker(4).remove_build_cache(Selection(labels=('ci',)))
+        assert not fake_docker.calls['caches', 'prune']
+
+    def test_usage_is_read_with_single_call(self, bnrt, fake_docker):
+        fake_docker.seed(containers=4, images=4, volumes=4, caches=4)
+        usage = bnrt.docker_usage()
+        assert [kind.reclaimable for kind in usage] == [2048] * 4
+        assert sum(fake_docker.calls.values()) == 1
+
+
+class TestUsage:
+
+    def test_summarize_df(self):
+        assert summarize_df({
+            'LayersSize': 3000,
+            'Images': [{'Size': 1000, 'SharedSize': 200, 'Containers': 1},
+                       {'Size': 500, 'SharedSize': 0, 'Containers': 0}],
+            'Containers': [{'SizeRw': 10, 'State': 'running'},
+                           {'SizeRw': 20, 'State': 'exited'}],
+            'Volumes': [{'UsageData': {'Size': 100, 'RefCount': 0}},
+                        {'UsageData': {'Size': -1, 'RefCount': 0}}],
+            'BuildCache': [{'Size': 40, 'InUse': False, 'Shared': False},
+                           {'Size': 50, 'InUse': False, 'Shared': True}],
+        }) == [DockerUsage('images', 2, 1, 3000, 2200),
+               DockerUsage('containers', 2, 1, 30, 20),
+               DockerUsage('volumes', 1, 0, 100, 100),
+               DockerUsage('build cache', 1, 0, 40, 40)]
+
+    def test_summarize_empty_df(self):
+        assert [kind.total for kind in summarize_df({})] == [0] * 4
+
+    @pytest.mark.parametrize('selection, expected', [
+        (None, {}),
+        (Selection(older_than=3600), {'until': '3600s'}),
+        (Selection(older_than=3600, labels=('ci',)), None),
+        (Selection(dangling=True), None),
+    ])
+    def test_build_cache_filters(self, selection, expected):
+        assert build_cache_filters(selection) == expected
@@ -14,7 +14,7 @@ def call_enable_errors(version, path, disable, bnrt):
         path += '/.{version}'
     else:
         raise OSError('Unsupported OS')
-    bnrt.enable_errors(version, path, disable)
+    bnrt.enable_errors(version, path=path, disable=disable)
 
 
 def call_path(version, path):
@@ -48,6 +48,17 @@ class TestEnableErrors:
         mock_enable_error.assert_has_calls(calls, any_order=True)
 
 
+def test_many_versions(mock_enable_error, mocker, base_path, bnrt):
+    create_settings(base_path, ['PyCharm2016.3', 'PyCharm2017.2'])
+    path = base_path.strpath
+    if sys.platform in LINUX:
+        path += '/.{version}'
+    bnrt.enable_errors('PyCharm*', 'PyCharm2017.2', path=path)
+    assert sorted(mock_enable_error.call_args_list) == [
+        mocker.call(call_path('PyCharm2016.3', base_path), 'enable'),
+        mocker.call(call_path('PyCharm2017.2', base_path), 'enable')]
+
+
 class TestEnableError:
 
     @staticmethod
@@ -90,5 +101,7 @@ class TestEnableError:
     def test_nothing_to_change(self, base_path, switch, bnrt):
         config_line = 'idea.fatal.error.notification=%sd' % switch
         self.create_file(base_path, config_line)
-        with pytest.raises(SystemExit):
-            bnrt.enable_error(base_path, switch)
+        mtime = base_path.join('idea.properties').mtime()
+        assert not bnrt.enable_error(base_path, switch)
+        self.check_file(base_path, config_line)
+        assert base_path.join('idea.properties').mtime() == mtime
@@ -0,0 +1,99 @@
+import pytest
+
+from banneret.archive import walk
+from banneret.ignore import Ignore, Rules, parse_gitignore, parse_hgignore
+
+
+def gitignore(*lines):
+    return Rules(parse_gitignore(lines))
+
+
+@pytest.mark.parametrize('pattern, path, is_dir, expected', [
+    ('*.log', 'debug.log', False, True),
+    ('*.log', 'deep/nested/debug.log', False, True),
+    ('*.log', 'debug.txt', False, None),
+    ('/build', 'build', True, True),
+    ('/build', 'src/build', True, None),
+    ('build/', 'src/build', True, True),
+    ('build/', 'build', False, None),
+    ('doc/*.txt', 'doc/notes.txt', False, True),
+    ('doc/*.txt', 'doc/server/notes.txt', False, None),
+    ('**/logs', 'a/b/logs', True, True),
+    ('logs/**', 'logs/a/b.txt', False, True),
+    ('a/**/b', 'a/x/y/b', False, True),
+    ('a/**/b', 'a/b', False, True),
+    ('file?.py', 'file1.py', False, True),
+    ('file[!0-9].py', 'file1.py', False, None),
+    ('file[!0-9].py', 'filea.py', False, True),
+    ('# comment', '# comment', False, None),
+])
+def test_gitignore_patterns(pattern, path, is_dir, expected):
+    assert gitignore(pattern).match(path, is_dir) is expected
+
+
+def test_last_rule_wins():
+    rules = gitignore('*.log', '!important.log')
+    assert rules.match('debug.log', False) is True
+    assert rules.match('important.log', False) is False
+
+
+def test_rules_are_scoped_to_base():
+    rules = Rules(parse_gitignore(['*.txt']), 'sub/')
+    assert rules.match('sub/notes.txt', False) is True
+    assert rules.match('notes.txt', False) is None
+
+
+def test_hgignore_syntax():
+    rules = Rules(parse_hgignore([
+        '# comment', r'\.orig$', 'syntax: glob', '*.pyc', 'rootglob:dist']))
+    assert rules.match('src/file.orig', False) is True
+    assert rules.match('src/file.pyc', False) is True
+    assert rules.match('dist', True) is True
+    assert rules.match('src/dist', True) is None
+    assert rules.match('src/file.py', False) is None
+
+
+@pytest.fixture
+def project(tmpdir):
+    project = tmpdir.mkdir('project')
+    project.join('main.py').write('')
+    project.join('main.pyc').write('')
+    project.join('debug.log').write('')
+    project.join('.gitignore').write('*.log\nbuild/\n')
+    project.mkdir('.git').join('HEAD').write('')
+    project.mkdir('.idea').join('workspace.xml').write('')
+    project.mkdir('build').join('output.bin').write('')
+    venv = project.mkdir('venv')
+    venv.join('pyvenv.cfg').write('')
+    sub = project.mkdir('sub')
+    sub.join('.bnrtignore').write('*.tmp\n!keep.log\n')
+    sub.join('data.tmp').write('')
+    sub.join('keep.log').write('')
+    project.join('.hgignore').write('syntax: glob\n*.orig\n')
+    project.join('merge.orig').write('')
+    return project
+
+
+def archived(project, ignore):
+    return sorted(arcname for _, arcname, _ in walk(project.strpath,
+                                                    ignore=ignore))
+
+
+def test_walk_respects_ignore_files(project):
+    assert archived(project, Ignore()) == [
+        '.gitignore', '.hgignore', '.idea', '.idea/workspace.xml', 'main.py',
+        'sub', 'sub/.bnrtignore', 'sub/keep.log']
+
+
+def test_walk_excludes_and_includes(project):
+    ignore = Ignore(excludes=['.idea/', 'sub/'], includes=['venv/', '*.cfg'])
+    assert archived(project, ignore) == [
+        '.gitignore', '.hgignore', 'main.py', 'venv', 'venv/pyvenv.cfg']
+
+
+def test_ignored_folders_are_pruned(project, mocker):
+    dirnames = ['.git', 'sub', 'venv']
+    mocker.patch('banneret.archive.os.walk',
+                 return_value=iter([(project.strpath, dirnames, [])]))
+    archived(project, Ignore(excludes=['sub/']))
+    assert not dirnames
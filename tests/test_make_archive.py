@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import os
+import tarfile
+from zipfile import ZipFile
+
+import pytest
+
+from banneret import archive
+from banneret.archive import make_archive
+
+
+@pytest.fixture
+def project(tmpdir):
+    project = tmpdir.mkdir('project')
+    project.join('main.py').write('print("hello")\n' * 1000)
+    project.join('empty.txt').write('')
+    project.join(u'ünicode.txt').write('unicode')
+    nested = project.mkdir('package').mkdir('nested')
+    nested.join('data.bin').write_binary(os.urandom(3 * archive.CHUNK))
+    project.mkdir('empty_dir')
+    return project
+
+
+def read_archive(path):
+    with ZipFile(str(path)) as zip_file:
+        assert zip_file.testzip() is None
+        return {info.filename: zip_file.read(info)
+                for info in zip_file.infolist()}
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('level', [0, 1, 9])
+def test_archive_content(tmpdir, project, workers, level):
+    name = make_archive(tmpdir.join('archive').strpath, project.strpath,
+                        level=level, workers=workers)
+    content = read_archive(name)
+    assert sorted(content) == [
+        'empty.txt', 'empty_dir/', 'main.py', 'package/', 'package/nested/',
+        'package/nested/data.bin', u'ünicode.txt']
+    assert content['main.py'] == project.join('main.py').read_binary()
+    data = project.join('package', 'nested', 'data.bin').read_binary()
+    assert content['package/nested/data.bin'] == data
+
+
+def test_archive_is_deterministic(tmpdir, project):
+    first = make_archive(tmpdir.join('first').strpath, project.strpath,
+                         workers=4)
+    second = make_archive(tmpdir.join('second').strpath, project.strpath,
+                          workers=2)
+    with open(first, 'rb') as first, open(second, 'rb') as second:
+        assert first.read() == second.read()
+
+
+def test_zip64_end_record(tmpdir, project, monkeypatch):
+    monkeypatch.setattr(archive, 'ZIP_FILECOUNT_LIMIT', 1)
+    name = make_archive(tmpdir.join('archive').strpath, project.strpath)
+    assert len(read_archive(name)) == 7
+
+
+def test_unknown_project(tmpdir):
+    with pytest.raises(IOError):
+        make_archive(tmpdir.join('archive').strpath,
+                     tmpdir.join('unknown').strpath)
+
+
+@pytest.mark.parametrize('archive_format', sorted(archive.FORMATS))
+def test_archive_formats(tmpdir, project, archive_format):
+    name = make_archive(tmpdir.join('archive').strpath, project.strpath,
+                        archive_format, level=1 if archive_format != 'tar'
+                        else None)
+    assert name.endswith(archive.FORMATS[archive_format].extension)
+    unpack_target = tmpdir.mkdir('unpack_target')
+    if archive_format == 'zstdtar':
+        with open(name, 'rb') as source:
+            reader = archive.zstandard.ZstdDecompressor().stream_reader(source)
+            with tarfile.open(fileobj=reader, mode='r|') as tar:
+                tar.extractall(unpack_target.strpath)
+    elif archive_format == 'zip':
+        with ZipFile(name) as zip_file:
+            zip_file.extractall(unpack_target.strpath)
+    else:
+        with tarfile.open(name) as tar:
+            tar.extractall(unpack_target.strpath)
+    data = unpack_target.join('package', 'nested', 'data.bin')
+    assert data.read_binary() == project.join(
+        'package', 'nested', 'data.bin').read_binary()
+    assert unpack_target.join('empty_dir').check(dir=True)
+
+
+@pytest.mark.parametrize('archive_format, level', [
+    ('zip', 10), ('bztar', 0), ('tar', 1), ('rar', None)])
+def test_wrong_format_or_level(tmpdir, project, archive_format, level):
+    with pytest.raises(ValueError):
+        make_archive(tmpdir.join('archive').strpath, project.strpath,
+                     archive_format, level)
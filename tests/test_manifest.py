@@ -0,0 +1,157 @@
+import os
+
+import pytest
+
+from banneret import manifest
+from banneret.archive import extract_archive
+from banneret.ignore import Ignore
+from banneret.manifest import archive_delta, archive_full, diff, restore, scan
+
+
+@pytest.fixture
+def project(tmpdir):
+    project = tmpdir.mkdir('project')
+    project.join('keep.py').write('keep')
+    project.join('change.py').write('change')
+    project.join('delete.py').write('delete')
+    project.mkdir('folder').join('nested.py').write('nested')
+    return project
+
+
+def snapshot(root):
+    root = str(root)
+    result = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames:
+            result[os.path.relpath(os.path.join(dirpath, name), root)] = None
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path) as source:
+                result[os.path.relpath(path, root)] = source.read()
+    return result
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'gztar'])
+def test_restore_from_deltas(tmpdir, project, archive_format):
+    target = tmpdir.mkdir('target')
+    base_name = target.join('project').strpath
+    archive_full(base_name, project.strpath, archive_format)
+
+    project.join('change.py').write('changed')
+    project.join('delete.py').remove()
+    project.join('folder').remove()
+    project.mkdir('new').join('added.py').write('added')
+    first = archive_delta(base_name, project.strpath, archive_format)
+    project.join('keep.py').write('kept')
+    second = archive_delta(base_name, project.strpath, archive_format)
+
+    assert os.path.basename(first).startswith('project.delta1.')
+    assert manifest.read(second)['base'] == os.path.basename(first)
+    restored = tmpdir.join('restored')
+    restore(second, restored.strpath)
+    assert snapshot(restored) == snapshot(project)
+
+
+def test_delta_contains_only_changes(tmpdir, project):
+    target = tmpdir.mkdir('target')
+    base_name = target.join('project').strpath
+    archive_full(base_name, project.strpath)
+    project.join('change.py').write('changed')
+    project.join('delete.py').remove()
+    delta = archive_delta(base_name, project.strpath)
+    unpacked = tmpdir.join('unpacked')
+    extract_archive(delta, unpacked.strpath)
+    assert unpacked.listdir() == [unpacked.join('change.py')]
+    assert manifest.read(delta)['deleted'] == ['delete.py']
+
+
+def test_delta_skips_ignored_folders(tmpdir, project, mocker):
+    project.mkdir('node_modules').join('module.js').write('module')
+    base_name = tmpdir.join('project').strpath
+    ignore = Ignore(excludes=['node_modules/'])
+    archive_full(base_name, project.strpath, ignore=ignore)
+    project.join('change.py').write('changed')
+    visited, real_walk = [], os.walk
+
+    def recording_walk(top, *args, **kwargs):
+        for entry in real_walk(top, *args, **kwargs):
+            visited.append(os.path.basename(entry[0]))
+            yield entry
+
+    mocker.patch('os.walk', recording_walk)
+    archive_delta(base_name, project.strpath, ignore=ignore)
+    assert 'folder' in visited
+    assert 'node_modules' not in visited
+
+
+def test_nothing_changed(tmpdir, project):
+    base_name = tmpdir.join('project').strpath
+    archive_full(base_name, project.strpath)
+    assert archive_delta(base_name, project.strpath) is None
+
+
+def test_no_chain_creates_full_archive(tmpdir, project):
+    base_name = tmpdir.join('project').strpath
+    assert archive_delta(base_name, project.strpath) == base_name + '.zip'
+
+
+def test_full_archive_drops_deltas(tmpdir, project):
+    target = tmpdir.mkdir('target')
+    base_name = target.join('project').strpath
+    archive_full(base_name, project.strpath)
+    project.join('change.py').write('changed')
+    archive_delta(base_name, project.strpath)
+    archive_full(base_name, project.strpath)
+    assert sorted(path.basename for path in target.listdir()) == [
+        'project.zip', 'project.zip' + manifest.SUFFIX]
+
+
+@pytest.fixture
+def chain_folder(tmpdir, project):
+    """Get folder with a full archive and a delta of project."""
+    target = tmpdir.mkdir('target')
+    base_name = target.join('project').strpath
+    archive_full(base_name, project.strpath)
+    project.join('change.py').write('changed')
+    archive_delta(base_name, project.strpath)
+    return target
+
+
+@pytest.mark.parametrize('error, level, root_dir', [
+    (ValueError, 42, 'project'),
+    (IOError, None, 'missing'),
+])
+def test_failed_archive_keeps_previous_one(tmpdir, chain_folder, error,
+                                           level, root_dir):
+    before = sorted(chain_folder.listdir())
+    with pytest.raises(error):
+        archive_full(chain_folder.join('project').strpath,
+                     tmpdir.join(root_dir).strpath, level=level)
+    assert sorted(chain_folder.listdir()) == before
+
+
+def test_interrupted_archive_is_dropped(chain_folder, project, mocker):
+    before = sorted(chain_folder.listdir())
+    mocker.patch('banneret.manifest.scan', side_effect=OSError)
+    with pytest.raises(OSError):
+        archive_full(chain_folder.join('project').strpath, project.strpath)
+    assert sorted(chain_folder.listdir()) == before
+
+
+def test_chains_are_kept_per_format(chain_folder, project):
+    before = sorted(chain_folder.listdir())
+    base_name = chain_folder.join('project').strpath
+    assert archive_delta(base_name, project.strpath,
+                         'gztar') == base_name + '.tar.gz'
+    project.join('keep.py').write('kept')
+    archive_full(base_name, project.strpath, 'gztar')
+    assert set(before) < set(chain_folder.listdir())
+
+
+def test_unchanged_files_are_not_hashed(project, mocker):
+    previous = scan(project.strpath)
+    digest = mocker.patch('banneret.manifest.digest', return_value='hash')
+    project.join('change.py').write('changed')
+    current = scan(project.strpath, previous)
+    digest.assert_called_once_with(project.join('change.py').strpath)
+    assert diff(previous, current) == (['change.py'], [])
@@ -0,0 +1,40 @@
+import os
+
+from banneret.paths import Paths
+from tests.conftest import only_linux, only_mac
+
+
+def test_nothing_is_resolved_in_advance():
+    assert not vars(Paths())
+
+
+def test_resolved_once(mocker):
+    getuser = mocker.patch('getpass.getuser', return_value='user')
+    paths = Paths()
+    assert paths.desktop == paths.home + '/Desktop'
+    assert paths.trash == paths.home + '/.bnrt-trash'
+    getuser.assert_called_once_with()
+
+
+def test_pwd(tmpdir):
+    with tmpdir.as_cwd():
+        assert Paths().pwd == os.getcwd()
+
+
+@only_mac
+def test_mac_layout(mocker):
+    mocker.patch('getpass.getuser', return_value='user')
+    assert Paths().configs == '/Users/user/Library/Preferences'
+
+
+@only_linux
+def test_linux_layout(mocker):
+    mocker.patch('getpass.getuser', return_value='user')
+    assert Paths().configs == '/home/user/.{version}/config'
+
+
+def test_unsupported_platform(mocker):
+    mocker.patch('sys.platform', 'win32')
+    paths = Paths()
+    assert paths.home is None
+    assert paths.configs is None
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from banneret.cli import cli
+from banneret.fs import tree_size
+from banneret.main import Target
+from tests.conftest import create_settings, create_tree, settings_target
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_tree_size(base_path, workers):
+    assert tree_size(create_tree(base_path), workers) == (15, 30)
+
+
+def test_symlinks_are_not_followed(base_path):
+    tree = create_tree(base_path)
+    outside = base_path.mkdir('outside')
+    outside.join('big').write('x' * 1000)
+    os.symlink(outside.strpath, tree.join('link').strpath)
+    files, size = tree_size(tree)
+    assert files == 16
+    assert size < 1000
+
+
+def test_file_size(base_path):
+    path = base_path.join('file')
+    path.write('content')
+    assert tree_size(path) == (1, 7)
+
+
+def test_plan(mocker, base_path, bnrt):
+    create_settings(base_path, ['PyCharm2017.1', 'PyCharm2017.2', 'IdeaIC'])
+    old, new = sorted(path for path in base_path.listdir()
+                      if 'PyCharm' in path.basename)
+    new.join('idea.properties').write('x' * 10)
+    mocker.patch('banneret.Banneret.targets',
+                 return_value=[settings_target(base_path)])
+    assert bnrt.plan('PyCharm*') == [Target(old.strpath, 0, 0),
+                                     Target(new.strpath, 1, 10)]
+
+
+def test_plan_nothing_to_remove(mocker, base_path, bnrt):
+    mocker.patch('banneret.Banneret.targets',
+                 return_value=[settings_target(base_path)])
+    assert bnrt.plan('PyCharm*') == []
+
+
+class TestDryRun:
+
+    @pytest.fixture
+    def mock_plan(self, mocker):
+        return mocker.patch('banneret.Banneret.plan', return_value=[
+            Target('/configs/PyCharm2017.2', 3, 2048),
+            Target('/caches/PyCharm2017.2', 1, 1024)])
+
+    def test_table(self, runner, mock_plan, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm', '-n'])
+        assert result.exit_code == 0
+        assert '2.0 KB' in result.output
+        assert '/caches/PyCharm2017.2' in result.output
+        assert result.output.splitlines()[-1].split() == [
+            '3.0', 'KB', '4', 'total']
+        mock_plan.assert_called_once_with(
+            'PyCharm*', configs=False, caches=False, plugins=False,
+            logs=False)
+        mock_remove_all.assert_not_called()
+
+    @pytest.mark.usefixtures('mock_plan')
+    def test_json(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.2', '--json'])
+        assert result.exit_code == 0
+        plan = json.loads(result.output)
+        assert plan['size'] == 3072
+        assert plan['files'] == 4
+        assert plan['targets'][0] == {
+            'path': '/configs/PyCharm2017.2', 'files': 3, 'size': 2048}
+        mock_remove_all.assert_not_called()
+
+    def test_nothing_to_remove(self, runner, log, mock_plan):
+        mock_plan.return_value = []
+        result = runner.invoke(cli, ['clean', 'pycharm', '-n'])
+        assert result.exit_code == 1
+        assert 'Nothing to remove' in log.text
@@ -0,0 +1,151 @@
+import os
+import stat
+
+import pytest
+
+from banneret.properties import Properties, VmOptions, edit, vm_option
+
+CONTENT = '''# comment
+! another comment
+first = 1
+second: two \\
+    parts
+third
+escaped\\=key=value
+last=no newline'''
+
+
+@pytest.fixture
+def properties():
+    return Properties(CONTENT.splitlines(True))
+
+
+class TestParse:
+
+    def test_values(self, properties):
+        assert properties.get('first') == '1'
+        assert properties.get('second') == 'two parts'
+        assert properties.get('third') == ''
+        assert properties.get('escaped=key') == 'value'
+        assert properties.get('last') == 'no newline'
+
+    def test_comments_are_not_keys(self, properties):
+        assert '#' not in properties
+        assert sorted(properties.index) == [
+            'escaped=key', 'first', 'last', 'second', 'third']
+
+    def test_missing_key(self, properties):
+        assert properties.get('missing', 'default') == 'default'
+
+
+class TestSet:
+
+    def test_same_value(self, properties):
+        assert not properties.set('first', '1')
+        assert ''.join(properties.lines) == CONTENT
+
+    def test_replace(self, properties):
+        assert properties.set('first', '2')
+        assert properties.lines[2] == 'first=2\n'
+        assert properties.get('second') == 'two parts'
+
+    def test_replace_continued_line(self, properties):
+        assert properties.set('second', '2')
+        assert properties.get('second') == '2'
+        assert properties.get('third') == ''
+        assert properties.get('last') == 'no newline'
+
+    def test_append(self, properties):
+        assert properties.set('new', 'value')
+        assert properties.lines[-2:] == ['last=no newline\n', 'new=value\n']
+
+    def test_update(self, properties):
+        assert properties.update({'first': '1', 'new': 'value'})
+        assert not properties.update({'first': '1', 'new': 'value'})
+
+
+class TestRemove:
+
+    def test_missing_key(self, properties):
+        assert not properties.remove('missing')
+        assert ''.join(properties.lines) == CONTENT
+
+    def test_remove_continued_line(self, properties):
+        assert properties.remove('second')
+        assert 'second' not in properties
+        assert properties.get('third') == ''
+        assert properties.set('last', 'value')
+        assert properties.lines[-1] == 'last=value\n'
+        assert len(properties.lines) == 6
+
+
+class TestEdit:
+
+    def test_new_file(self, tmpdir):
+        path = tmpdir.join('idea.properties')
+        assert edit(path.strpath, {'key': 'value'})
+        assert path.read() == 'key=value\n'
+
+    def test_unchanged_file_is_not_written(self, tmpdir):
+        path = tmpdir.join('idea.properties')
+        path.write('key=value\n')
+        os.utime(path.strpath, (0, 0))
+        assert not edit(path.strpath, {'key': 'value'})
+        assert path.mtime() == 0
+
+    def test_mode_is_kept(self, tmpdir):
+        path = tmpdir.join('idea.properties')
+        path.write('key=value\n')
+        path.chmod(0o640)
+        edit(path.strpath, {'key': 'other'})
+        assert stat.S_IMODE(os.stat(path.strpath).st_mode) == 0o640
+
+    def test_symlink_is_kept(self, tmpdir):
+        path = tmpdir.join('real.properties')
+        path.write('key=value\n')
+        link = tmpdir.join('idea.properties')
+        link.mksymlinkto(path)
+        edit(link.strpath, {'key': 'other'})
+        assert link.islink()
+        assert path.read() == 'key=other\n'
+
+    def test_failed_write_keeps_file(self, mocker, tmpdir):
+        path = tmpdir.join('idea.properties')
+        path.write('key=value\n')
+        mocker.patch('os.rename', side_effect=OSError)
+        with pytest.raises(OSError):
+            edit(path.strpath, {'key': 'other'})
+        assert path.read() == 'key=value\n'
+        assert tmpdir.listdir() == [path]
+
+
+class TestVmOptions:
+
+    @pytest.fixture
+    def vmoptions(self):
+        return VmOptions(['-Xms128m\n', '-Xmx750m\n', '# comment\n',
+                          '-XX:ReservedCodeCacheSize=240m\n', '-ea\n'])
+
+    @pytest.mark.parametrize('option, expected', [
+        ('-Xmx2g', ('Xmx', '2g')),
+        ('Xss1m', ('Xss', '1m')),
+        ('-XX:ReservedCodeCacheSize=240m', ('XX:ReservedCodeCacheSize',
+                                            '240m')),
+        ('Dkey=value=1', ('Dkey', 'value=1')),
+        ('-XX:+UseG1GC\n', ('XX:+UseG1GC', '')),
+    ])
+    def test_vm_option(self, option, expected):
+        assert vm_option(option) == expected
+
+    def test_values(self, vmoptions):
+        assert vmoptions.get('Xmx') == '750m'
+        assert vmoptions.get('XX:ReservedCodeCacheSize') == '240m'
+        assert vmoptions.get('ea') == ''
+        assert vmoptions.get('Dkey') is None
+
+    def test_update(self, vmoptions):
+        assert vmoptions.update({'Xmx': '2g', 'Dkey': 'value', 'ea': '',
+                                 'XX:ReservedCodeCacheSize': '512m'})
+        assert vmoptions.lines == [
+            '-Xms128m\n', '-Xmx2g\n', '# comment\n',
+            '-XX:ReservedCodeCacheSize=512m\n', '-ea\n', '-Dkey=value\n']
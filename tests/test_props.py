@@ -0,0 +1,102 @@
+import errno
+
+import pytest
+
+from banneret.cli import cli
+from banneret.main import SettingsNotFound, VMOPTIONS
+from tests.conftest import create_settings, settings_folder, settings_target
+
+
+@pytest.fixture
+def settings(base_path):
+    create_settings(base_path, ['PyCharm2017.1', 'PyCharm2017.2',
+                                'IdeaIC2017.2'])
+    return base_path
+
+
+class TestSetProperties:
+
+    def test_properties(self, settings, bnrt):
+        assert bnrt.set_properties(['PyCharm*'], {'a': '1', 'b': '2'},
+                                   path=settings_target(settings))
+        for version in ('PyCharm2017.1', 'PyCharm2017.2'):
+            assert settings_folder(settings, version).join(
+                'idea.properties').read() == 'a=1\nb=2\n'
+        assert not settings_folder(settings, 'IdeaIC2017.2').listdir()
+
+    def test_nothing_has_changed(self, settings, bnrt):
+        path = settings_target(settings)
+        bnrt.set_properties(['PyCharm2017.1'], {'a': '1'}, path=path)
+        assert not bnrt.set_properties(['PyCharm2017.1'], {'a': '1'},
+                                       path=path)
+
+    def test_existing_vmoptions(self, settings, bnrt):
+        config = settings_folder(settings, 'PyCharm2017.1')
+        config.join('pycharm.vmoptions').write('-Xmx750m\n')
+        config.join('pycharm64.vmoptions').write('-Xms128m\n')
+        assert bnrt.set_properties(['PyCharm2017.1'], vmoptions={'Xmx': '2g'},
+                                   path=settings_target(settings))
+        assert config.join('pycharm.vmoptions').read() == '-Xmx2g\n'
+        assert config.join('pycharm64.vmoptions').read() == \
+            '-Xms128m\n-Xmx2g\n'
+        assert not config.join('idea.properties').check()
+
+    def test_new_vmoptions(self, settings, bnrt):
+        bnrt.set_properties(['IdeaIC2017.2'], vmoptions={'Dkey': 'value'},
+                            path=settings_target(settings))
+        name = VMOPTIONS.format(product='idea')
+        assert settings_folder(settings, 'IdeaIC2017.2').join(name).read() == \
+            '-Dkey=value\n'
+
+    def test_no_settings(self, base_path, bnrt):
+        with pytest.raises(SettingsNotFound):
+            bnrt.set_properties(['PyCharm*'], {'a': '1'},
+                                path=settings_target(base_path))
+
+
+class TestPropsCommand:
+
+    @pytest.fixture
+    def mock_set_properties(self, mocker):
+        return mocker.patch('banneret.Banneret.set_properties')
+
+    def test_set(self, runner, log, mock_set_properties):
+        result = runner.invoke(cli, [
+            'props', 'set', 'a=1', 'b=x=y', 'pycharm2017.1', 'idea2017.2',
+            '--vm', 'Xmx2g', '--vm=-Dkey=value'])
+        assert result.exit_code == 0
+        assert 'Restart PyCharm' in log.text
+        mock_set_properties.assert_called_once_with(
+            ['PyCharm2017.1', 'IntelliJIdea2017.2'], {'a': '1', 'b': 'x=y'},
+            {'Xmx': '2g', 'Dkey': 'value'})
+
+    def test_all_versions(self, runner, mock_set_properties):
+        result = runner.invoke(cli, ['props', 'set', 'a=1', 'pycharm'],
+                               input='N\n')
+        assert result.exit_code == 1
+        mock_set_properties.assert_not_called()
+
+    def test_no_properties(self, runner, mock_set_properties):
+        result = runner.invoke(cli, ['props', 'set', 'pycharm2017.1'])
+        assert result.exit_code == 2
+        mock_set_properties.assert_not_called()
+
+    def test_nothing_has_changed(self, runner, log, mock_set_properties):
+        mock_set_properties.return_value = False
+        result = runner.invoke(cli, ['props', 'set', 'a=1', 'pycharm2017.1'])
+        assert result.exit_code == 1
+        assert 'Nothing to update' in log.text
+
+    def test_no_settings(self, runner, log, mock_set_properties):
+        mock_set_properties.side_effect = SettingsNotFound
+        result = runner.invoke(cli, ['props', 'set', 'a=1', 'pycharm2017.1'])
+        assert result.exit_code == 1
+        assert 'No settings folder' in log.text
+
+    def test_failed_edit(self, runner, log, mock_set_properties):
+        mock_set_properties.side_effect = IOError(errno.EACCES,
+                                                  'Permission denied')
+        result = runner.invoke(cli, ['props', 'set', 'a=1', 'pycharm2017.1'])
+        assert result.exit_code == 1
+        assert 'Failed to update: [Errno 13] Permission denied' in log.text
+        assert 'No settings folder' not in log.text
@@ -0,0 +1,181 @@
+import errno
+import os
+import sys
+
+import pytest
+
+from banneret.cli import cli, LINUX
+from banneret.fs import copytree, move_tree
+from banneret.main import SettingsNotFound
+from banneret.paths import paths
+from banneret.properties import Properties
+from tests.conftest import create_settings
+
+VERSIONS = ['PyCharm2017.1', 'PyCharm2017.2']
+
+
+def create_cache_tree(base_path):
+    tree = base_path.mkdir('tree')
+    tree.mkdir('caches').join('file').write('content')
+    tree.mkdir('empty')
+    os.symlink('caches/file', tree.join('link').strpath)
+    return tree
+
+
+def not_same_device(mocker):
+    error = OSError(errno.EXDEV, 'Invalid cross-device link')
+    return mocker.patch('os.rename', side_effect=error)
+
+
+class TestMoveTree:
+
+    def test_copytree(self, base_path):
+        tree = create_cache_tree(base_path)
+        copytree(tree, base_path.join('copy'), 4)
+        copy = base_path.join('copy')
+        assert copy.join('caches', 'file').read() == 'content'
+        assert copy.join('empty').check(dir=True)
+        assert os.readlink(copy.join('link').strpath) == 'caches/file'
+        assert tree.join('caches', 'file').check()
+
+    def test_rename(self, base_path):
+        tree = create_cache_tree(base_path)
+        move_tree(tree, base_path.join('new', 'tree'))
+        assert not tree.check()
+        assert base_path.join('new', 'tree', 'caches', 'file').check()
+
+    def test_other_device(self, base_path, mocker):
+        tree = create_cache_tree(base_path)
+        not_same_device(mocker)
+        move_tree(tree, base_path.join('moved'))
+        assert not tree.check()
+        assert base_path.join('moved', 'caches', 'file').read() == 'content'
+
+    def test_failed_copy_is_removed(self, base_path, mocker):
+        tree = create_cache_tree(base_path)
+        not_same_device(mocker)
+        mocker.patch('shutil.copy2', side_effect=IOError)
+        with pytest.raises(IOError):
+            move_tree(tree, base_path.join('moved'))
+        assert not base_path.join('moved').check()
+        assert tree.join('caches', 'file').check()
+
+    def test_destination_exists(self, base_path):
+        tree = create_cache_tree(base_path)
+        with pytest.raises(OSError):
+            move_tree(tree, base_path.mkdir('moved'))
+        assert tree.check()
+
+
+@pytest.fixture
+def settings(base_path, mocker):
+    """Point configs and system locations to base_path."""
+    create_settings(base_path, VERSIONS)
+    if sys.platform in LINUX:
+        mocker.patch.object(paths, 'configs',
+                            base_path.strpath + '/.{version}/config')
+        mocker.patch.object(paths, 'system',
+                            base_path.strpath + '/.{version}/system')
+        for version in VERSIONS:
+            os.mkdir(config(version))
+    else:
+        mocker.patch.object(paths, 'configs', base_path.strpath)
+        mocker.patch.object(paths, 'system', base_path.mkdir('Caches').strpath)
+    return base_path
+
+
+def config(version):
+    if sys.platform in LINUX:
+        return paths.configs.format(version=version)
+    return os.path.join(paths.configs, version)
+
+
+def system(version):
+    if sys.platform in LINUX:
+        return paths.system.format(version=version)
+    return os.path.join(paths.system, version)
+
+
+@pytest.mark.usefixtures('settings')
+class TestRelocateCaches:
+
+    def test_relocate_and_undo(self, bnrt, tmpdir):
+        os.makedirs(system('PyCharm2017.1') + '/caches')
+        target = tmpdir.join('fast')
+        assert bnrt.relocate_caches(['PyCharm*'], target.strpath)
+        assert target.join('PyCharm2017.1', 'caches').check(dir=True)
+        assert not os.path.exists(system('PyCharm2017.1'))
+        for version in VERSIONS:
+            properties = Properties.read(config(version) + '/idea.properties')
+            assert properties.get('idea.system.path') == \
+                target.join(version).strpath
+
+        assert bnrt.relocate_caches(['PyCharm*'])
+        assert os.path.isdir(system('PyCharm2017.1') + '/caches')
+        assert not target.join('PyCharm2017.1').check()
+        for version in VERSIONS:
+            assert 'idea.system.path' not in Properties.read(
+                config(version) + '/idea.properties')
+
+    def test_relocated_version_is_skipped(self, bnrt, tmpdir):
+        target = tmpdir.join('fast').strpath
+        assert bnrt.relocate_caches(['PyCharm2017.1'], target)
+        assert not bnrt.relocate_caches(['PyCharm2017.1'], target)
+
+    def test_nothing_to_undo(self, bnrt):
+        assert not bnrt.relocate_caches(['PyCharm*'])
+
+    def test_no_settings(self, bnrt, tmpdir):
+        with pytest.raises(SettingsNotFound):
+            bnrt.relocate_caches(['IdeaIC*'], tmpdir.strpath)
+
+
+class TestRelocateCachesCommand:
+
+    @pytest.fixture
+    def mock_relocate_caches(self, mocker):
+        return mocker.patch('banneret.Banneret.relocate_caches')
+
+    def test_relocate(self, runner, log, mock_relocate_caches):
+        result = runner.invoke(cli, ['relocate-caches', 'pycharm2017.1',
+                                     '--to', '/fast'])
+        assert result.exit_code == 0
+        assert 'Restart PyCharm' in log.text
+        mock_relocate_caches.assert_called_once_with(['PyCharm2017.1'],
+                                                     '/fast')
+
+    def test_undo(self, runner, mock_relocate_caches):
+        result = runner.invoke(cli, ['relocate-caches', 'pycharm2017.1',
+                                     '--undo'])
+        assert result.exit_code == 0
+        mock_relocate_caches.assert_called_once_with(['PyCharm2017.1'],
+                                                     None)
+
+    @pytest.mark.parametrize('args', [[], ['--to', '/fast', '--undo']])
+    def test_target_or_undo(self, runner, mock_relocate_caches, args):
+        result = runner.invoke(cli, ['relocate-caches', 'pycharm'] + args)
+        assert result.exit_code == 2
+        mock_relocate_caches.assert_not_called()
+
+    def test_nothing_to_move(self, runner, log, mock_relocate_caches):
+        mock_relocate_caches.return_value = False
+        result = runner.invoke(cli, ['relocate-caches', 'pycharm2017.1',
+                                     '--undo'])
+        assert result.exit_code == 1
+        assert 'Nothing to move' in log.text
+
+    def test_no_settings(self, runner, log, mock_relocate_caches):
+        mock_relocate_caches.side_effect = SettingsNotFound
+        result = runner.invoke(cli, ['relocate-caches', 'pycharm2017.1',
+                                     '--undo'])
+        assert result.exit_code == 1
+        assert 'No settings folder' in log.text
+
+    def test_failed_move(self, runner, log, mock_relocate_caches):
+        mock_relocate_caches.side_effect = OSError(errno.EEXIST,
+                                                   'File exists')
+        result = runner.invoke(cli, ['relocate-caches', 'pycharm2017.1',
+                                     '--to', '/fast'])
+        assert result.exit_code == 1
+        assert 'Failed to move caches: [Errno 17] File exists' in log.text
+        assert 'No settings folder' not in log.text
@@ -1,5 +1,8 @@
-from banneret.main import CONFIGS, CACHES, PLUGINS, LOGS, HOME
-from tests.conftest import only_linux, only_mac
+
+from banneret import pool
+from banneret.paths import paths
+from tests.conftest import (
+    create_settings, only_linux, only_mac, settings_target)
 
 
 class TestArgumentsLogic:
@@ -12,23 +15,35 @@ class TestArgumentsLogic:
     @only_linux
     def test_remove_all_linux(self, mock_remove, bnrt):
         bnrt.remove_all('PyCharm*')
-        mock_remove.assert_called_once_with(HOME + '/.{version}', 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.home + '/.{version}',
+                                            'PyCharm*')
+
+    @only_linux
+    def test_nested_targets_linux(self, mock_remove, bnrt):
+        bnrt.remove_all('PyCharm*', configs=True, plugins=True)
+        mock_remove.assert_called_once_with(paths.configs, 'PyCharm*')
+
+    def test_fast_moves_to_trash(self, mocker, mock_remove, bnrt):
+        mock_trash = mocker.patch('banneret.Banneret.trash')
+        bnrt.remove_all('PyCharm*', fast=True, configs=True)
+        mock_trash.assert_called_once_with(paths.configs, 'PyCharm*')
+        mock_remove.assert_not_called()
 
     def test_remove_configs(self, mock_remove, bnrt):
         bnrt.remove_all('PyCharm*', configs=True)
-        mock_remove.assert_called_once_with(CONFIGS, 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.configs, 'PyCharm*')
 
     def test_remove_caches(self, mock_remove, bnrt):
         bnrt.remove_all('PyCharm*', caches=True)
-        mock_remove.assert_called_once_with(CACHES, 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.caches, 'PyCharm*')
 
     def test_remove_plugins(self, mock_remove, bnrt):
         bnrt.remove_all('PyCharm*', plugins=True)
-        mock_remove.assert_called_once_with(PLUGINS, 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.plugins, 'PyCharm*')
 
     def test_remove_logs(self, mock_remove, bnrt):
         bnrt.remove_all('PyCharm*', logs=True)
-        mock_remove.assert_called_once_with(LOGS, 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.logs, 'PyCharm*')
 
 
 class TestReturnStatus:
@@ -45,15 +60,50 @@ class TestReturnStatus:
 
     def test_only_logs_were_removed(self, mock_remove, bnrt):
         result = bnrt.remove_all('PyCharm*', logs=True)
-        mock_remove.assert_called_once_with(LOGS, 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.logs, 'PyCharm*')
         assert result
 
     def test_only_plugins_were_removed(self, mock_remove, bnrt):
         result = bnrt.remove_all('PyCharm*', plugins=True)
-        mock_remove.assert_called_once_with(PLUGINS, 'PyCharm*')
+        mock_remove.assert_called_once_with(paths.plugins, 'PyCharm*')
         assert result
 
     def test_only_plugins_and_logs_were_removed(self, mock_remove, bnrt):
         result = bnrt.remove_all('PyCharm*', plugins=True, logs=True)
         assert mock_remove.call_count == 2
         assert result
+
+
+class TestManyVersions:
+
+    def test_every_version_is_removed(self, mock_remove, bnrt):
+        assert bnrt.remove_all('PyCharm2017.1', 'PyCharm2017.2', logs=True)
+        assert mock_remove.call_args_list == [
+            ((paths.logs, 'PyCharm2017.1'),), ((paths.logs, 'PyCharm2017.2'),)]
+
+    def test_overlapping_versions(self, mocker, base_path, bnrt):
+        create_settings(base_path, ['PyCharm2017.1', 'PyCharm2017.2',
+                                    'IdeaIC2017.2'])
+        mocker.patch('banneret.Banneret.targets',
+                     return_value=[settings_target(base_path)])
+        assert bnrt.remove_all('PyCharm*', 'PyCharm2017.2')
+        assert [path.basename.lstrip('.') for path in base_path.listdir()] \
+            == ['IdeaIC2017.2']
+
+    def test_locations_share_one_pool(self, mocker, tmpdir, bnrt):
+        targets = []
+        for name in ('configs', 'caches'):
+            base = tmpdir.mkdir(name)
+            create_settings(base, ['PyCharm2017.1', 'PyCharm2017.2'])
+            for folder in base.listdir():
+                for number in range(3):
+                    folder.join('file%d' % number).write('content')
+            targets.append(settings_target(base))
+        mocker.patch('banneret.Banneret.targets', return_value=targets)
+        thread_pool = mocker.spy(pool, 'ThreadPool')
+        bnrt.workers = 4
+        assert bnrt.remove_all('PyCharm*')
+        assert not tmpdir.join('configs').listdir()
+        assert not tmpdir.join('caches').listdir()
+        # one pool runs locations, the other one removes files of all four
+        assert thread_pool.call_count == 2
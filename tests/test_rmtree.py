@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from banneret.fs import rmtree
+from tests.conftest import create_tree
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_tree_is_removed(base_path, workers):
+    tree = create_tree(base_path)
+    rmtree(tree, workers)
+    assert base_path.listdir() == []
+
+
+def test_symlinks_are_not_followed(base_path):
+    tree = create_tree(base_path)
+    outside = base_path.mkdir('outside')
+    outside.join('keep.txt').write('content')
+    os.symlink(outside.strpath, tree.join('link').strpath)
+    rmtree(tree)
+    assert base_path.listdir() == [outside]
+    assert outside.join('keep.txt').check()
+
+
+def test_file_is_removed(base_path):
+    path = base_path.join('file')
+    path.write('content')
+    rmtree(path)
+    assert base_path.listdir() == []
+
+
+def test_unknown_path(base_path):
+    with pytest.raises(OSError):
+        rmtree(base_path.join('unknown'))
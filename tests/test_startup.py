@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = {'docker', 'requests', 'urllib3', 'zstandard', 'tarfile', 'asyncio',
+         'banneret.archive', 'banneret.asyncdocker', 'banneret.ignore',
+         'banneret.manifest'}
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason='No -X importtime')
+
+
+def imported_modules(*args):
+    """Get {module: cumulative microseconds} imported by bnrt command."""
+    command = [sys.executable, '-X', 'importtime', '-m', 'banneret.cli']
+    with subprocess.Popen(command + list(args), stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE) as process:
+        _, stderr = process.communicate()
+    assert process.returncode == 0
+    modules = {}
+    for line in stderr.decode().splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and fields[1].strip().isdigit():
+            modules[fields[2].strip()] = int(fields[1])
+    return modules
+
+
+def test_version_skips_heavy_imports():
+    modules = imported_modules('--version')
+    assert 'banneret.main' in modules
+    assert not HEAVY & set(modules)
+
+
+def test_help_skips_heavy_imports():
+    assert not HEAVY & set(imported_modules('docker', '--help'))
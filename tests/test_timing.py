@@ -0,0 +1,122 @@
+import json
+import pstats
+import threading
+
+import pytest
+
+from banneret.cli import cli
+from banneret.paths import paths
+from banneret.timing import NO_SPAN, Timer, timed, timer as global_timer
+
+
+@pytest.fixture
+def timer():
+    timer = Timer()
+    timer.enable()
+    return timer
+
+
+@pytest.fixture
+def profiled():
+    yield global_timer
+    global_timer.disable()
+
+
+class TestTimer:
+
+    def test_disabled(self):
+        timer = Timer()
+        with timer.span('phase') as span:
+            assert span is NO_SPAN
+        assert not timer.spans
+
+    def test_nested_spans(self, timer):
+        with timer.span('outer'):
+            with timer.span('inner'):
+                pass
+        inner, outer = timer.spans
+        assert (inner.name, inner.depth) == ('inner', 1)
+        assert (outer.name, outer.depth) == ('outer', 0)
+        assert outer.duration >= inner.duration
+        assert outer.start <= inner.start
+
+    def test_span_of_failed_block(self, timer):
+        with pytest.raises(ValueError):
+            with timer.span('phase'):
+                raise ValueError
+        assert [span.name for span in timer.spans] == ['phase']
+
+    def test_threads_keep_own_depth(self, timer):
+        def work():
+            with timer.span('worker'):
+                pass
+
+        with timer.span('main'):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        assert [(span.name, span.depth) for span in timer.spans] == [
+            ('worker', 0), ('main', 0)]
+
+    def test_phases(self, timer):
+        for _ in range(3):
+            with timer.span('short'):
+                pass
+        with timer.span('long'):
+            with timer.span('short'):
+                pass
+        long_phase, short_phase = timer.phases()
+        assert (long_phase.name, long_phase.calls) == ('long', 1)
+        assert (short_phase.name, short_phase.calls) == ('short', 4)
+        assert short_phase.longest <= short_phase.total
+
+    def test_save(self, timer, tmpdir):
+        with timer.span('phase'):
+            pass
+        timer.disable()
+        timer.save(tmpdir.join('spans.json').strpath)
+        saved = json.loads(tmpdir.join('spans.json').read())
+        assert saved['elapsed'] == timer.elapsed()
+        assert [span['name'] for span in saved['spans']] == ['phase']
+
+
+class TestTimed:
+
+    def test_disabled(self, profiled):
+        assert timed('phase')(lambda: 42)() == 42
+        assert profiled.spans == []
+
+    def test_enabled(self, profiled):
+        profiled.enable()
+        assert timed('phase')(lambda: 42)() == 42
+        assert [span.name for span in profiled.spans] == ['phase']
+
+
+class TestProfileOption:
+
+    @pytest.fixture
+    def trash(self, tmpdir, mocker):
+        mocker.patch.object(paths, 'trash', tmpdir.mkdir('trash').strpath)
+
+    @pytest.mark.usefixtures('trash')
+    def test_table(self, runner, profiled):
+        result = runner.invoke(cli, ['--profile', 'reap'])
+        assert 'PHASE' in result.output
+        assert 'reap ' in result.output
+        assert 'elapsed' in result.output
+        assert not profiled.enabled
+
+    @pytest.mark.usefixtures('trash', 'profiled')
+    def test_json(self, runner, tmpdir):
+        output = tmpdir.join('profile.json')
+        result = runner.invoke(cli, ['--profile-output', output.strpath,
+                                     'reap'])
+        assert 'PHASE' not in result.output
+        spans = json.loads(output.read())['spans']
+        assert [span['name'] for span in spans] == ['reap']
+
+    @pytest.mark.usefixtures('trash', 'profiled')
+    def test_cprofile(self, runner, tmpdir):
+        output = tmpdir.join('profile.prof')
+        runner.invoke(cli, ['--profile-output', output.strpath, 'reap'])
+        assert pstats.Stats(output.strpath).total_calls > 0
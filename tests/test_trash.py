@@ -0,0 +1,84 @@
+import errno
+import sys
+
+from banneret.cli import MACOS, LINUX
+from tests.conftest import create_settings
+
+
+def call_trash(path, version, trash, bnrt):
+    """Call trash method depending on the OS."""
+    if sys.platform in MACOS:
+        result = bnrt.trash(path, version, trash.strpath)
+    elif sys.platform in LINUX:
+        result = bnrt.trash(path + '/.{version}', version, trash.strpath)
+    else:
+        raise OSError('Unsupported OS')
+    return result
+
+
+def trashed(trash):
+    return sorted(path.basename
+                  for entry in trash.listdir() for path in entry.listdir())
+
+
+def test_moves_to_trash(tmpdir, base_path, bnrt):
+    trash = tmpdir.join('trash')
+    versions = ['PyCharm2016.3', 'PyCharmCE2017.2', 'PyCharm2017.2']
+    create_settings(base_path, versions)
+    assert call_trash(base_path, 'PyCharm2*', trash, bnrt)
+    assert len(base_path.listdir()) == 1
+    assert len(trashed(trash)) == 2
+
+
+def test_same_name_is_trashed_twice(tmpdir, base_path, bnrt):
+    trash = tmpdir.join('trash')
+    create_settings(base_path, ['PyCharm2017.2'])
+    call_trash(base_path, 'PyCharm2017.2', trash, bnrt)
+    create_settings(base_path, ['PyCharm2017.2'])
+    call_trash(base_path, 'PyCharm2017.2', trash, bnrt)
+    assert base_path.listdir() == []
+    assert len(trash.listdir()) == 2
+
+
+def test_trash_is_not_found_by_version_glob(base_path, bnrt):
+    create_settings(base_path, ['PyCharm2017.2'])
+    call_trash(base_path, 'PyCharm2017.2', base_path.join('.bnrt-trash'),
+               bnrt)
+    assert not call_trash(base_path, 'PyCharm*',
+                          base_path.join('.bnrt-trash'), bnrt)
+
+
+def test_nothing_to_trash(tmpdir, base_path, bnrt):
+    assert not call_trash(base_path, 'PyCharm*', tmpdir.join('trash'), bnrt)
+
+
+def test_other_device_falls_back_to_remove(tmpdir, base_path, bnrt, mocker):
+    error = OSError(errno.EXDEV, 'Invalid cross-device link')
+    mocker.patch('banneret.main.move_to_trash', side_effect=error)
+    create_settings(base_path, ['PyCharm2017.2'])
+    assert call_trash(base_path, 'PyCharm2017.2', tmpdir.join('trash'), bnrt)
+    assert base_path.listdir() == []
+
+
+def test_reap(tmpdir, base_path, bnrt):
+    trash = tmpdir.join('trash')
+    create_settings(base_path, ['PyCharm2016.3', 'PyCharm2017.2'])
+    call_trash(base_path, 'PyCharm*', trash, bnrt)
+    assert bnrt.reap(trash.strpath)
+    assert [path.basename for path in trash.listdir()] == ['.lock']
+
+
+def test_nothing_to_reap(tmpdir, bnrt):
+    assert not bnrt.reap(tmpdir.join('trash').strpath)
+    assert not bnrt.reap(tmpdir.strpath)
+
+
+def test_reaper_is_detached(bnrt, mocker):
+    popen = mocker.patch('subprocess.Popen')
+    bnrt.spawn_reaper()
+    options = popen.call_args[1]
+    if sys.version_info >= (3, 2):
+        assert options['start_new_session']
+        assert 'preexec_fn' not in options
+    else:
+        assert options['preexec_fn']
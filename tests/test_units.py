@@ -0,0 +1,42 @@
+import pytest
+
+from banneret.units import format_size, parse_duration, parse_size
+
+
+class TestParseSize(object):
+
+    @pytest.mark.parametrize('size, expected', [
+        ('512', 512),
+        ('100K', 100 * 1024),
+        ('1.5G', int(1.5 * 1024 ** 3)),
+        ('2GB', 2 * 1024 ** 3),
+        ('10 mb', 10 * 1024 ** 2),
+    ])
+    def test_valid(self, size, expected):
+        assert parse_size(size) == expected
+
+    @pytest.mark.parametrize('size', ['', 'big', '1X', '-1K'])
+    def test_invalid(self, size):
+        with pytest.raises(ValueError):
+            parse_size(size)
+
+    def test_round_trip(self):
+        assert format_size(parse_size('1.5G')) == '1.5 GB'
+
+
+class TestParseDuration(object):
+
+    @pytest.mark.parametrize('duration, expected', [
+        ('90s', 90),
+        ('30m', 30 * 60),
+        ('12h', 12 * 3600),
+        ('7d', 7 * 24 * 3600),
+        ('2W', 2 * 7 * 24 * 3600),
+    ])
+    def test_valid(self, duration, expected):
+        assert parse_duration(duration) == expected
+
+    @pytest.mark.parametrize('duration', ['', '7', 'week', '1.5h'])
+    def test_invalid(self, duration):
+        with pytest.raises(ValueError):
+            parse_duration(duration)
@@ -0,0 +1,138 @@
+import os
+
+import pytest
+
+from banneret import fs
+from banneret.cli import cli
+from banneret.fs import FolderIndex
+from banneret.main import version_key
+from tests.conftest import create_settings, settings_target
+
+
+@pytest.fixture
+def settings(mocker, base_path):
+    create_settings(base_path, [
+        'PyCharm2017.2', 'PyCharm2017.10', 'PyCharm2016.3', 'PyCharmCE2018.1',
+        'IdeaIC2018.1'])
+    base_path.join('PyCharm2019.1').write('not a folder')
+    mocker.patch('banneret.Banneret.targets',
+                 return_value=[settings_target(base_path)])
+    return base_path
+
+
+@pytest.mark.parametrize('version, key', [
+    ('2017.2', (2017, 2)),
+    ('2017.10', (2017, 10)),
+    ('2018', (2018,)),
+    ('2017.2.1', (2017, 2, 1)),
+])
+def test_version_key(version, key):
+    assert version_key(version) == key
+
+
+@pytest.mark.usefixtures('settings')
+def test_newest_first(bnrt):
+    assert bnrt.versions('PyCharm') == ['2017.10', '2017.2', '2016.3']
+
+
+@pytest.mark.usefixtures('settings')
+def test_other_ide(bnrt):
+    assert bnrt.versions('PyCharmCE') == ['2018.1']
+
+
+@pytest.fixture
+def mock_read(mocker):
+    if fs.scandir:
+        return mocker.patch('banneret.fs.scandir', side_effect=fs.scandir)
+    return mocker.patch('os.listdir', side_effect=os.listdir)
+
+
+def test_single_listing_per_root(mock_read, settings, bnrt):
+    bnrt.versions('PyCharm')
+    bnrt.versions('PyCharmCE')
+    for pattern in ('PyCharm2017.2', 'PyCharm*', 'IdeaIC*'):
+        bnrt.find(settings_target(settings), pattern)
+    assert mock_read.call_count == 1
+
+
+def test_removal_refreshes_listing(settings, bnrt):
+    target = settings_target(settings)
+    assert bnrt.remove(target, 'PyCharm2017.2')
+    assert not bnrt.find(target, 'PyCharm2017.2')
+    assert len(bnrt.find(target, 'PyCharm*')) == 3
+
+
+class TestFolderIndex:
+
+    def test_match(self, base_path):
+        for name in ('PyCharm2017.2', 'PyCharmCE2017.2', '.PyCharm2017.1'):
+            base_path.mkdir(name)
+        index = FolderIndex()
+        assert index.match(base_path, 'PyCharm2*') == ['PyCharm2017.2']
+        assert index.match(base_path, '*') == ['PyCharm2017.2',
+                                               'PyCharmCE2017.2']
+        assert index.match(base_path, '.PyCharm*') == ['.PyCharm2017.1']
+
+    def test_missing_root(self, base_path):
+        assert FolderIndex().match(base_path.join('missing'), '*') == []
+
+    def test_forget(self, base_path):
+        index = FolderIndex()
+        assert index.match(base_path, '*') == []
+        base_path.mkdir('PyCharm2017.2')
+        assert index.match(base_path, '*') == []
+        index.forget(base_path)
+        assert index.match(base_path, '*') == ['PyCharm2017.2']
+
+
+def test_missing_root(mocker, base_path, bnrt):
+    mocker.patch('banneret.Banneret.targets', return_value=[
+        settings_target(base_path.join('missing'))])
+    assert bnrt.versions('PyCharm') == []
+
+
+class TestKeep:
+
+    def test_old_versions_are_removed(self, settings, runner):
+        result = runner.invoke(cli, ['clean', 'pycharm', '--keep', '1'])
+        assert result.exit_code == 0
+        assert sorted(path.basename.lstrip('.')
+                      for path in settings.listdir()) == [
+            'IdeaIC2018.1', 'PyCharm2017.10', 'PyCharm2019.1',
+            'PyCharmCE2018.1']
+
+    @pytest.mark.usefixtures('settings')
+    def test_old_versions_are_removed_at_once(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm', '-k', '1', '-c'])
+        assert result.exit_code == 0
+        mock_remove_all.assert_called_once_with(
+            'PyCharm2017.2', 'PyCharm2016.3', fast=False, configs=False,
+            caches=True, plugins=False, logs=False)
+
+    @pytest.mark.usefixtures('settings')
+    def test_nothing_to_remove(self, runner, log, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm', '--keep', '3'])
+        assert result.exit_code == 1
+        assert 'Nothing to remove' in log.text
+        mock_remove_all.assert_not_called()
+
+    @pytest.mark.usefixtures('settings')
+    def test_dry_run(self, mocker, runner):
+        plan = mocker.patch('banneret.Banneret.plan', return_value=[])
+        runner.invoke(cli, ['clean', 'pycharm', '--keep', '2', '-n'])
+        plan.assert_called_once_with('PyCharm2016.3', configs=False,
+                                     caches=False, plugins=False, logs=False)
+
+    @pytest.mark.usefixtures('settings')
+    def test_keeping_nothing_asks_first(self, runner, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm', '--keep', '0'],
+                               input='n\n')
+        assert result.exit_code == 1
+        assert 'Remove all versions?' in result.output
+        mock_remove_all.assert_not_called()
+
+    def test_exact_version(self, runner, log, mock_remove_all):
+        result = runner.invoke(cli, ['clean', 'pycharm2017.2', '--keep', '1'])
+        assert result.exit_code == 1
+        assert 'without version' in log.text
+        mock_remove_all.assert_not_called()
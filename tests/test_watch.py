@@ -0,0 +1,93 @@
+import pytest
+
+from banneret.main import Selection
+from banneret.watch import Watcher, device, used_share
+
+
+@pytest.fixture
+def shares(mocker):
+    """Get list of used shares polled one by one, the last one sticks."""
+    polled = []
+
+    def share(path):  # pylint: disable=unused-argument
+        return polled.pop(0) if len(polled) > 1 else polled[0]
+
+    mocker.patch('banneret.watch.used_share', side_effect=share)
+    return polled
+
+
+@pytest.fixture
+def watcher(bnrt, mocker, tmpdir):
+    mocker.patch('banneret.watch.device', return_value=1)
+    mocker.patch.object(bnrt, 'locate', return_value=(str(tmpdir), '', ''))
+    return Watcher(bnrt, 0.9, 0.8, interval=10, max_interval=40,
+                   docker_root='/docker')
+
+
+def test_used_share(tmpdir):
+    assert 0 < used_share(str(tmpdir)) < 1
+    assert used_share(str(tmpdir.join('missing'))) is None
+    assert device(str(tmpdir.join('missing'))) is None
+
+
+class TestWatcher:
+
+    def test_roots_on_one_disk_are_polled_once(self, watcher, tmpdir):
+        assert watcher.disks() == {1: [str(tmpdir), '/docker']}
+
+    def test_idle_polls_back_off(self, watcher, shares, mock_remove_all):
+        shares.append(0.5)
+        assert [watcher.check() for _ in range(4)] == [10, 20, 40, 40]
+        shares[0] = 0.6
+        assert watcher.check() == 10
+        mock_remove_all.assert_not_called()
+
+    def test_nothing_is_evicted_below_high(self, watcher, shares,
+                                           mock_remove_all,
+                                           mock_clean_docker):
+        shares.append(0.89)
+        watcher.check()
+        mock_remove_all.assert_not_called()
+        mock_clean_docker.assert_not_called()
+
+    def test_oldest_caches_go_first(self, watcher, mocker, shares,
+                                    mock_remove_all, mock_clean_docker):
+        versions = {'PyCharm': ['2018.1', '2017.3', '2017.1'],
+                    'IdeaIC': ['2017.2', '2016.3']}
+        mocker.patch.object(watcher.bnrt, 'versions',
+                            side_effect=lambda ide, **_: versions.get(ide, []))
+        shares.extend([0.95, 0.95, 0.9, 0.85, 0.79])
+        assert watcher.check() == 10
+        assert mock_remove_all.call_args_list == [
+            mocker.call('IdeaIC2016.3', caches=True),
+            mocker.call('PyCharm2017.1', caches=True),
+            mocker.call('PyCharm2017.3', caches=True)]
+        mock_clean_docker.assert_not_called()
+
+    def test_docker_objects_go_by_age(self, watcher, mocker, shares,
+                                      mock_clean_docker):
+        mocker.patch.object(watcher.bnrt, 'versions', return_value=[])
+        shares.extend([0.95, 0.95, 0.85, 0.7])
+        watcher.check()
+        assert [call[1]['selection'] for call in
+                mock_clean_docker.call_args_list] == [
+                    Selection(older_than=4 * 7 * 24 * 3600),
+                    Selection(older_than=7 * 24 * 3600)]
+        assert mock_clean_docker.call_args[1]['build_cache']
+
+    def test_failed_eviction_is_skipped(self, watcher, mocker, shares, log,
+                                        mock_clean_docker):
+        mocker.patch.object(watcher.bnrt, 'versions', return_value=[])
+        mock_clean_docker.side_effect = OSError('daemon is down')
+        shares.append(0.95)
+        watcher.check()
+        assert mock_clean_docker.call_count == 4
+        assert 'Failed to evict' in log.text
+        assert 'Nothing else to evict' in log.text
+
+    def test_run(self, watcher, mocker):
+        mocker.patch.object(watcher, 'check', return_value=10)
+        sleep = mocker.Mock()
+        watcher.run(3, sleep)
+        assert watcher.check.call_count == 3
+        assert sleep.call_count == 2